@@ -0,0 +1,93 @@
+"""Daily interest accrual at scale, and notification fan-out vs sequential sends.
+
+    python benchmarks/bench_accrual.py [--sizes 10000 100000 1000000]
+"""
+import os
+import sys
+import time
+import sqlite3
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import AccountStore
+from sender import OutboundScheduler, NotificationSender
+
+
+def populate(path: str, accounts: int) -> None:
+    store = AccountStore(path)
+    store.open()
+    store.close()
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO accounts (chat_id, registration_fee_paid, total_deposit, investment) VALUES (?, 1, ?, ?)",
+        ((chat_id, 1.0 + chat_id % 10, 1.0 + chat_id % 10) for chat_id in range(accounts)),
+    )
+    conn.commit()
+    conn.close()
+
+
+async def measure_lag(stop: asyncio.Event, samples: list) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        samples.append(time.perf_counter() - start - 0.001)
+
+
+async def bench_accrual(accounts: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        populate(path, accounts)
+        store = AccountStore(path)
+        store.open()
+        stop = asyncio.Event()
+        lag = []
+        lag_task = asyncio.create_task(measure_lag(stop, lag))
+        start = time.perf_counter()
+        credited = await store.accrue_interest(0.0285)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await lag_task
+        print(f"{accounts:>9,} accounts: accrued {len(credited):,} in {elapsed:.2f} s "
+              f"({len(credited) / elapsed:,.0f} accounts/s), max loop lag {max(lag, default=0) * 1000:.1f} ms")
+        store.close()
+
+
+class SlowBot:
+    """Stands in for the Bot API with a fixed per-request latency."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(self.latency)
+
+
+async def bench_fanout(messages: int, latency: float) -> None:
+    bot = SlowBot(latency)
+    batch = [(chat_id, "✅ Daily interest") for chat_id in range(messages)]
+    start = time.perf_counter()
+    for chat_id, text in batch[: messages // 10]:
+        await bot.send_message(chat_id, text)
+    sequential = (messages // 10) / (time.perf_counter() - start)
+    sender = NotificationSender(OutboundScheduler(global_rate=1e9))
+    start = time.perf_counter()
+    await sender.send_many(bot, batch)
+    fanout = messages / (time.perf_counter() - start)
+    print(f"fan-out at {latency * 1000:.0f} ms/send: sequential {sequential:,.0f} msg/s, "
+          f"bounded concurrency x{sender.concurrency} {fanout:,.0f} msg/s (rate cap disabled)")
+
+
+async def run(sizes: list) -> None:
+    for accounts in sizes:
+        await bench_accrual(accounts)
+    await bench_fanout(3000, 0.05)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes))
@@ -0,0 +1,57 @@
+"""Concurrent /status chart throughput: pyplot on the event loop vs the cached worker pool.
+
+    python benchmarks/bench_charts.py [--requests 200] [--distinct 50]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from charts import ChartCache, render_performance_chart
+
+
+async def measure_lag(stop: asyncio.Event, samples: list) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.005)
+        samples.append(time.perf_counter() - start - 0.005)
+
+
+async def timed(label: str, calls) -> None:
+    stop = asyncio.Event()
+    lag = []
+    lag_task = asyncio.create_task(measure_lag(stop, lag))
+    start = time.perf_counter()
+    await asyncio.gather(*calls)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await lag_task
+    print(f"{label}: {len(calls) / elapsed:,.1f} status/sec, max loop lag {max(lag, default=0) * 1000:.1f} ms")
+
+
+async def run(requests: int, distinct: int, workers: int) -> None:
+    balances = [(1.0 + i % distinct, 0.1 * (i % distinct)) for i in range(requests)]
+
+    async def inline(investment, profit):
+        render_performance_chart(investment, profit)
+
+    await timed("on-loop render (baseline)", [inline(*b) for b in balances])
+
+    cache = ChartCache(max_workers=workers)
+    await cache.get(0.0, 0.0)  # start the pool outside the measurement
+    await timed(f"worker pool x{workers}, cold cache", [cache.get(*b) for b in balances])
+    await timed(f"worker pool x{workers}, warm cache", [cache.get(*b) for b in balances])
+    print(f"cache stats: {cache.stats()}")
+    cache.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.distinct, args.workers))
@@ -0,0 +1,60 @@
+"""Deadline index with many pending deposits: scheduling, idle ticks, sweeps and restarts.
+
+    python benchmarks/bench_deadlines.py [--pending 1000000]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deadlines import DeadlineIndex, DEADLINE_REMINDER
+
+
+async def run(pending: int, due: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        index = DeadlineIndex(path)
+        index.open()
+        now = time.time()
+
+        start = time.perf_counter()
+        for chat_id in range(pending):
+            index.schedule(chat_id, DEADLINE_REMINDER, now + random.uniform(0, 3600) + 600)
+        elapsed = time.perf_counter() - start
+        print(f"scheduled {len(index):,} deadlines: {elapsed / len(index) * 1e6:.2f} us each")
+
+        start = time.perf_counter()
+        await index.flush_async()
+        print(f"persisted in {time.perf_counter() - start:.2f} s")
+
+        ticks = 10_000
+        start = time.perf_counter()
+        for _ in range(ticks):
+            index.pop_due(now)
+        print(f"idle tick with {len(index):,} pending: {(time.perf_counter() - start) / ticks * 1e6:.2f} us")
+
+        for chat_id in range(due):
+            index.schedule(pending + chat_id, DEADLINE_REMINDER, now - 1)
+        start = time.perf_counter()
+        swept = index.pop_due(now)
+        print(f"sweep of {sum(map(len, swept.values())):,} due deadlines: {(time.perf_counter() - start) * 1000:.1f} ms")
+        index.close()
+
+        start = time.perf_counter()
+        restarted = DeadlineIndex(path)
+        restarted.open()
+        print(f"restart: reloaded {len(restarted):,} deadlines in {time.perf_counter() - start:.2f} s")
+        restarted.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pending", type=int, default=1_000_000)
+    parser.add_argument("--due", type=int, default=10_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.pending, args.due))
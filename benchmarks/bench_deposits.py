@@ -0,0 +1,114 @@
+"""On-chain deposit verification against a local Solana/Ethereum JSON-RPC fake.
+
+    python benchmarks/bench_deposits.py [--pending 1000 10000 100000] [--transfers 100]
+
+For each size, that many deposits are pending on the deposit wallet (amounts
+shared between many users) and ``--transfers`` transfers arrive: most pay a
+pending deposit, some pay an amount nobody expects, and some pay the premium
+fee in ETH. Reports the RPC requests and calls per poll, which should not
+grow with the number pending, and how many transfers are matched on that
+poll, the next one, after a restart and by a second worker polling the same
+wallets. tests/test_deposits.py checks that each is matched exactly once.
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fakes import FakeChainRPC
+from ledger import LedgerEntry, KIND_DEPOSIT, STATE_PENDING
+from deposits import DepositVerifier, CHAIN_SOLANA, CHAIN_ETHEREUM, REF_PREMIUM_FEE
+
+DEPOSIT_WALLET = "6RDXuY6aaREBsb9nWJrqh7eqjwHDLcUz2AUkUhfCsMRR"
+PREMIUM_SOL_WALLET = "Au3amLeXRnAsPx6UxMscEi2Q5JZmdkBghycSz1f5ivh"
+ETH_WALLET = "0x4348409d1D959680b315DA798FEf5C3b6C64cdBB"
+WALLETS = {DEPOSIT_WALLET: CHAIN_SOLANA, PREMIUM_SOL_WALLET: CHAIN_SOLANA, ETH_WALLET: CHAIN_ETHEREUM}
+
+
+def pending_deposits(count: int, now: float) -> list:
+    rng = random.Random(count)
+    # Round amounts, so many users share each one.
+    return [
+        (chat_id, LedgerEntry(1, KIND_DEPOSIT, rng.choice((0.5, 1, 1.5, 2, 5, 10, 25)) + rng.randrange(100) / 100,
+                              now - rng.uniform(60, 3600), STATE_PENDING), DEPOSIT_WALLET)
+        for chat_id in range(count)
+    ]
+
+
+def verifier(path: str, rpc: FakeChainRPC, shard: tuple = None) -> DepositVerifier:
+    v = DepositVerifier(path, WALLETS, shard=shard, solana_rpc_url=rpc.url, eth_rpc_url=rpc.url)
+    v.open()
+    return v
+
+
+async def bench(count: int, transfers: int) -> None:
+    now = time.time()
+    pending = pending_deposits(count, now)
+    rng = random.Random(transfers)
+    with FakeChainRPC() as rpc, tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "deposits.db")
+        first = verifier(path, rpc)
+        start = time.perf_counter()
+        first.load(pending)
+        load = time.perf_counter() - start
+        fee_payers = range(count, count + transfers // 10)
+        for chat_id in fee_payers:
+            await first.expect_fee(chat_id, [(PREMIUM_SOL_WALLET, 2.0), (ETH_WALLET, 0.013)], now - 30)
+        # Catch up with the chain head before any payment arrives.
+        await first.poll()
+
+        payers = rng.sample(pending, transfers - 2 * len(fee_payers))
+        for _, entry, wallet in payers:
+            rpc.send_sol(wallet, entry.amount, entry.timestamp + 20)
+        for _ in fee_payers:
+            rpc.send_sol(DEPOSIT_WALLET, 1234.5678)  # nobody expects this amount
+            rpc.send_eth(ETH_WALLET, 0.013)
+        requests, calls = rpc.requests, rpc.calls
+        start = time.perf_counter()
+        matches = await first.poll()
+        elapsed = time.perf_counter() - start
+        expected = len(payers) + len(fee_payers)
+        print(f"{count:>9,} pending: {rpc.requests - requests} RPC requests ({rpc.calls - calls} calls) "
+              f"for {transfers} transfers, poll {elapsed * 1e3:.1f} ms, index load {load * 1e3:.0f} ms")
+        fees = sum(m.expectation.ref == REF_PREMIUM_FEE for m in matches)
+        print(f"  {len(matches)} of {expected} payable transfers matched, {fees} of {len(fee_payers)} premium fees")
+
+        requests = rpc.requests
+        again = await first.poll()
+        print(f"  idle poll: {len(again)} matches, {rpc.requests - requests} RPC requests")
+        await first.aclose()
+
+        restarted = verifier(path, rpc)
+        recovered = restarted.load(pending)
+        print(f"  after a restart: {len(recovered)} claimed payments handed back for crediting, "
+              f"{len(await restarted.poll())} matched on the next poll")
+        await restarted.aclose()
+
+        # A second worker without a cursor of its own re-reads the same transfers.
+        other = verifier(path, rpc, shard=(1, 2))
+        other.load(pending)
+        print(f"  a second worker re-reading the same transfers: {len(await other.poll())} matched")
+        await other.aclose()
+
+
+async def run(sizes: list, transfers: int) -> None:
+    for count in sizes:
+        await bench(count, transfers)
+    print("Polling each payer separately would cost one RPC request per pending deposit per poll.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pending", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--transfers", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.pending, args.transfers))
+
+
+if __name__ == "__main__":
+    main()
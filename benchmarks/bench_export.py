@@ -0,0 +1,140 @@
+"""Streaming export of accounts and ledger in bounded memory.
+
+    python benchmarks/bench_export.py [--users 100000] [--rows-per-user 50] [--formats csv jsonl parquet]
+
+Fills a database with ``--users`` accounts and ``--rows-per-user`` ledger
+entries each, then exports it in each format with the ``export.py`` CLI in
+a child process, at a tenth of the size and at full size: peak RSS should
+stay about the same. The full target is ``--users 1000000`` (50M rows).
+Also times filtered exports and the worst event-loop lag while an
+in-process export runs. tests/test_export.py checks the exports' contents.
+"""
+import os
+import sys
+import gzip
+import time
+import sqlite3
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from storage import SCHEMA, ACCOUNT_FIELDS
+from export import export, export_async
+
+DAY = 86400
+START = 1_767_225_600  # 2026-01-01 UTC
+
+
+def fill(path: str, users: int, rows_per_user: int) -> None:
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executescript(SCHEMA)
+    conn.execute("BEGIN")
+    conn.executemany(
+        f"INSERT INTO accounts (chat_id, {', '.join(ACCOUNT_FIELDS)}) VALUES ({', '.join('?' * (len(ACCOUNT_FIELDS) + 1))})",
+        ((chat_id, 1, f"trader{chat_id}", 1, 1, 1, 10.0, 12.5, 0.0, None, 2.5, rows_per_user)
+         for chat_id in range(users)),
+    )
+    # One entry a day per user, so a date range selects a fixed share of rows.
+    conn.executemany(
+        "INSERT INTO ledger (chat_id, seq, kind, amount, ts, state, note) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((chat_id, seq, "INTEREST", 0.285, START + seq * DAY, "confirmed", "")
+         for chat_id in range(users) for seq in range(1, rows_per_user + 1)),
+    )
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def export_in_child(path: str, out: str, fmt: str) -> tuple:
+    """Run the CLI in a child process; return (seconds, peak RSS in MB)."""
+    start = time.perf_counter()
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, "export.py"), "--db", path, "--out", out,
+                                    "--format", fmt], stdout=subprocess.DEVNULL, stderr=stderr)
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - start
+        if status:
+            stderr.seek(0)
+            raise RuntimeError(stderr.read().decode().strip().splitlines()[-1])
+    return elapsed, usage.ru_maxrss / 1024
+
+
+def count_lines(path: str) -> int:
+    with gzip.open(path, "rb") as f:
+        return sum(1 for _ in f)
+
+
+async def loop_lag_during_export(path: str, out: str) -> float:
+    """Worst event-loop lag seen while an export runs on its worker thread."""
+    worst = 0.0
+    task = asyncio.ensure_future(export_async(path, out, "csv"))
+    while not task.done():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        worst = max(worst, time.perf_counter() - start - 0.01)
+    await task
+    return worst
+
+
+def run(users: int, rows_per_user: int, formats: list) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for size in (users // 10, users):
+            path = os.path.join(tmp, f"finances-{size}.db")
+            start = time.perf_counter()
+            fill(path, size, rows_per_user)
+            rows = size * rows_per_user
+            print(f"{size:,} users, {rows:,} ledger rows ({os.path.getsize(path) / 1e6:,.0f} MB database, "
+                  f"filled in {time.perf_counter() - start:.0f} s)")
+            for fmt in formats:
+                out = os.path.join(tmp, f"out-{fmt}-{size}")
+                try:
+                    elapsed, peak = export_in_child(path, out, fmt)
+                except RuntimeError as e:
+                    print(f"  {fmt:<8} skipped: {e}")
+                    continue
+                written = sum(os.path.getsize(os.path.join(out, name)) for name in os.listdir(out))
+                results[(fmt, size)] = peak
+                print(f"  {fmt:<8} {elapsed:7.1f} s  {(size + rows) / elapsed:>10,.0f} rows/s  "
+                      f"peak RSS {peak:6.0f} MB  output {written / 1e6:,.1f} MB")
+                if fmt == "csv":
+                    ledger = next(name for name in os.listdir(out) if name.startswith("ledger"))
+                    print(f"  csv ledger: {count_lines(os.path.join(out, ledger)) - 1:,} of {rows:,} rows")
+            if size != users:
+                os.remove(path)
+        for fmt in formats:
+            if (fmt, users) in results:
+                small, large = results[(fmt, users // 10)], results[(fmt, users)]
+                print(f"{fmt}: peak RSS {small:.0f} MB at {users // 10:,} users, {large:.0f} MB at {users:,}")
+
+        path = os.path.join(tmp, f"finances-{users}.db")
+        out = os.path.join(tmp, "filtered")
+        start = time.perf_counter()
+        result = export(path, out, "csv", chat_id=7)
+        print(f"chat filter: {result['accounts'][1]} account, {result['ledger'][1]} entries "
+              f"in {(time.perf_counter() - start) * 1e3:.0f} ms")
+        days = min(10, rows_per_user)
+        start = time.perf_counter()
+        result = export(path, out, "jsonl", since=START + DAY, until=START + (days + 1) * DAY)
+        print(f"date filter: {result['ledger'][1]:,} entries in {days} days "
+              f"in {time.perf_counter() - start:.1f} s")
+        lag = asyncio.run(loop_lag_during_export(path, os.path.join(tmp, "async")))
+        print(f"export on a worker thread: worst event-loop lag {lag * 1e3:.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--rows-per-user", type=int, default=50)
+    parser.add_argument("--formats", nargs="+", default=["csv", "jsonl", "parquet"])
+    args = parser.parse_args()
+    run(args.users, args.rows_per_user, args.formats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Chat intent matching throughput as the intent table grows.
+
+    python benchmarks/bench_intents.py [--messages 50000] [--intents 4 50 500]
+
+Compares the old if/elif substring chain with the compiled matcher, with
+the response cache off (every message distinct) and on (a realistic mix of
+repeated messages). The responses themselves are covered by
+tests/test_intents.py.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intents import IntentMatcher, CHAT_INTENTS, CHAT_DEFAULT_RESPONSE
+
+FILLER = ("the", "my", "what", "is", "about", "today", "price", "please", "this", "shipping", "wallet",
+          "how", "do", "i", "can", "you", "tell", "me", "fees", "sol", "eth", "coin", "week", "trend")
+
+def legacy_response(text: str) -> str:
+    text = text.strip().lower()
+    if "hello" in text or "hi" in text:
+        return CHAT_INTENTS[0][2]
+    elif "market" in text:
+        return CHAT_INTENTS[1][2]
+    elif "investment" in text:
+        return CHAT_INTENTS[2][2]
+    return CHAT_DEFAULT_RESPONSE
+
+
+def synthetic_intents(count: int) -> list:
+    rng = random.Random(count)
+    intents = list(CHAT_INTENTS)
+    for i in range(len(intents), count):
+        phrases = (f"topic{i}", f"about topic{i}", f"{rng.choice(FILLER)} keyword{i}")
+        intents.append((f"intent{i}", phrases, f"Response for intent {i}."))
+    return intents
+
+
+def make_messages(count: int, intents: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    messages = []
+    for n in range(count):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(3, 30))]
+        if rng.random() < 0.5:
+            words.insert(rng.randrange(len(words) + 1), f"topic{rng.randrange(3, max(intents, 4))}")
+        # A serial number makes every message distinct, so nothing is cached.
+        messages.append(" ".join(words) + f" #{n}")
+    return messages
+
+
+def bench(label: str, respond, messages: list) -> None:
+    start = time.perf_counter()
+    for message in messages:
+        respond(message)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {len(messages) / elapsed:>12,.0f} msg/s {elapsed / len(messages) * 1e6:>8.2f} us/msg")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50_000)
+    parser.add_argument("--intents", type=int, nargs="+", default=[4, 50, 500])
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages, max(args.intents))
+    bench("legacy if/elif (4 intents)", legacy_response, messages)
+    for count in args.intents:
+        start = time.perf_counter()
+        matcher = IntentMatcher(synthetic_intents(count), CHAT_DEFAULT_RESPONSE, cache_size=0)
+        compile_ms = (time.perf_counter() - start) * 1e3
+        bench(f"automaton, {count} intents, uncached", matcher.match, messages)
+        print(f"{'':<40} compiled in {compile_ms:.2f} ms")
+
+    # Chat traffic repeats itself: 200 distinct messages, drawn with a skew.
+    matcher = IntentMatcher(synthetic_intents(max(args.intents)), CHAT_DEFAULT_RESPONSE)
+    distinct = make_messages(200, max(args.intents), seed=2)
+    rng = random.Random(3)
+    repeated = [distinct[min(int(rng.expovariate(1 / 20)), 199)] for _ in range(args.messages)]
+    bench(f"automaton, {max(args.intents)} intents, cached", matcher.match, repeated)
+    print(f"{'':<40} {matcher.respond.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Memory held per user by the account store, measured with tracemalloc.
+
+    python benchmarks/bench_memory.py [--sizes 100000 1000000] [--days 30]
+
+Loads the same accounts the way the store used to (one dict per account)
+and the way it does now (one slotted ``Account`` per account) and reports
+bytes per user, including the chat id key and the field values. Then runs
+``--days`` daily interest accruals on the smallest size and reports how
+much memory per user they add; history stays in the ledger table.
+tests/test_storage.py holds the thresholds.
+"""
+import os
+import sys
+import time
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import AccountStore, ACCOUNT_FIELDS
+
+_COLUMNS = ", ".join(ACCOUNT_FIELDS)
+
+
+def populate(path: str, users: int) -> None:
+    store = AccountStore(path)
+    store.open()
+    store.close()
+    conn = sqlite3.connect(path)
+    # Onboarded users with a deposit, a tenth of them with one still pending.
+    conn.executemany(
+        f"INSERT INTO accounts (chat_id, {_COLUMNS}) VALUES ({', '.join('?' * (len(ACCOUNT_FIELDS) + 1))})",
+        ((5_000_000_000 + chat_id, 1, f"user{chat_id}", 1, chat_id % 2, 1, 1.0 + chat_id % 10, 1.0 + chat_id % 10,
+          1.5 if chat_id % 10 == 0 else 0.0, time.time() if chat_id % 10 == 0 else None, 0.0, 1)
+         for chat_id in range(users)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def dict_accounts(path: str) -> dict:
+    """Accounts loaded as the store did before ``Account``: one dict each."""
+    conn = sqlite3.connect(path)
+    rows = conn.execute(f"SELECT chat_id, {_COLUMNS} FROM accounts").fetchall()
+    conn.close()
+    return {row[0]: dict(zip(ACCOUNT_FIELDS, row[1:])) for row in rows}
+
+
+def traced(load) -> tuple:
+    """Return (object, bytes it still holds) for ``load()``."""
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = load()
+        return result, tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+def load_store(path: str) -> AccountStore:
+    store = AccountStore(path)
+    store.open()
+    return store
+
+
+async def accrue(store: AccountStore, days: int) -> None:
+    for _ in range(days):
+        await store.accrue_interest(0.01)
+
+
+def run(sizes: list, days: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        for users in sizes:
+            path = os.path.join(tmp, f"finances-{users}.db")
+            populate(path, users)
+            accounts, before = traced(lambda: dict_accounts(path))
+            del accounts
+            store, after = traced(lambda: load_store(path))
+            print(f"{users:>9,} users: dict {before / users:6.0f} B/user ({before / 1e6:6.1f} MB), "
+                  f"Account {after / users:6.0f} B/user ({after / 1e6:6.1f} MB)")
+            print(f"  slotted accounts take {after / before:.0%} of the dict footprint")
+
+            if users == sizes[0] and days:
+                tracemalloc.start()
+                try:
+                    baseline = tracemalloc.get_traced_memory()[0]
+                    asyncio.run(accrue(store, days))
+                    grown = tracemalloc.get_traced_memory()[0] - baseline
+                finally:
+                    tracemalloc.stop()
+                entries = sum(account.ledger_count for _, account in store.items())
+                print(f"  {days} daily accruals ({entries:,} ledger entries in all) add {grown / users:.1f} B/user")
+            store.close()
+            os.remove(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--days", type=int, default=30, help="daily accruals run on the smallest size")
+    args = parser.parse_args()
+    run(args.sizes, args.days)
+
+
+if __name__ == "__main__":
+    main()
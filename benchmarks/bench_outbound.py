@@ -0,0 +1,162 @@
+"""Outgoing messages through the outbound scheduler against a flood-controlled Bot API fake.
+
+    python benchmarks/bench_outbound.py [--messages 300] [--cap 30]
+
+The fake accepts ``--cap`` sends per second and answers the rest with a
+429 and a Retry-After. Compares unscheduled sends with the scheduler at the
+cap and above it (the 429s must be retried, not lost), measures how long a
+reply waits behind a notification fan-out with and without priorities, and
+how many messages three overlapping fan-outs to the same chats take once
+merged. tests/test_sender.py checks the behaviour; this only reports it.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.error import RetryAfter
+from telegram.ext import ExtBot
+from telegram.request import HTTPXRequest
+
+from fakes import FakeBotAPI
+from sender import OutboundScheduler, NotificationSender, PRIORITY_BACKGROUND
+
+TOKEN = "123456:outbound"
+
+
+async def make_bot(url: str, scheduler: OutboundScheduler = None) -> ExtBot:
+    bot = ExtBot(TOKEN, base_url=f"{url}/bot", rate_limiter=scheduler,
+                 request=HTTPXRequest(connection_pool_size=64))
+    await bot.initialize()
+    return bot
+
+
+async def unscheduled(url: str, messages: int, concurrency: int) -> tuple:
+    bot = await make_bot(url)
+    chats = iter(range(messages))
+    delivered = 0
+
+    async def worker():
+        nonlocal delivered
+        for chat_id in chats:
+            try:
+                await bot.send_message(chat_id, "✅ Daily interest")
+                delivered += 1
+            except RetryAfter:
+                pass
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await bot.shutdown()
+    return delivered, elapsed
+
+
+async def fanout(url: str, messages: int, rate: float) -> tuple:
+    scheduler = OutboundScheduler(global_rate=rate)
+    bot = await make_bot(url, scheduler)
+    sender = NotificationSender(scheduler)
+    start = time.perf_counter()
+    await sender.send_many(bot, ((chat_id, "✅ Daily interest") for chat_id in range(messages)))
+    elapsed = time.perf_counter() - start
+    await bot.shutdown()
+    return sender, scheduler, elapsed
+
+
+async def reply_latency(url: str, messages: int, cap: float, prioritized: bool) -> list:
+    scheduler = OutboundScheduler(global_rate=cap)
+    bot = await make_bot(url, scheduler)
+    sender = NotificationSender(scheduler)
+    background = asyncio.create_task(
+        sender.send_many(bot, ((chat_id, "✅ Daily interest") for chat_id in range(messages)))
+    )
+    rate_limit_args = None if prioritized else {"priority": PRIORITY_BACKGROUND}
+    latencies = []
+
+    async def reply(chat_id):
+        start = time.perf_counter()
+        await bot.send_message(chat_id, "Here is your balance", rate_limit_args=rate_limit_args)
+        latencies.append(time.perf_counter() - start)
+
+    replies = []
+    await asyncio.sleep(1.0)
+    for i in range(int(messages / cap) * 5):
+        if background.done():
+            break
+        replies.append(asyncio.create_task(reply(10**9 + i)))
+        await asyncio.sleep(0.2)
+    await asyncio.gather(background, *replies)
+    await bot.shutdown()
+    return latencies
+
+
+async def merged(url: str, chats: int, cap: float) -> tuple:
+    scheduler = OutboundScheduler(global_rate=cap)
+    bot = await make_bot(url, scheduler)
+    sender = NotificationSender(scheduler)
+    texts = ("✅ Your deposit has been added to your investment balance.",
+             "⏰ Reminder: Please check your transaction status for deposit confirmation.",
+             "✅ Daily interest of 0.0100 SOL has been added to your account.")
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        sender.send_many(bot, ((chat_id, text) for chat_id in range(chats)), parse_mode="Markdown")
+        for text in texts
+    ))
+    elapsed = time.perf_counter() - start
+    await bot.shutdown()
+    return sender, elapsed
+
+
+def percentile(values: list, fraction: float) -> float:
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run(messages: int, cap: float, concurrency: int) -> None:
+    print(f"{messages} messages, Bot API fake capped at {cap:.0f} msg/s")
+
+    with FakeBotAPI(rate_limit=cap) as api:
+        delivered, elapsed = await unscheduled(api.url, messages, concurrency)
+        print(f"unscheduled x{concurrency}: {delivered} delivered ({delivered / elapsed:.1f} msg/s), "
+              f"{messages - delivered} lost to 429s")
+
+    with FakeBotAPI(rate_limit=cap) as api:
+        sender, scheduler, elapsed = await fanout(api.url, messages, cap)
+        print(f"scheduled at the cap: {sender.sent} delivered ({sender.sent / elapsed:.1f} msg/s), "
+              f"{sender.failed} failed, {api.rejected} 429s")
+
+    with FakeBotAPI(rate_limit=cap) as api:
+        sender, scheduler, elapsed = await fanout(api.url, messages, cap * 2)
+        print(f"scheduled at twice the cap: {sender.sent} delivered ({sender.sent / elapsed:.1f} msg/s), "
+              f"{sender.failed} failed, {api.rejected} 429s, {scheduler.retried} retried after Retry-After")
+
+    results = {}
+    for prioritized in (False, True):
+        with FakeBotAPI(rate_limit=cap) as api:
+            latencies = await reply_latency(api.url, messages, cap, prioritized)
+        label = "prioritized" if prioritized else "FIFO"
+        results[label] = percentile(latencies, 0.95)
+        print(f"replies during a fan-out, {label}: {len(latencies)} replies, "
+              f"p50 {statistics.median(latencies) * 1e3:.0f} ms, p95 {results[label] * 1e3:.0f} ms")
+
+    chats = messages // 3
+    with FakeBotAPI(rate_limit=cap) as api:
+        sender, elapsed = await merged(api.url, chats, cap)
+        print(f"three overlapping fan-outs to {chats} chats: {3 * chats} notifications in {sender.sent} messages "
+              f"({sender.coalesced} merged, {sender.failed} failed) in {elapsed:.1f} s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--cap", type=float, default=30.0, help="messages/second the fake accepts")
+    parser.add_argument("--concurrency", type=int, default=30, help="sends in flight when unscheduled")
+    args = parser.parse_args()
+    asyncio.run(run(args.messages, args.cap, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Support outbox against a local SMTP sink (requires aiosmtpd).
+
+Compares handler-path cost of enqueueing with the old connect-per-query
+send, and measures drain throughput over the reused connection.
+
+    python benchmarks/bench_outbox.py [--messages 500]
+"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import smtplib
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiosmtpd.controller import Controller
+
+from outbox import SupportOutbox, SMTPSender
+
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run(messages: int) -> None:
+    handler = CountingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    try:
+        baseline = max(1, messages // 10)
+        start = time.perf_counter()
+        for i in range(baseline):
+            server = smtplib.SMTP(controller.hostname, controller.port)
+            server.sendmail("bot@example.com", "support@example.com", f"Subject: q{i}\n\nquery")
+            server.quit()
+        per_query = (time.perf_counter() - start) / baseline
+        print(f"connect-per-query (old handler path): {per_query * 1000:.2f} ms/query")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            outbox = SupportOutbox(os.path.join(tmp, "outbox.db"),
+                                   SMTPSender(controller.hostname, controller.port, starttls=False))
+            outbox.open()
+            start = time.perf_counter()
+            for i in range(messages):
+                await outbox.enqueue("bot@example.com", "support@example.com", f"Support Query {i}", "query")
+            enqueue = (time.perf_counter() - start) / messages
+            print(f"enqueue (new handler path): {enqueue * 1e6:.1f} us/query, depth {outbox.depth}")
+
+            received_before = handler.received
+            start = time.perf_counter()
+            outbox.start()
+            while outbox.depth:
+                await asyncio.sleep(0.01)
+            elapsed = time.perf_counter() - start
+            print(f"drained {handler.received - received_before} messages in {elapsed:.2f} s "
+                  f"({messages / elapsed:,.0f} msg/s), stats: {outbox.stats()}")
+            await outbox.stop()
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.messages))
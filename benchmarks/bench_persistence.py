@@ -0,0 +1,109 @@
+"""Flush cost of conversation persistence against the number of active conversations.
+
+    python benchmarks/bench_persistence.py [--active 1000 10000 100000] [--changed 100]
+
+For each size, every active conversation has a state and user_data, then
+``--changed`` of them move on and the persistence is flushed. The SQLite
+backend writes only those; the stock PicklePersistence rewrites its file.
+Also reports the startup read and the first per-user load.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.ext import PicklePersistence, PersistenceInput
+
+from persistence import SQLitePersistence
+
+NAME = "onboard_conv"
+
+
+def user_data(user_id: int) -> dict:
+    return {"username": f"trader{user_id}", "registration_fee_paid": True, "invest_choice": bool(user_id % 2)}
+
+
+async def fill(persistence, active: int) -> None:
+    for user_id in range(active):
+        await persistence.update_conversation(NAME, (user_id, user_id), 2)
+        await persistence.update_user_data(user_id, user_data(user_id))
+
+
+async def change(persistence, changed: int, step: int) -> None:
+    for user_id in range(0, changed * step, step):
+        await persistence.update_conversation(NAME, (user_id, user_id), 3)
+        await persistence.update_user_data(user_id, {**user_data(user_id), "t_and_c_accepted": True})
+
+
+async def bench_sqlite(tmp: str, active: int, changed: int) -> tuple:
+    path = os.path.join(tmp, "sqlite.db")
+    persistence = SQLitePersistence(path)
+    await fill(persistence, active)
+    await persistence.flush_async()
+    await change(persistence, changed, active // changed)
+    start = time.perf_counter()
+    await persistence.flush_async()
+    flush = time.perf_counter() - start
+    persistence.close()
+
+    persistence = SQLitePersistence(path)
+    start = time.perf_counter()
+    conversations = await persistence.get_conversations(NAME)
+    load = time.perf_counter() - start
+    assert len(conversations) == active
+    start = time.perf_counter()
+    data = {}
+    await persistence.refresh_user_data(active - 1, data)
+    first_access = time.perf_counter() - start
+    assert data["username"] == f"trader{active - 1}"
+    persistence.close()
+    return flush, load, first_access, os.path.getsize(path)
+
+
+async def bench_pickle(tmp: str, active: int, changed: int) -> tuple:
+    path = os.path.join(tmp, "bot.pickle")
+    store_data = PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False)
+    persistence = PicklePersistence(path, store_data=store_data, on_flush=True)
+    await persistence.get_conversations(NAME)
+    await persistence.get_user_data()
+    await fill(persistence, active)
+    await persistence.flush()
+    await change(persistence, changed, active // changed)
+    start = time.perf_counter()
+    await persistence.flush()
+    flush = time.perf_counter() - start
+
+    persistence = PicklePersistence(path, store_data=store_data, on_flush=True)
+    start = time.perf_counter()
+    conversations = await persistence.get_conversations(NAME)
+    await persistence.get_user_data()
+    load = time.perf_counter() - start
+    assert len(conversations) == active
+    return flush, load, 0.0, os.path.getsize(path)
+
+
+async def run(sizes: list, changed: int) -> None:
+    print(f"{changed} conversations changed per flush")
+    print(f"{'backend':<8} {'active':>9} {'flush ms':>10} {'startup ms':>11} {'first load us':>14} {'file MB':>8}")
+    for active in sizes:
+        for label, bench in (("sqlite", bench_sqlite), ("pickle", bench_pickle)):
+            with tempfile.TemporaryDirectory() as tmp:
+                flush, load, first_access, size = await bench(tmp, active, min(changed, active))
+            first = f"{first_access * 1e6:.0f}" if first_access else "-"
+            print(f"{label:<8} {active:>9,} {flush * 1e3:>10.2f} {load * 1e3:>11.1f} {first:>14} {size / 1e6:>8.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--active", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--changed", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.active, args.changed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Cold-start budget for serverless deployments.
+
+Measures ``python -X importtime -c "import main"`` and the time from process
+start to the first webhook update handled, each in a fresh interpreter, and
+fails when either exceeds its threshold. Also fails if a module that should
+be imported lazily is loaded by ``import main``.
+
+    python benchmarks/bench_startup.py [--runs 5] [--max-import-ms 600] [--max-first-update-ms 1500]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+from fakes import FakeBotAPI, FakeDexScreener, FakeChainRPC, make_update
+
+# Only /status charting, /support mail and local .env loading need these.
+LAZY_MODULES = ("matplotlib", "smtplib", "email.mime", "dotenv", "nest_asyncio", "requests")
+
+FIRST_UPDATE_SCRIPT = """
+import time
+start = time.perf_counter()
+import sys, json
+sys.path.insert(0, {root!r})
+import main
+imported = time.perf_counter()
+class Request:
+    headers = {{}}
+    def get_json(self, force=False, silent=False):
+        return {update}
+body, status = main.run_telegram_bot_entry(Request())
+done = time.perf_counter()
+eager = [m for m in {lazy!r} if m in sys.modules]
+print(json.dumps({{"import": imported - start, "first_update": done - start, "status": status, "eager": eager}}))
+"""
+
+
+def import_time(env: dict) -> tuple:
+    """Return (total import seconds of main, top 10 (module, seconds) by cumulative time)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(cumulative) / 1e6))
+    total = next(seconds for name, seconds in modules if name == "main")
+    top = sorted((m for m in modules if m[0] != "main"), key=lambda m: m[1], reverse=True)[:10]
+    return total, top
+
+
+def first_update(env: dict, update: dict) -> dict:
+    script = FIRST_UPDATE_SCRIPT.format(root=ROOT, update=update, lazy=LAZY_MODULES)
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(runs: int, max_import_ms: float, max_first_update_ms: float) -> int:
+    # The first webhook update also polls the deposit wallets.
+    with FakeBotAPI() as bot_api, FakeDexScreener() as dex, FakeChainRPC() as chain, \
+            tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env.setdefault("TELEGRAM_BOT", "123456:startup")
+        env.update({
+            "TELEGRAM_API_BASE_URL": f"{bot_api.url}/bot",
+            "DEXSCREENER_BASE_URL": dex.url,
+            "SOLANA_RPC_URL": chain.url,
+            "ETH_RPC_URL": chain.url,
+            "USER_FINANCES_DB": os.path.join(tmp, "startup.db"),
+        })
+        env.pop("TELEGRAM_WEBHOOK_SECRET", None)
+
+        imports, top = [], []
+        for _ in range(runs):
+            total, top = import_time(env)
+            imports.append(total)
+        results = [first_update(env, make_update(1, 42, "hello")) for _ in range(runs)]
+
+    import_ms = statistics.median(imports) * 1000
+    first_ms = statistics.median(r["first_update"] for r in results) * 1000
+    eager = sorted({m for r in results for m in r["eager"]})
+    print(f"import main (-X importtime): median {import_ms:.1f} ms over {runs} runs")
+    for name, seconds in top:
+        print(f"    {seconds * 1000:8.1f} ms  {name}")
+    print(f"time to first handled update: median {first_ms:.1f} ms")
+
+    failures = []
+    if import_ms > max_import_ms:
+        failures.append(f"import time {import_ms:.1f} ms exceeds {max_import_ms:.0f} ms")
+    if first_ms > max_first_update_ms:
+        failures.append(f"first update {first_ms:.1f} ms exceeds {max_first_update_ms:.0f} ms")
+    if eager:
+        failures.append(f"modules that should load lazily were imported: {', '.join(eager)}")
+    if any(r["status"] != 200 for r in results):
+        failures.append("first update was not handled successfully")
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=float(os.getenv("STARTUP_MAX_IMPORT_MS", "600")))
+    parser.add_argument("--max-first-update-ms", type=float,
+                        default=float(os.getenv("STARTUP_MAX_FIRST_UPDATE_MS", "1500")))
+    args = parser.parse_args()
+    sys.exit(main(args.runs, args.max_import_ms, args.max_first_update_ms))
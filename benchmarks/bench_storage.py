@@ -0,0 +1,66 @@
+"""Write throughput and warm-start time of the SQLite-backed account store.
+
+    python benchmarks/bench_storage.py [--accounts 100000]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import AccountStore
+from ledger import KIND_DEPOSIT, KIND_INTEREST, STATE_PENDING
+
+
+async def run(accounts: int, batch: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        store = AccountStore(path)
+        store.open()
+
+        start = time.perf_counter()
+        for chat_id in range(accounts):
+            store.update(chat_id, onboarded=True, username=f"user{chat_id}", registration_fee_paid=True,
+                         total_deposit=1.5, investment=1.5, pending_deposit=1.5, pending_deposit_time=time.time())
+            store.record(chat_id, KIND_DEPOSIT, 1.5, STATE_PENDING)
+            if chat_id % batch == batch - 1:
+                await store.flush_async()
+        await store.flush_async()
+        elapsed = time.perf_counter() - start
+        print(f"writes: {store.rows_written} rows in {store.flushes} transactions, "
+              f"{store.rows_written / elapsed:,.0f} rows/sec")
+
+        start = time.perf_counter()
+        for chat_id in range(accounts):
+            user_data = store[chat_id]
+            store.update(chat_id, investment=user_data["investment"] + 0.1)
+        hot = time.perf_counter() - start
+        print(f"request-path update: {hot / accounts * 1e6:.2f} us/op")
+
+        # One heavy user with a long interest history: /status and /history
+        # must not scale with it.
+        for _ in range(50_000):
+            store.record(0, KIND_INTEREST, 0.01)
+        await store.flush_async()
+        start = time.perf_counter()
+        for page in range(1, 101):
+            store.ledger_page(0, page)
+        print(f"history page (50k entries): {(time.perf_counter() - start) / 100 * 1e6:.1f} us/page")
+        store.close()
+
+        start = time.perf_counter()
+        warm = AccountStore(path)
+        warm.open()
+        print(f"warm start: {len(warm)} accounts in {(time.perf_counter() - start) * 1000:.1f} ms")
+        warm.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--accounts", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=5_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.accounts, args.batch))
@@ -0,0 +1,72 @@
+"""Token index behind /price and /top, refreshed against a local DexScreener fake.
+
+    python benchmarks/bench_token_index.py [--tokens 60] [--lookups 100000]
+
+Measures refresh time, lookup throughput, and a /price answer from the
+index against a live batched fetch. Refreshes, 304s, ranking and lookups
+are covered by tests/test_market_data.py.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fakes import FakeDexScreener, sample_tokens
+from market_data import MarketDataClient
+
+
+async def run(tokens: int, lookups: int, latency: float) -> None:
+    with FakeDexScreener(tokens=sample_tokens(tokens), latency=latency) as upstream:
+        client = MarketDataClient(base_url=upstream.url)
+        client.watchlist = []
+
+        start = time.perf_counter()
+        await client.refresh_index()
+        cold = time.perf_counter() - start
+        print(f"first refresh: {len(client.index)} tokens, {upstream.requests} requests in {cold * 1e3:.1f} ms")
+        start = time.perf_counter()
+        await client.refresh_index()
+        print(f"unchanged refresh: {upstream.not_modified} not-modified responses "
+              f"in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+        queries = [t["symbol"] for t in upstream.tokens[:10]]
+        index = client.index
+        start = time.perf_counter()
+        for i in range(lookups):
+            index.get(queries[i % len(queries)])
+        elapsed = time.perf_counter() - start
+        print(f"single lookups: {lookups / elapsed:,.0f}/s ({elapsed / lookups * 1e6:.2f} us each)")
+
+        start = time.perf_counter()
+        for _ in range(lookups // 10):
+            index.resolve(queries)
+        elapsed = time.perf_counter() - start
+        print(f"/price with 10 tokens from the index: {elapsed / (lookups // 10) * 1e6:.2f} us")
+
+        # The same answer fetched live: one batched tokens request per call.
+        addresses = ",".join(t["tokenAddress"] for t in upstream.tokens[:10])
+        http = client._get_client()
+        start = time.perf_counter()
+        for _ in range(20):
+            r = await http.get(f"/tokens/v1/solana/{addresses}")
+            r.raise_for_status()
+        elapsed = time.perf_counter() - start
+        print(f"/price with 10 tokens fetched live (upstream latency {latency * 1e3:.0f} ms): "
+              f"{elapsed / 20 * 1e3:.2f} ms")
+        await client.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake DexScreener latency (seconds)")
+    args = parser.parse_args()
+    asyncio.run(run(args.tokens, args.lookups, args.latency))
+
+
+if __name__ == "__main__":
+    main()
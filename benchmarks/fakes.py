@@ -0,0 +1,390 @@
+"""Local stand-ins for the upstream services the bot talks to.
+
+Each fake runs its own event loop on a background thread so that benchmarks
+measure the bot's loop, not the fake's.
+"""
+import json
+import time
+import asyncio
+import threading
+
+
+class FakeHTTPServer:
+    """Minimal keep-alive HTTP/1.1 server; subclasses implement handle()."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self._requests = 0
+        self._counter = None
+        self._process = None
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def requests(self) -> int:
+        return self._counter.value if self._counter is not None else self._requests
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def handle(self, method: str, path: str, headers: dict, body: bytes):
+        return 404, {}, b""
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def start_process(self):
+        """Run the server in a child process so it does not share the GIL with the bot."""
+        import multiprocessing
+        self._counter = multiprocessing.Value("q", 0)
+        parent, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=self._run_child, args=(child,), daemon=True)
+        self._process.start()
+        self.port = parent.recv()
+        return self
+
+    def _run_child(self, conn) -> None:
+        self._ready = _Announce(self, conn)
+        self._run()
+
+    def stop(self) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join(timeout=5)
+        elif self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._serve, self.host, self.port, backlog=4096)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.close()
+
+    async def _serve(self, reader, writer) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+                if self._counter is not None:
+                    with self._counter.get_lock():
+                        self._counter.value += 1
+                else:
+                    self._requests += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                status, extra_headers, payload = await self.handle(method, target, headers, body)
+                head = [f"HTTP/1.1 {status} X", f"Content-Length: {len(payload)}"]
+                head += [f"{k}: {v}" for k, v in extra_headers.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+class _Announce:
+    """Stands in for the ready Event in a child process: reports the bound port."""
+
+    def __init__(self, server: FakeHTTPServer, conn):
+        self.server = server
+        self.conn = conn
+
+    def set(self) -> None:
+        self.conn.send(self.server.port)
+
+
+def json_response(data, status: int = 200, headers: dict = None):
+    extra = {"Content-Type": "application/json"}
+    extra.update(headers or {})
+    return status, extra, json.dumps(data).encode()
+
+
+# --- DexScreener ---
+def sample_tokens(n: int = 10) -> list:
+    """Top-boosts entries; name, symbol and price feed the pairs the fake serves."""
+    return [
+        {
+            "url": f"https://dexscreener.com/solana/token{i}",
+            "chainId": "solana",
+            "tokenAddress": f"Token{i:040d}",
+            "name": f"Token {i}",
+            "symbol": f"TK{i}",
+            "price": 1.0 + i / 10,
+            "amount": 100 - i,
+            "totalAmount": 1000 - i,
+        }
+        for i in range(n)
+    ]
+
+
+def sample_pair(token: dict, liquidity: float = 50_000.0) -> dict:
+    return {
+        "chainId": token["chainId"],
+        "dexId": "raydium",
+        "url": token.get("url", ""),
+        "pairAddress": f"Pair{token['tokenAddress']}",
+        "baseToken": {"address": token["tokenAddress"], "name": token["name"], "symbol": token["symbol"]},
+        "quoteToken": {"address": "So11111111111111111111111111111111111111112", "name": "Wrapped SOL", "symbol": "SOL"},
+        "priceNative": str(token["price"] / 150),
+        "priceUsd": str(token["price"]),
+        "priceChange": {"h24": 5.0},
+        "volume": {"h24": 10 * liquidity},
+        "liquidity": {"usd": liquidity},
+    }
+
+
+class FakeDexScreener(FakeHTTPServer):
+    """Serves top boosts and batched token pairs, with ETags for conditional requests."""
+
+    def __init__(self, tokens: list = None, **kwargs):
+        super().__init__(**kwargs)
+        self.tokens = tokens if tokens is not None else sample_tokens()
+        self.started_at = time.time()
+        self.not_modified = 0
+
+    def _conditional(self, headers: dict, data):
+        response = json_response(data)
+        etag = f'"{hash(response[2]) & 0xFFFFFFFF:08x}"'
+        if headers.get("if-none-match") == etag:
+            self.not_modified += 1
+            return 304, {"ETag": etag}, b""
+        response[1]["ETag"] = etag
+        return response
+
+    async def handle(self, method, path, headers, body):
+        if path.startswith("/token-boosts/top/v1"):
+            return self._conditional(headers, self.tokens)
+        if path.startswith("/tokens/v1/"):
+            _, _, _, chain_id, addresses = path.split("/", 4)
+            wanted = set(addresses.split(","))
+            pairs = [sample_pair(t) for t in self.tokens if t["chainId"] == chain_id and t["tokenAddress"] in wanted]
+            return self._conditional(headers, pairs)
+        return json_response({"error": "not found"}, status=404)
+
+
+# --- Chain JSON-RPC ---
+class FakeChainRPC(FakeHTTPServer):
+    """Solana and Ethereum JSON-RPC (batched or not) over transfers added with ``send_*``.
+
+    Serves getSignaturesForAddress/getTransaction for Solana and
+    eth_blockNumber/eth_getBlockByNumber for Ethereum, one block per transfer.
+    ``calls`` counts JSON-RPC calls; ``requests`` counts HTTP requests.
+    Transaction ids and block numbers in ``unavailable`` are answered with
+    null, as a node does before it has them.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+        self.unavailable = set()
+        self._solana = []
+        self._transactions = {}
+        self._blocks = [{"number": "0x0", "timestamp": hex(int(time.time())), "transactions": []}]
+
+    def send_sol(self, wallet: str, sol: float, timestamp: float = None, sender: str = "Payer1111") -> str:
+        signature = f"sig{len(self._transactions) + 1:060d}"
+        lamports = round(sol * 10**9)
+        block_time = int(time.time() if timestamp is None else timestamp)
+        self._solana.append((wallet, signature, block_time))
+        self._transactions[signature] = {
+            "blockTime": block_time,
+            "meta": {"err": None, "preBalances": [lamports + 10**7, 5 * 10**9], "postBalances": [10**7 - 5000, 5 * 10**9 + lamports]},
+            "transaction": {"message": {"accountKeys": [sender, wallet, "11111111111111111111111111111111"]},
+                            "signatures": [signature]},
+        }
+        return signature
+
+    def send_eth(self, wallet: str, eth: float, timestamp: float = None) -> str:
+        number = len(self._blocks)
+        tx_hash = f"0x{number:064x}"
+        self._blocks.append({
+            "number": hex(number),
+            "timestamp": hex(int(time.time() if timestamp is None else timestamp)),
+            "transactions": [{"hash": tx_hash, "from": "0x" + "11" * 20, "to": wallet.lower(),
+                              "value": hex(round(eth * 10**18))}],
+        })
+        return tx_hash
+
+    def _call(self, method: str, params: list):
+        if method == "getSignaturesForAddress":
+            wallet, options = params[0], (params[1] if len(params) > 1 else {})
+            result = []
+            before = options.get("before")
+            for address, signature, block_time in reversed(self._solana):
+                if signature == options.get("until"):
+                    break
+                if before is not None:
+                    # Listing starts after (older than) ``before``.
+                    if signature == before:
+                        before = None
+                    continue
+                if address == wallet:
+                    result.append({"signature": signature, "blockTime": block_time, "err": None})
+            return result[: options.get("limit", 1000)]
+        if method == "getTransaction":
+            return None if params[0] in self.unavailable else self._transactions.get(params[0])
+        if method == "eth_blockNumber":
+            return hex(len(self._blocks) - 1)
+        if method == "eth_getBlockByNumber":
+            number = int(params[0], 16)
+            return self._blocks[number] if number < len(self._blocks) and number not in self.unavailable else None
+        raise KeyError(method)
+
+    def _answer(self, request: dict) -> dict:
+        self.calls += 1
+        try:
+            return {"jsonrpc": "2.0", "id": request.get("id"), "result": self._call(request["method"], request.get("params", []))}
+        except KeyError:
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": -32601, "message": "Method not found"}}
+
+    async def handle(self, method, path, headers, body):
+        payload = json.loads(body or b"null")
+        if isinstance(payload, list):
+            return json_response([self._answer(request) for request in payload])
+        return json_response(self._answer(payload))
+
+
+# --- Telegram Bot API ---
+def parse_form(headers: dict, body: bytes) -> dict:
+    content_type = headers.get("content-type", "")
+    if content_type.startswith("application/json"):
+        return json.loads(body or b"{}")
+    if content_type.startswith("multipart/form-data"):
+        from email.parser import BytesParser
+        from email.policy import HTTP
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+        )
+        fields = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            payload = part.get_payload(decode=True)
+            fields[name] = payload if part.get_filename() else payload.decode()
+        return fields
+    from urllib.parse import parse_qsl
+    return dict(parse_qsl(body.decode()))
+
+
+class FakeBotAPI(FakeHTTPServer):
+    """Answers the Bot API methods the handlers use and records what was sent.
+
+    Point the bot at it with ``Application.builder().base_url(f"{url}/bot")``.
+    With ``rate_limit`` set, send requests beyond that many per second (with
+    as many in a burst) are refused with a 429 and a Retry-After, as
+    Telegram's flood control does.
+    """
+
+    def __init__(self, rate_limit: float = None, retry_after: int = 1, **kwargs):
+        super().__init__(**kwargs)
+        self.sent = []
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.rejected = 0
+        self._allowance = rate_limit
+        self._checked = time.monotonic()
+        self._message_id = 0
+        self._file_id = 0
+
+    def _flood_controlled(self) -> bool:
+        if self.rate_limit is None:
+            return False
+        now = time.monotonic()
+        self._allowance = min(self.rate_limit, self._allowance + (now - self._checked) * self.rate_limit)
+        self._checked = now
+        if self._allowance < 1:
+            self.rejected += 1
+            return True
+        self._allowance -= 1
+        return False
+
+    def _message(self, fields: dict) -> dict:
+        self._message_id += 1
+        chat_id = int(fields.get("chat_id", 0))
+        return {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": fields.get("text", ""),
+        }
+
+    async def handle(self, method, path, headers, body):
+        api_method = path.rsplit("/", 1)[-1]
+        fields = parse_form(headers, body)
+        if api_method.startswith("send") and self._flood_controlled():
+            return json_response({"ok": False, "error_code": 429,
+                                  "description": f"Too Many Requests: retry after {self.retry_after}",
+                                  "parameters": {"retry_after": self.retry_after}}, status=429)
+        if api_method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot",
+                      "can_join_groups": True, "can_read_all_group_messages": False,
+                      "supports_inline_queries": False}
+        elif api_method in ("sendMessage", "sendDocument"):
+            result = self._message(fields)
+        elif api_method == "sendPhoto":
+            result = self._message(fields)
+            photo = fields.get("photo")
+            if isinstance(photo, bytes):
+                self._file_id += 1
+                photo = f"photo-{self._file_id}"
+            result["photo"] = [{"file_id": photo, "file_unique_id": photo, "width": 400, "height": 300}]
+        elif api_method == "getUpdates":
+            await asyncio.sleep(min(float(fields.get("timeout", 0) or 0), 1.0))
+            result = []
+        else:
+            result = True
+        self.sent.append((api_method, fields))
+        return json_response({"ok": True, "result": result})
+
+
+def make_update(update_id: int, chat_id: int, text: str) -> dict:
+    """Build the JSON of a private-chat text message update."""
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}", "username": f"user{chat_id}"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        command = text.split(" ", 1)[0]
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+    return {"update_id": update_id, "message": message}
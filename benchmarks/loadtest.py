@@ -0,0 +1,231 @@
+"""Offline load test: thousands of synthetic users against a fake Bot API.
+
+Each user is a closed loop that sends the next message only after the bot
+has finished handling the previous one. The users walk through the
+onboarding conversation, /deposit, /status, /history, /support and free-text
+chat, and some take the free-tier path. Updates go through the
+Application's own update queue, the same way polling delivers them.
+
+    python benchmarks/loadtest.py [--users 1000] [--bot-latency 0.02] [--workers 4]
+
+Reports p50/p95/p99 latency per handler, event-loop lag and updates/sec.
+"""
+import os
+import sys
+import time
+import random
+import socket
+import asyncio
+import logging
+import argparse
+import threading
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fakes import FakeBotAPI, FakeDexScreener, FakeChainRPC, make_update
+
+PREMIUM_SCENARIO = [
+    ("/start", "onboard_start"),
+    ("yes", "onboard_response"),
+    ("trader{user}", "onboard_username"),
+    ("I paid", "payment_confirmation"),
+    ("no", "invest_choice"),
+    ("1.5", "deposit_amount"),
+    ("/deposit 2", "deposit_command"),
+    ("/status", "status_command"),
+    ("/history", "history_command"),
+    ("/support I have an issue with my deposit", "support_command"),
+    ("hello, how is the market?", "chat_handler"),
+]
+FREE_SCENARIO = [
+    ("/start", "onboard_start"),
+    ("no", "onboard_response"),
+    ("what about investment?", "chat_handler"),
+]
+# Deposit poll interval for the run, so fees are verified within seconds.
+FEE_POLL_INTERVAL = 0.5
+
+
+def percentile(samples: list, p: int) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method="inclusive")[p - 1]
+
+
+class LoadTest:
+    def __init__(self, submit, users: int, free_ratio: float, think_time: float, pay_fee=None):
+        # submit(update) hands one update, in Bot API JSON form, to the bot.
+        self.submit = submit
+        # pay_fee() sends one premium fee on the fake chain.
+        self.pay_fee = pay_fee
+        self.users = users
+        self.free_ratio = free_ratio
+        self.think_time = think_time
+        self.latencies = {}
+        self.lag = []
+        self._waiting = {}
+        self._update_id = 0
+
+    def done(self, update_id: int) -> None:
+        future = self._waiting.pop(update_id, None)
+        if future is not None and not future.done():
+            future.set_result(time.perf_counter())
+
+    async def _send(self, chat_id: int, text: str, label: str) -> None:
+        self._update_id += 1
+        update_id = self._update_id
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[update_id] = future
+        start = time.perf_counter()
+        self.submit(make_update(update_id, chat_id, text))
+        try:
+            done = await asyncio.wait_for(future, timeout=120)
+        except asyncio.TimeoutError:
+            self._waiting.pop(update_id, None)
+            self.latencies.setdefault(f"{label} (timeout)", []).append(120.0)
+            return
+        self.latencies.setdefault(label, []).append(done - start)
+
+    async def _user(self, user: int) -> None:
+        scenario = FREE_SCENARIO if random.random() < self.free_ratio else PREMIUM_SCENARIO
+        chat_id = 1_000_000 + user
+        for text, label in scenario:
+            if label == "payment_confirmation" and self.pay_fee is not None:
+                self.pay_fee()
+            await self._send(chat_id, text.format(user=user), label)
+            if label == "payment_confirmation" and self.pay_fee is not None:
+                # Commands after onboarding need the fee verified by a deposit poll.
+                await asyncio.sleep(2 * FEE_POLL_INTERVAL)
+            if self.think_time:
+                await asyncio.sleep(random.uniform(0, self.think_time))
+
+    async def _measure_lag(self, stop: asyncio.Event) -> None:
+        interval = 0.01
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.lag.append(time.perf_counter() - start - interval)
+
+    async def run(self) -> float:
+        stop = asyncio.Event()
+        lag_task = asyncio.create_task(self._measure_lag(stop))
+        start = time.perf_counter()
+        await asyncio.gather(*(self._user(user) for user in range(self.users)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await lag_task
+        return elapsed
+
+    def report(self, elapsed: float) -> None:
+        total = sum(len(samples) for samples in self.latencies.values())
+        print(f"{'handler':<24}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for label, samples in sorted(self.latencies.items()):
+            print(f"{label:<24}{len(samples):>8}{percentile(samples, 50) * 1000:>10.1f}"
+                  f"{percentile(samples, 95) * 1000:>10.1f}{percentile(samples, 99) * 1000:>10.1f}"
+                  f"{max(samples) * 1000:>10.1f}")
+        print(f"event-loop lag: p50 {percentile(self.lag, 50) * 1000:.1f} ms, "
+              f"p99 {percentile(self.lag, 99) * 1000:.1f} ms, max {max(self.lag, default=0) * 1000:.1f} ms")
+        print(f"throughput: {total} updates in {elapsed:.2f} s = {total / elapsed:,.0f} updates/sec")
+
+
+def closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run(args, chain) -> None:
+    import main
+    from telegram import Update
+    from telegram.ext import TypeHandler
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("outbox").setLevel(logging.ERROR)
+    application = main.build_application()
+    loadtest = LoadTest(
+        lambda data: application.update_queue.put_nowait(Update.de_json(data, application.bot)),
+        args.users, args.free_ratio, args.think_time,
+        lambda: chain.send_sol(main.PREMIUM_SOL_WALLET, main.PREMIUM_FEE_SOL),
+    )
+
+    # Runs after every other handler group, so it marks an update as done.
+    async def done(update, context) -> None:
+        loadtest.done(update.update_id)
+    application.add_handler(TypeHandler(Update, done), group=1000)
+
+    await application.initialize()
+    await main.on_startup(application)
+    await application.start()
+    try:
+        elapsed = await loadtest.run()
+    finally:
+        await application.stop()
+        await main.on_shutdown(application)
+        await application.shutdown()
+    loadtest.report(elapsed)
+
+
+async def run_workers(args, chain) -> None:
+    import main
+    from workers import WorkerPool
+    logging.getLogger().setLevel(logging.WARNING)
+    pool = WorkerPool(main.run_worker, args.workers, acks=True)
+    pool.start()
+    loadtest = LoadTest(pool.dispatch, args.users, args.free_ratio, args.think_time,
+                        lambda: chain.send_sol(main.PREMIUM_SOL_WALLET, main.PREMIUM_FEE_SOL))
+    loop = asyncio.get_running_loop()
+
+    def read_acks() -> None:
+        while (update_id := pool.acks.get()) is not None:
+            loop.call_soon_threadsafe(loadtest.done, update_id)
+
+    reader = threading.Thread(target=read_acks, daemon=True)
+    reader.start()
+    # Wait for every worker to be up before timing anything.
+    await asyncio.gather(*(loadtest._send(-(i + 1), "/help", "warmup") for i in range(args.workers)))
+    loadtest.latencies.clear()
+    try:
+        elapsed = await loadtest.run()
+    finally:
+        await asyncio.to_thread(pool.stop)
+        pool.acks.put(None)
+    loadtest.report(elapsed)
+    print(f"updates per worker: {pool.dispatched}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--free-ratio", type=float, default=0.2, help="share of users taking the free-tier path")
+    parser.add_argument("--think-time", type=float, default=0.0, help="max random pause between a user's messages")
+    parser.add_argument("--bot-latency", type=float, default=0.02, help="fake Bot API latency per call (seconds)")
+    parser.add_argument("--concurrent-updates", type=int, default=1, help="TELEGRAM_CONCURRENT_UPDATES for the run")
+    parser.add_argument("--dex-latency", type=float, default=0.2, help="fake DexScreener latency (seconds)")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes, sharded by chat (1 = in-process)")
+    args = parser.parse_args()
+
+    # The fakes run in their own processes so they do not compete with the bot for the GIL.
+    bot_api = FakeBotAPI(latency=args.bot_latency).start_process()
+    dex = FakeDexScreener(latency=args.dex_latency).start_process()
+    chain = FakeChainRPC().start()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault("TELEGRAM_BOT", "123456:loadtest")
+        os.environ["TELEGRAM_API_BASE_URL"] = f"{bot_api.url}/bot"
+        os.environ["DEXSCREENER_BASE_URL"] = dex.url
+        os.environ["SOLANA_RPC_URL"] = os.environ["ETH_RPC_URL"] = chain.url
+        os.environ["USER_FINANCES_DB"] = os.path.join(tmp, "loadtest.db")
+        os.environ["TELEGRAM_CONCURRENT_UPDATES"] = str(args.concurrent_updates)
+        os.environ["DEPOSIT_POLL_INTERVAL"] = str(FEE_POLL_INTERVAL)
+        # The fake has no flood control; measure the bot, not Telegram's limits.
+        os.environ["TELEGRAM_GLOBAL_RATE"] = os.environ["TELEGRAM_PER_CHAT_RATE"] = "1e9"
+        # Support mail goes to a closed local port; the outbox just retries.
+        os.environ["SMTP_SERVER"] = "127.0.0.1"
+        os.environ["SMTP_PORT"] = str(closed_port())
+        os.environ["SMTP_STARTTLS"] = "false"
+        asyncio.run(run_workers(args, chain) if args.workers > 1 else run(args, chain))
+        print(f"fake Bot API calls: {bot_api.requests}, DexScreener calls: {dex.requests}")
+    bot_api.stop()
+    dex.stop()
+    chain.stop()
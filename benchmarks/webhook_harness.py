@@ -0,0 +1,100 @@
+"""Replay recorded updates through the Cloud Functions webhook entry point.
+
+Runs against local fakes of the Bot API and DexScreener, and reports the
+cold-start cost (import + first request) separately from warm requests.
+
+    python benchmarks/webhook_harness.py [--updates recorded.jsonl] [--users 50]
+
+Each line of a recorded file is one Update as Telegram POSTs it.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fakes import FakeBotAPI, FakeDexScreener, FakeChainRPC, make_update
+
+SCENARIO = ["/start", "yes", "trader", "I paid", "no", "1.5", "/status", "/deposit 2", "/history", "hello"]
+
+
+class FakeRequest:
+    """The subset of the Flask request object the entry point uses."""
+
+    def __init__(self, data: dict, headers: dict = None):
+        self._data = data
+        self.headers = headers or {}
+
+    def get_json(self, force: bool = False, silent: bool = False):
+        return self._data
+
+
+def synthetic_updates(users: int) -> list:
+    updates = []
+    for step, text in enumerate(SCENARIO):
+        for user in range(users):
+            updates.append(make_update(len(updates) + 1, 10_000 + user, text))
+    return updates
+
+
+def percentile(samples: list, p: float) -> float:
+    return statistics.quantiles(samples, n=100, method="inclusive")[int(p) - 1] if len(samples) > 1 else samples[0]
+
+
+def run(updates: list) -> None:
+    with FakeBotAPI() as bot_api, FakeDexScreener() as dex, FakeChainRPC() as chain, tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault("TELEGRAM_BOT", "123456:harness")
+        os.environ["TELEGRAM_API_BASE_URL"] = f"{bot_api.url}/bot"
+        os.environ["DEXSCREENER_BASE_URL"] = dex.url
+        os.environ["SOLANA_RPC_URL"] = os.environ["ETH_RPC_URL"] = chain.url
+        os.environ["USER_FINANCES_DB"] = os.path.join(tmp, "harness.db")
+        os.environ.pop("TELEGRAM_WEBHOOK_SECRET", None)
+        os.environ["TELEGRAM_GLOBAL_RATE"] = os.environ["TELEGRAM_PER_CHAT_RATE"] = "1e9"
+        # Poll often enough that fees paid during the replay are verified before /status.
+        os.environ["DEPOSIT_POLL_INTERVAL"] = "0.01"
+
+        start = time.perf_counter()
+        import main
+        import_seconds = time.perf_counter() - start
+
+        latencies = []
+        for data in updates:
+            if data.get("message", {}).get("text") == "I paid":
+                # Verified by a later request's deposit poll.
+                chain.send_sol(main.PREMIUM_SOL_WALLET, main.PREMIUM_FEE_SOL)
+            start = time.perf_counter()
+            body, status = main.run_telegram_bot_entry(FakeRequest(data))
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                print(f"update {data.get('update_id')} failed: {status} {body}")
+
+        cold, warm = latencies[0], latencies[1:]
+        print(f"import main: {import_seconds * 1000:.1f} ms")
+        print(f"cold request (init + handle): {cold * 1000:.1f} ms")
+        if warm:
+            print(f"warm requests: {len(warm)}, p50 {percentile(warm, 50) * 1000:.2f} ms, "
+                  f"p95 {percentile(warm, 95) * 1000:.2f} ms, p99 {percentile(warm, 99) * 1000:.2f} ms, "
+                  f"max {max(warm) * 1000:.2f} ms")
+        print(f"Bot API calls made: {bot_api.requests}")
+        application = main._webhook_application
+        if application is not None:
+            main._webhook_loop.run_until_complete(application.shutdown())
+            main._webhook_loop.run_until_complete(main.on_shutdown(application))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", help="JSON-lines file of recorded updates")
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+    if args.updates:
+        with open(args.updates) as f:
+            recorded = [json.loads(line) for line in f if line.strip()]
+    else:
+        recorded = synthetic_updates(args.users)
+    run(recorded)
@@ -0,0 +1,119 @@
+import io
+import os
+import asyncio
+import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "2"))
+CHART_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", "1024"))
+
+
+def render_performance_chart(investment: float, profit: float) -> bytes:
+    """Render the /status bar chart to PNG bytes.
+
+    Uses the object-oriented Figure API rather than pyplot, so there is no
+    global figure state shared between concurrent renders. matplotlib is
+    imported here so only chart workers pay for it.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(4, 3))
+    ax = fig.subplots()
+    ax.bar(['Investment', 'Profit'], [investment, profit], color=['blue', 'green'])
+    ax.set_title('Performance Overview')
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    return buf.getvalue()
+
+
+class ChartCache:
+    """LRU of rendered charts keyed by (investment, profit), rendered in a worker pool.
+
+    Once a chart has been uploaded, its Telegram file_id is remembered and
+    sent instead of the bytes.
+    """
+
+    def __init__(self, max_workers: int = CHART_WORKERS, max_entries: int = CHART_CACHE_SIZE):
+        self.max_workers = max_workers
+        self.max_entries = max_entries
+        self._executor = None
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.file_id_hits = 0
+        self.renders = 0
+
+    @staticmethod
+    def key(investment: float, profit: float) -> tuple:
+        # Rounded to the precision /status displays.
+        return (round(investment, 4), round(profit, 4))
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Forking a process that already runs threads (to_thread writers, the
+            # worker inbox pump) can copy held locks into the child.
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("forkserver"))
+        return self._executor
+
+    async def get(self, investment: float, profit: float):
+        """Return (photo, key), where photo is a file_id or a PNG buffer."""
+        key = self.key(investment, profit)
+        entry = self._entries.get(key)
+        if entry is None:
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.get_running_loop().create_task(self._render(key))
+                self._inflight[key] = task
+            entry = await asyncio.shield(task)
+        else:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        if entry["file_id"]:
+            self.file_id_hits += 1
+            return entry["file_id"], key
+        return io.BytesIO(entry["png"]), key
+
+    async def _render(self, key: tuple) -> dict:
+        try:
+            loop = asyncio.get_running_loop()
+            png = await loop.run_in_executor(self._get_executor(), render_performance_chart, *key)
+            self.renders += 1
+            entry = {"png": png, "file_id": None}
+            self._entries[key] = entry
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return entry
+        finally:
+            self._inflight.pop(key, None)
+
+    def remember_file_id(self, key: tuple, file_id: str) -> None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry["file_id"] = file_id
+            # The bytes are not needed once Telegram has the file.
+            entry["png"] = None
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "file_id_hits": self.file_id_hits,
+            "renders": self.renders,
+            "entries": len(self._entries),
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Shared instance used by /status.
+performance_charts = ChartCache()
@@ -0,0 +1,112 @@
+import os
+import heapq
+import logging
+import threading
+
+from workers import shard_sql
+from storage import connect, transaction, write_behind
+
+logger = logging.getLogger(__name__)
+
+# Deadline kinds.
+DEADLINE_REMINDER = "reminder"
+
+# Seconds between sweeps of the deadline index.
+DEADLINE_SWEEP_INTERVAL = float(os.getenv("DEADLINE_SWEEP_INTERVAL", "5"))
+
+DEADLINES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deadlines (
+    chat_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    due_at REAL NOT NULL,
+    PRIMARY KEY (chat_id, kind)
+) WITHOUT ROWID;
+"""
+
+
+class DeadlineIndex:
+    """Persisted min-heap of per-chat deadlines, swept periodically.
+
+    There is at most one deadline per (chat, kind); scheduling again keeps
+    the earlier due time, so repeated deposits never fire twice. Cancelled
+    deadlines are left in the heap and skipped when popped. Changes are
+    written behind in batches like the account store, and ``shard`` limits
+    the index to one worker's chats the same way.
+    """
+
+    def __init__(self, path: str, shard: tuple = None):
+        self.path = path
+        self.shard = shard
+        self._conn = None
+        self._lock = threading.Lock()
+        self._heap = []
+        self._due = {}
+        self._dirty = {}
+
+    def open(self) -> None:
+        if self._conn is not None:
+            return
+        conn = connect(self.path, DEADLINES_SCHEMA)
+        rows = conn.execute(f"SELECT due_at, chat_id, kind FROM deadlines WHERE 1{shard_sql(self.shard)}").fetchall()
+        self._due = {(chat_id, kind): due_at for due_at, chat_id, kind in rows}
+        self._heap = rows
+        heapq.heapify(self._heap)
+        self._conn = conn
+        logger.info(f"Loaded {len(self._due)} pending deadlines")
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        dirty = self._take_dirty()
+        if dirty is not None:
+            self._write(dirty)
+        self._conn.close()
+        self._conn = None
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def schedule(self, chat_id, kind: str, due_at: float) -> None:
+        key = (chat_id, kind)
+        current = self._due.get(key)
+        if current is not None and current <= due_at:
+            return
+        self._due[key] = due_at
+        self._dirty[key] = due_at
+        heapq.heappush(self._heap, (due_at, chat_id, kind))
+
+    def cancel(self, chat_id, kind: str) -> None:
+        key = (chat_id, kind)
+        if self._due.pop(key, None) is not None:
+            self._dirty[key] = None
+
+    def pop_due(self, now: float) -> dict:
+        """Remove every deadline due by ``now``; return {kind: [chat_id, ...]}."""
+        due = {}
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            due_at, chat_id, kind = heapq.heappop(heap)
+            key = (chat_id, kind)
+            if self._due.get(key) != due_at:
+                continue  # cancelled or superseded
+            del self._due[key]
+            self._dirty[key] = None
+            due.setdefault(kind, []).append(chat_id)
+        return due
+
+    def _take_dirty(self):
+        dirty, self._dirty = self._dirty, {}
+        return dirty or None
+
+    def _write(self, dirty: dict) -> None:
+        upserts = [(chat_id, kind, due_at) for (chat_id, kind), due_at in dirty.items() if due_at is not None]
+        deletes = [key for key, due_at in dirty.items() if due_at is None]
+        with transaction(self._conn, self._lock) as conn:
+            conn.executemany("INSERT OR REPLACE INTO deadlines (chat_id, kind, due_at) VALUES (?, ?, ?)", upserts)
+            conn.executemany("DELETE FROM deadlines WHERE chat_id = ? AND kind = ?", deletes)
+
+    def _restore(self, dirty: dict) -> None:
+        self._dirty = {**dirty, **self._dirty}
+
+    async def flush_async(self) -> None:
+        await write_behind(self._take_dirty, self._write, self._restore, "deadlines")
@@ -0,0 +1,549 @@
+import os
+import time
+import heapq
+import asyncio
+import logging
+import bisect
+import itertools
+import threading
+from dataclasses import dataclass
+
+import httpx
+
+from workers import shard_sql
+from storage import connect, transaction
+
+logger = logging.getLogger(__name__)
+
+SOLANA_RPC_URL = os.getenv("SOLANA_RPC_URL", "https://api.mainnet-beta.solana.com")
+ETH_RPC_URL = os.getenv("ETH_RPC_URL", "https://cloudflare-eth.com")
+# Seconds between polls of the deposit wallets.
+DEPOSIT_POLL_INTERVAL = float(os.getenv("DEPOSIT_POLL_INTERVAL", "15"))
+# A transfer matches a pending deposit made up to DEPOSIT_MATCH_SLACK seconds
+# after it and up to DEPOSIT_MATCH_WINDOW seconds before it. The premium fee is
+# paid before it is declared, so it may be declared up to the window after.
+DEPOSIT_MATCH_WINDOW = float(os.getenv("DEPOSIT_MATCH_WINDOW", "86400"))
+DEPOSIT_MATCH_SLACK = float(os.getenv("DEPOSIT_MATCH_SLACK", "600"))
+# Newest signatures read per Solana wallet and blocks read per poll.
+DEPOSIT_SIGNATURE_LIMIT = int(os.getenv("DEPOSIT_SIGNATURE_LIMIT", "200"))
+DEPOSIT_MAX_BLOCKS = int(os.getenv("DEPOSIT_MAX_BLOCKS", "20"))
+
+CHAIN_SOLANA = "solana"
+CHAIN_ETHEREUM = "ethereum"
+LAMPORTS_PER_SOL = 10**9
+WEI_PER_ETH = 10**18
+# Amounts match when equal to this many decimals, as the bot displays them.
+AMOUNT_DECIMALS = 4
+
+# Expectation reference for the premium access fee; ledger sequence numbers start at 1.
+REF_PREMIUM_FEE = 0
+
+DEPOSITS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deposit_cursors (
+    wallet TEXT PRIMARY KEY,
+    cursor TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS deposit_claims (
+    tx_id TEXT NOT NULL,
+    wallet TEXT NOT NULL,
+    chat_id INTEGER NOT NULL,
+    ref INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    claimed_at REAL NOT NULL,
+    PRIMARY KEY (tx_id, wallet)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS deposit_claims_ref ON deposit_claims (chat_id, ref);
+CREATE TABLE IF NOT EXISTS deposit_fee_expectations (
+    chat_id INTEGER NOT NULL,
+    wallet TEXT NOT NULL,
+    amount REAL NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (chat_id, wallet)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS deposit_unmatched (
+    tx_id TEXT NOT NULL,
+    wallet TEXT NOT NULL,
+    amount REAL NOT NULL,
+    ts REAL NOT NULL,
+    PRIMARY KEY (tx_id, wallet)
+) WITHOUT ROWID;
+"""
+
+
+def amount_key(amount: float) -> int:
+    return round(amount * 10**AMOUNT_DECIMALS)
+
+
+@dataclass(slots=True)
+class Transfer:
+    """An incoming transfer to one of the watched wallets."""
+    wallet: str
+    tx_id: str
+    amount: float
+    timestamp: float
+
+
+@dataclass(slots=True, eq=False)
+class Expectation:
+    """A payment a chat said it would make: a ledger entry or the premium fee."""
+    chat_id: int
+    ref: int
+    wallet: str
+    amount: float
+    created_at: float
+    live: bool = True
+
+
+@dataclass(slots=True)
+class DepositMatch:
+    expectation: Expectation
+    transfer: Transfer
+
+
+class PendingIndex:
+    """Pending payments by (wallet, amount), each list ordered by creation time.
+
+    A transfer is matched by a binary search of the expectations with its
+    wallet and amount, so the cost of a match barely depends on how many
+    payments are pending.
+    """
+
+    def __init__(self, window: float = DEPOSIT_MATCH_WINDOW, slack: float = DEPOSIT_MATCH_SLACK):
+        self.window = window
+        self.slack = slack
+        self._by_amount = {}
+        self._by_ref = {}
+        self._expiry = []
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._by_ref)
+
+    def add(self, expectation: Expectation) -> None:
+        key = (expectation.chat_id, expectation.ref)
+        self._by_ref.setdefault(key, []).append(expectation)
+        candidates = self._by_amount.setdefault((expectation.wallet, amount_key(expectation.amount)), [])
+        bisect.insort(candidates, expectation, key=lambda e: e.created_at)
+        heapq.heappush(self._expiry, (expectation.created_at + self.window, next(self._sequence), expectation))
+
+    def add_many(self, expectations: list) -> None:
+        """Add in bulk: one sort and one heapify instead of an insertion each."""
+        touched = set()
+        for expectation in expectations:
+            self._by_ref.setdefault((expectation.chat_id, expectation.ref), []).append(expectation)
+            key = (expectation.wallet, amount_key(expectation.amount))
+            self._by_amount.setdefault(key, []).append(expectation)
+            touched.add(key)
+            self._expiry.append((expectation.created_at + self.window, next(self._sequence), expectation))
+        for key in touched:
+            self._by_amount[key].sort(key=lambda e: e.created_at)
+        heapq.heapify(self._expiry)
+
+    def _discard(self, expectation: Expectation) -> None:
+        expectation.live = False
+        key = (expectation.wallet, amount_key(expectation.amount))
+        candidates = self._by_amount[key]
+        candidates.remove(expectation)
+        if not candidates:
+            del self._by_amount[key]
+        siblings = self._by_ref[(expectation.chat_id, expectation.ref)]
+        siblings.remove(expectation)
+        if not siblings:
+            del self._by_ref[(expectation.chat_id, expectation.ref)]
+
+    def cancel(self, chat_id, ref: int) -> None:
+        """Drop every expectation of one payment, on whichever wallet."""
+        for expectation in list(self._by_ref.get((chat_id, ref), [])):
+            self._discard(expectation)
+
+    def match(self, transfer: Transfer):
+        """Take and return the expectation ``transfer`` pays, or None.
+
+        That is the one made most recently before the transfer, or failing
+        that the first one made within ``slack`` after it (within ``window``
+        for the premium fee).
+        """
+        candidates = self._by_amount.get((transfer.wallet, amount_key(transfer.amount)))
+        if not candidates:
+            return None
+        i = bisect.bisect_right(candidates, transfer.timestamp, key=lambda e: e.created_at)
+        if i and transfer.timestamp <= candidates[i - 1].created_at + self.window:
+            expectation = candidates[i - 1]
+        elif i < len(candidates) and candidates[i].created_at - self._lead(candidates[i]) <= transfer.timestamp:
+            expectation = candidates[i]
+        else:
+            return None
+        self._discard(expectation)
+        return expectation
+
+    def _lead(self, expectation: Expectation) -> float:
+        return self.window if expectation.ref == REF_PREMIUM_FEE else self.slack
+
+    def expire(self, now: float) -> list:
+        """Drop and return expectations whose window has closed."""
+        expired = []
+        while self._expiry and self._expiry[0][0] < now:
+            expectation = heapq.heappop(self._expiry)[2]
+            if expectation.live:
+                self._discard(expectation)
+                expired.append(expectation)
+        return expired
+
+
+class DepositVerifier:
+    """Confirms payments by watching the receiving wallets, not each payer.
+
+    Every poll reads the new incoming transfers of all wallets with batched
+    JSON-RPC requests: for Solana one request for the new signatures of every
+    wallet plus one per wallet that received any, for Ethereum one for the
+    head block plus one for the new blocks. The transfers are matched against
+    a ``PendingIndex``, so RPC cost is the same whether ten or a million
+    payments are pending.
+
+    A match is claimed in SQLite before it is reported: a transfer is never
+    credited twice, even by two worker processes polling with different
+    ``shard`` indexes, and ``load`` returns matches that were claimed but not
+    yet credited when the process stopped.
+
+    Pending deposits are ledger entries and are handed to ``load``; premium
+    fee payments have no ledger entry, so ``expect_fee`` stores them here.
+    Transfers that match nothing are kept, on disk too, for the match window,
+    since the fee is paid before it is declared.
+    """
+
+    def __init__(self, path: str, wallets: dict, shard: tuple = None, solana_rpc_url: str = SOLANA_RPC_URL,
+                 eth_rpc_url: str = ETH_RPC_URL, poll_interval: float = DEPOSIT_POLL_INTERVAL, timeout: float = 10.0):
+        self.path = path
+        self.wallets = wallets
+        self.shard = shard
+        self.rpc_urls = {CHAIN_SOLANA: solana_rpc_url, CHAIN_ETHEREUM: eth_rpc_url}
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.index = PendingIndex()
+        self._conn = None
+        self._lock = threading.Lock()
+        self._client = None
+        self._cursors = {}
+        self._unmatched = {}
+        self._polling = None
+        self.last_poll = 0.0
+        self.polls = 0
+        self.rpc_requests = 0
+        self.rpc_calls = 0
+        self.transfers_seen = 0
+        self.matched = 0
+
+    # --- Lifecycle ---
+    def open(self) -> None:
+        if self._conn is not None:
+            return
+        conn = connect(self.path, DEPOSITS_SCHEMA)
+        self._cursors = {wallet: cursor for wallet, cursor in conn.execute("SELECT wallet, cursor FROM deposit_cursors")}
+        rows = conn.execute("SELECT tx_id, wallet, amount, ts FROM deposit_unmatched")
+        self._unmatched = {(tx_id, wallet): Transfer(wallet, tx_id, amount, ts) for tx_id, wallet, amount, ts in rows}
+        self._conn = conn
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _cursor_key(self, wallet: str) -> str:
+        return wallet if self.shard is None else f"{wallet}#{self.shard[0]}"
+
+    def load(self, pending, fee_paid=None) -> list:
+        """Index pending payments; return those already claimed as matches.
+
+        ``pending`` yields (chat_id, LedgerEntry, wallet) for pending deposits.
+        Stored premium fee expectations are indexed too, unless
+        ``fee_paid(chat_id)`` says the fee is already recorded as paid.
+        """
+        shard = shard_sql(self.shard)
+        with self._lock:
+            claims = {(chat_id, ref): (tx_id, wallet, amount, claimed_at) for tx_id, wallet, chat_id, ref, amount, claimed_at
+                      in self._conn.execute("SELECT tx_id, wallet, chat_id, ref, amount, claimed_at FROM deposit_claims "
+                                            f"WHERE 1{shard}")}
+            fees = self._conn.execute(f"SELECT chat_id, wallet, amount, created_at FROM deposit_fee_expectations "
+                                      f"WHERE 1{shard}").fetchall()
+        expectations = [Expectation(chat_id, entry.seq, wallet, entry.amount, entry.timestamp)
+                        for chat_id, entry, wallet in pending]
+        settled = set()
+        for chat_id, wallet, amount, created_at in fees:
+            if fee_paid is not None and fee_paid(chat_id):
+                settled.add(chat_id)
+            else:
+                expectations.append(Expectation(chat_id, REF_PREMIUM_FEE, wallet, amount, created_at))
+        recovered = []
+        watched = []
+        recovered_keys = set()
+        for expectation in expectations:
+            key = (expectation.chat_id, expectation.ref)
+            claim = claims.get(key)
+            if claim is None:
+                watched.append(expectation)
+            elif key not in recovered_keys:
+                # A fee is expected on two wallets but claimed once.
+                recovered_keys.add(key)
+                tx_id, claim_wallet, amount, claimed_at = claim
+                expectation.live = False
+                recovered.append(DepositMatch(expectation, Transfer(claim_wallet, tx_id, amount, claimed_at)))
+        self.index.add_many(watched)
+        if settled:
+            with self._lock:
+                self._conn.executemany("DELETE FROM deposit_fee_expectations WHERE chat_id = ?",
+                                       [(chat_id,) for chat_id in settled])
+        logger.info(f"Watching {len(self.index)} pending payments; {len(recovered)} claimed but not yet credited")
+        return recovered
+
+    def expect(self, chat_id, ref: int, wallet: str, amount: float, created_at: float = None) -> None:
+        self.index.add(Expectation(chat_id, ref, wallet, amount, time.time() if created_at is None else created_at))
+
+    async def expect_fee(self, chat_id, payments: list, created_at: float = None) -> None:
+        """Watch for the premium fee paid as any one of ``payments``, [(wallet, amount), ...].
+
+        Replaces the chat's earlier fee expectations, in the index and on disk.
+        """
+        created_at = time.time() if created_at is None else created_at
+        self.index.cancel(chat_id, REF_PREMIUM_FEE)
+        for wallet, amount in payments:
+            self.index.add(Expectation(chat_id, REF_PREMIUM_FEE, wallet, amount, created_at))
+        await asyncio.to_thread(self._store_fee, chat_id, payments, created_at)
+
+    def _store_fee(self, chat_id, payments: list, created_at: float) -> None:
+        with transaction(self._conn, self._lock) as conn:
+            conn.execute("DELETE FROM deposit_fee_expectations WHERE chat_id = ?", (chat_id,))
+            conn.executemany(
+                "INSERT INTO deposit_fee_expectations (chat_id, wallet, amount, created_at) VALUES (?, ?, ?, ?)",
+                [(chat_id, wallet, amount, created_at) for wallet, amount in payments],
+            )
+
+    def cancel(self, chat_id, ref: int) -> None:
+        # Stored fee expectations are removed by ``load`` once the fee is recorded as paid.
+        self.index.cancel(chat_id, ref)
+
+    # --- JSON-RPC ---
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def _rpc_batch(self, chain: str, calls: list) -> list:
+        """Send [(method, params), ...] as one JSON-RPC batch; return results in call order."""
+        if not calls:
+            return []
+        payload = [{"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+                   for i, (method, params) in enumerate(calls)]
+        self.rpc_requests += 1
+        self.rpc_calls += len(calls)
+        r = await self._get_client().post(self.rpc_urls[chain], json=payload)
+        r.raise_for_status()
+        responses = {response["id"]: response for response in r.json()}
+        results = []
+        for i, (method, _) in enumerate(calls):
+            response = responses.get(i, {})
+            if "error" in response:
+                logger.warning(f"{chain} RPC {method} failed: {response['error']}")
+            results.append(response.get("result"))
+        return results
+
+    async def _solana_transfers(self, wallets: list, cursors: dict) -> list:
+        signature_lists = await self._rpc_batch(CHAIN_SOLANA, [
+            ("getSignaturesForAddress", [wallet, {"limit": DEPOSIT_SIGNATURE_LIMIT,
+                                                  **({"until": cursors[wallet]} if wallet in cursors else {})}])
+            for wallet in wallets
+        ])
+        # A full listing may leave out older signatures still newer than the
+        # cursor: page back to the cursor before moving it.
+        listings = {wallet: list(signatures or []) for wallet, signatures in zip(wallets, signature_lists)}
+        paging = [wallet for wallet in wallets if wallet in cursors and len(listings[wallet]) == DEPOSIT_SIGNATURE_LIMIT]
+        while paging:
+            pages = await self._rpc_batch(CHAIN_SOLANA, [
+                ("getSignaturesForAddress", [wallet, {"limit": DEPOSIT_SIGNATURE_LIMIT, "until": cursors[wallet],
+                                                      "before": listings[wallet][-1]["signature"]}])
+                for wallet in paging
+            ])
+            for wallet, page in zip(paging, pages):
+                listings[wallet].extend(page or [])
+            paging = [wallet for wallet, page in zip(paging, pages) if page and len(page) == DEPOSIT_SIGNATURE_LIMIT]
+        batches = []
+        for wallet, signatures in listings.items():
+            if not signatures:
+                continue
+            new = [s["signature"] for s in signatures if s.get("err") is None]
+            if new:
+                batches.append((wallet, [s["signature"] for s in signatures], new))
+            else:
+                # Only failed transactions, none of which paid anything.
+                cursors[wallet] = signatures[0]["signature"]
+        results = await asyncio.gather(*(
+            self._rpc_batch(CHAIN_SOLANA, [("getTransaction", [signature, {"encoding": "json",
+                                                                            "maxSupportedTransactionVersion": 0}])
+                                           for signature in new])
+            for _, _, new in batches
+        ))
+        transfers = []
+        for (wallet, listed, new), transactions in zip(batches, results):
+            unread = set()
+            for signature, tx in zip(new, transactions):
+                if not tx or not tx.get("meta"):
+                    # Null or an error: read it again on the next poll.
+                    unread.add(signature)
+                    continue
+                keys = tx["transaction"]["message"]["accountKeys"]
+                keys = [key["pubkey"] if isinstance(key, dict) else key for key in keys]
+                if wallet not in keys:
+                    continue
+                i = keys.index(wallet)
+                received = tx["meta"]["postBalances"][i] - tx["meta"]["preBalances"][i]
+                if received > 0:
+                    transfers.append(Transfer(wallet, signature, received / LAMPORTS_PER_SOL,
+                                              float(tx.get("blockTime") or time.time())))
+            # Signatures are newest first, and the next poll lists everything newer
+            # than the cursor: keep it just older than the oldest unread one.
+            oldest_unread = max((i for i, signature in enumerate(listed) if signature in unread), default=-1)
+            if oldest_unread == -1:
+                cursors[wallet] = listed[0]
+            elif oldest_unread + 1 < len(listed):
+                cursors[wallet] = listed[oldest_unread + 1]
+        return transfers
+
+    async def _ethereum_transfers(self, wallets: list, cursors: dict) -> list:
+        (head,) = await self._rpc_batch(CHAIN_ETHEREUM, [("eth_blockNumber", [])])
+        head = int(head, 16)
+        # Every Ethereum wallet shares one block cursor.
+        cursor_wallet = wallets[0]
+        start = int(cursors[cursor_wallet]) + 1 if cursor_wallet in cursors else head
+        end = min(head, start + DEPOSIT_MAX_BLOCKS - 1)
+        if end < start:
+            return []
+        blocks = await self._rpc_batch(CHAIN_ETHEREUM, [("eth_getBlockByNumber", [hex(n), True])
+                                                        for n in range(start, end + 1)])
+        # Stop at the first block that could not be read; the next poll starts there.
+        read = next((i for i, block in enumerate(blocks) if not block), len(blocks))
+        for wallet in wallets:
+            cursors[wallet] = str(start + read - 1)
+        watched = {wallet.lower(): wallet for wallet in wallets}
+        transfers = []
+        for block in blocks[:read]:
+            timestamp = float(int(block["timestamp"], 16))
+            for tx in block["transactions"]:
+                wallet = watched.get((tx.get("to") or "").lower())
+                value = int(tx.get("value", "0x0"), 16)
+                if wallet and value > 0:
+                    transfers.append(Transfer(wallet, tx["hash"], value / WEI_PER_ETH, timestamp))
+        return transfers
+
+    # --- Polling ---
+    def due(self) -> bool:
+        return time.monotonic() - self.last_poll >= self.poll_interval
+
+    async def poll(self) -> list:
+        """Read new transfers and return the matches claimed by this process.
+
+        Concurrent callers share one poll. Only the caller that started it
+        gets the matches, so each is credited once; the others get [] when
+        it is done.
+        """
+        if self._polling is not None:
+            await asyncio.shield(self._polling)
+            return []
+        polling = self._polling = asyncio.ensure_future(self._poll())
+        polling.add_done_callback(self._poll_done)
+        return await asyncio.shield(polling)
+
+    def _poll_done(self, polling: asyncio.Future) -> None:
+        if self._polling is polling:
+            self._polling = None
+
+    async def _poll(self) -> list:
+        self.last_poll = time.monotonic()
+        self.polls += 1
+        self.open()
+        by_chain = {}
+        for wallet, chain in self.wallets.items():
+            by_chain.setdefault(chain, []).append(wallet)
+        cursors = {wallet: self._cursors[self._cursor_key(wallet)] for wallet in self.wallets
+                   if self._cursor_key(wallet) in self._cursors}
+        fetchers = {CHAIN_SOLANA: self._solana_transfers, CHAIN_ETHEREUM: self._ethereum_transfers}
+        results = await asyncio.gather(*(fetchers[chain](wallets, cursors) for chain, wallets in by_chain.items()),
+                                       return_exceptions=True)
+        transfers = []
+        for chain, result in zip(by_chain, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error polling {chain} deposit wallets: {result}")
+            else:
+                transfers.extend(result)
+        self.transfers_seen += len(transfers)
+
+        # Transfers nothing matched yet are tried again until they leave the
+        # match window: the premium fee is declared after it is paid.
+        now = time.time()
+        buffered, self._unmatched = self._unmatched, {}
+        candidates = dict(buffered)
+        for transfer in transfers:
+            candidates[(transfer.tx_id, transfer.wallet)] = transfer
+        matches = []
+        for key, transfer in candidates.items():
+            expectation = self.index.match(transfer)
+            if expectation is not None:
+                matches.append(DepositMatch(expectation, transfer))
+            elif transfer.timestamp >= now - self.index.window:
+                self._unmatched[key] = transfer
+        unmatched = ([transfer for key, transfer in self._unmatched.items() if key not in buffered],
+                     [key for key in buffered if key not in self._unmatched])
+        expired_fees = []
+        for expectation in self.index.expire(now):
+            logger.info(f"No transfer of {expectation.amount} to {expectation.wallet} for chat {expectation.chat_id} "
+                        f"within {self.index.window:.0f}s; no longer watching")
+            if expectation.ref == REF_PREMIUM_FEE:
+                expired_fees.append((expectation.chat_id, expectation.wallet, expectation.created_at))
+        claimed = []
+        try:
+            claimed = await asyncio.to_thread(self._claim, matches, cursors, expired_fees, unmatched)
+        except Exception:
+            # Nothing was written and the cursors did not move, so the new
+            # transfers are read again; the buffered ones are kept.
+            self._unmatched = buffered
+            raise
+        finally:
+            won = {id(match) for match in claimed}
+            for match in matches:
+                if id(match) not in won:
+                    # Another worker or an earlier poll took this transfer.
+                    match.expectation.live = True
+                    self.index.add(match.expectation)
+        self.matched += len(claimed)
+        return claimed
+
+    def _claim(self, matches: list, cursors: dict, expired_fees: list = (), unmatched: tuple = ((), ())) -> list:
+        now = time.time()
+        claimed = []
+        with transaction(self._conn, self._lock, "BEGIN IMMEDIATE") as conn:
+            for match in matches:
+                transfer, expectation = match.transfer, match.expectation
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO deposit_claims (tx_id, wallet, chat_id, ref, amount, claimed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (transfer.tx_id, transfer.wallet, expectation.chat_id, expectation.ref, transfer.amount, now),
+                )
+                if cursor.rowcount == 1:
+                    claimed.append(match)
+            conn.executemany("INSERT OR REPLACE INTO deposit_cursors (wallet, cursor) VALUES (?, ?)",
+                             [(self._cursor_key(wallet), cursor) for wallet, cursor in cursors.items()])
+            # Unless the fee was declared again since.
+            conn.executemany("DELETE FROM deposit_fee_expectations WHERE chat_id = ? AND wallet = ? AND created_at = ?",
+                             expired_fees)
+            added, dropped = unmatched
+            conn.executemany("INSERT OR IGNORE INTO deposit_unmatched (tx_id, wallet, amount, ts) VALUES (?, ?, ?, ?)",
+                             [(t.tx_id, t.wallet, t.amount, t.timestamp) for t in added])
+            conn.executemany("DELETE FROM deposit_unmatched WHERE tx_id = ? AND wallet = ?", dropped)
+        for wallet, cursor in cursors.items():
+            self._cursors[self._cursor_key(wallet)] = cursor
+        return claimed
+
+    def stats(self) -> dict:
+        return {"pending": len(self.index), "polls": self.polls, "rpc_requests": self.rpc_requests,
+                "rpc_calls": self.rpc_calls, "transfers": self.transfers_seen, "matched": self.matched}
@@ -0,0 +1,232 @@
+"""Streaming export of accounts and ledger history for auditing.
+
+    python export.py [--format csv|jsonl|parquet] [--since 2026-01-01] [--until 2026-01-31] [--chat-id 123]
+                     [--db user_finances.db] [--out exports]
+
+Rows are read from the database in chunks and written as they arrive, so
+memory stays flat however large the tables are. CSV and JSONL are gzipped;
+Parquet (needs pyarrow) is zstd-compressed per row group.
+"""
+import os
+import csv
+import gzip
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+import argparse
+from datetime import datetime, timezone
+
+from storage import ACCOUNT_FIELDS, DEFAULT_ACCOUNT, USER_FINANCES_DB
+
+logger = logging.getLogger(__name__)
+
+# Directory exports are written to.
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+# Rows read and written at a time; also the Parquet row group size.
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "50000"))
+# gzip level for CSV/JSONL: 6 compresses nearly as well as 9 at a fraction of the CPU.
+EXPORT_GZIP_LEVEL = 6
+
+ACCOUNT_COLUMNS = ("chat_id",) + ACCOUNT_FIELDS
+LEDGER_COLUMNS = ("chat_id", "seq", "kind", "amount", "ts", "state", "note")
+
+
+def _column_type(default) -> str:
+    if isinstance(default, str):
+        return "string"
+    if default is None or isinstance(default, float):
+        return "float64"
+    return "int64"
+
+
+COLUMN_TYPES = {
+    "accounts": {"chat_id": "int64", **{field: _column_type(DEFAULT_ACCOUNT[field]) for field in ACCOUNT_FIELDS}},
+    "ledger": {"chat_id": "int64", "seq": "int64", "kind": "string", "amount": "float64", "ts": "float64",
+               "state": "string", "note": "string"},
+}
+
+
+# --- Readers ---
+def read_chunks(conn, sql: str, params: tuple = (), size: int = EXPORT_CHUNK_ROWS):
+    cursor = conn.execute(sql, params)
+    while rows := cursor.fetchmany(size):
+        yield rows
+
+
+def account_chunks(conn, chat_id: int = None, size: int = EXPORT_CHUNK_ROWS):
+    sql = f"SELECT {', '.join(ACCOUNT_COLUMNS)} FROM accounts"
+    if chat_id is not None:
+        return read_chunks(conn, sql + " WHERE chat_id = ?", (chat_id,), size)
+    return read_chunks(conn, sql + " ORDER BY chat_id", (), size)
+
+
+def ledger_chunks(conn, since: float = None, until: float = None, chat_id: int = None,
+                  size: int = EXPORT_CHUNK_ROWS):
+    conditions, params = [], []
+    if chat_id is not None:
+        conditions.append("chat_id = ?")
+        params.append(chat_id)
+    if since is not None:
+        conditions.append("ts >= ?")
+        params.append(since)
+    if until is not None:
+        conditions.append("ts < ?")
+        params.append(until)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    # Primary key order: the table is stored that way, so no sort is needed.
+    sql = f"SELECT {', '.join(LEDGER_COLUMNS)} FROM ledger{where} ORDER BY chat_id, seq"
+    return read_chunks(conn, sql, tuple(params), size)
+
+
+# --- Writers ---
+class CSVSink:
+    extension = ".csv.gz"
+
+    def __init__(self, path: str, columns: tuple, types: dict):
+        self._file = gzip.open(path, "wt", newline="", encoding="utf-8", compresslevel=EXPORT_GZIP_LEVEL)
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, rows: list) -> None:
+        self._writer.writerows(rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class JSONLSink:
+    extension = ".jsonl.gz"
+
+    def __init__(self, path: str, columns: tuple, types: dict):
+        self._file = gzip.open(path, "wt", encoding="utf-8", compresslevel=EXPORT_GZIP_LEVEL)
+        self._columns = columns
+        self._encode = json.JSONEncoder(ensure_ascii=False).encode
+
+    def write(self, rows: list) -> None:
+        columns, encode = self._columns, self._encode
+        self._file.write("".join(encode(dict(zip(columns, row))) + "\n" for row in rows))
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetSink:
+    extension = ".parquet"
+
+    def __init__(self, path: str, columns: tuple, types: dict):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)") from None
+        self._pa = pa
+        self._schema = pa.schema([(column, getattr(pa, types[column])()) for column in columns])
+        self._writer = pq.ParquetWriter(path, self._schema, compression="zstd")
+
+    def write(self, rows: list) -> None:
+        pa = self._pa
+        arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), self._schema)]
+        self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self._schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+SINKS = {"csv": CSVSink, "jsonl": JSONLSink, "parquet": ParquetSink}
+
+
+def write_table(chunks, sink_class, path: str, columns: tuple, types: dict) -> int:
+    """Write every chunk to ``path``; return the row count. The file appears only when complete."""
+    partial = path + ".part"
+    sink = sink_class(partial, columns, types)
+    rows = 0
+    try:
+        for chunk in chunks:
+            sink.write(chunk)
+            rows += len(chunk)
+    except BaseException:
+        sink.close()
+        os.remove(partial)
+        raise
+    sink.close()
+    os.replace(partial, path)
+    return rows
+
+
+# --- Export ---
+def export(db_path: str = USER_FINANCES_DB, out_dir: str = EXPORT_DIR, fmt: str = "csv", since: float = None,
+           until: float = None, chat_id: int = None, chunk_rows: int = EXPORT_CHUNK_ROWS) -> dict:
+    """Export accounts and ledger entries (``since`` <= ts < ``until``); return {table: (path, rows)}."""
+    sink_class = SINKS[fmt]
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, isolation_level=None)
+    result = {}
+    try:
+        # One read transaction: both files come from the same snapshot while the bot keeps writing.
+        conn.execute("BEGIN")
+        for table, chunks, columns in (
+            ("accounts", account_chunks(conn, chat_id, chunk_rows), ACCOUNT_COLUMNS),
+            ("ledger", ledger_chunks(conn, since, until, chat_id, chunk_rows), LEDGER_COLUMNS),
+        ):
+            path = os.path.join(out_dir, f"{table}-{stamp}{sink_class.extension}")
+            result[table] = (path, write_table(chunks, sink_class, path, columns, COLUMN_TYPES[table]))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    logger.info(f"Exported {result['accounts'][1]} accounts and {result['ledger'][1]} ledger entries as {fmt}")
+    return result
+
+
+async def export_async(*args, **kwargs) -> dict:
+    """``export`` on a worker thread, so the event loop keeps serving updates."""
+    return await asyncio.to_thread(export, *args, **kwargs)
+
+
+def parse_date(text: str) -> float:
+    """Midnight UTC of a YYYY-MM-DD date, as a timestamp."""
+    return datetime.strptime(text, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+
+
+def parse_command_args(args: list) -> dict:
+    """Options for ``export`` from ``[format] [since=YYYY-MM-DD] [until=YYYY-MM-DD] [chat=ID]``.
+
+    ``until`` is inclusive here, as people write date ranges. Raises ValueError.
+    """
+    options = {}
+    for arg in args:
+        key, _, value = arg.partition("=")
+        if not value and key.lower() in SINKS:
+            options["fmt"] = key.lower()
+        elif key == "since":
+            options["since"] = parse_date(value)
+        elif key == "until":
+            options["until"] = parse_date(value) + 86400
+        elif key == "chat":
+            options["chat_id"] = int(value)
+        else:
+            raise ValueError(f"Unknown export option: {arg}")
+    return options
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=USER_FINANCES_DB)
+    parser.add_argument("--out", default=EXPORT_DIR, help="directory the files are written to")
+    parser.add_argument("--format", choices=sorted(SINKS), default="csv")
+    parser.add_argument("--since", type=parse_date, help="first day of ledger entries (YYYY-MM-DD, UTC)")
+    parser.add_argument("--until", type=parse_date, help="last day of ledger entries, inclusive")
+    parser.add_argument("--chat-id", type=int)
+    parser.add_argument("--chunk-rows", type=int, default=EXPORT_CHUNK_ROWS)
+    args = parser.parse_args()
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    result = export(args.db, args.out, args.format, args.since, args.until + 86400 if args.until is not None else None,
+                    args.chat_id, args.chunk_rows)
+    for table, (path, rows) in result.items():
+        print(f"{table}: {rows} rows -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import os
+import re
+from collections import deque
+from functools import lru_cache
+
+# Distinct messages whose response is kept in memory.
+INTENT_CACHE_SIZE = int(os.getenv("INTENT_CACHE_SIZE", "4096"))
+
+WORD = re.compile(r"\w+")
+
+# (name, phrases, response). Earlier intents win when a message matches
+# several; phrases only match whole words ("hi" does not match "this").
+CHAT_INTENTS = [
+    ("greeting", ("hello", "hi"),
+     "Hello! How can I assist you with your finances today?"),
+    ("market", ("market", "markets"),
+     "The market is always fluctuating. Keep an eye on your investments and consider diversification."),
+    ("investment", ("investment", "investments"),
+     "Investing wisely involves both research and risk management. How can I help you with your investment queries?"),
+]
+CHAT_DEFAULT_RESPONSE = (
+    "I'm here to help with your finance-related questions. "
+    "Feel free to ask me anything about markets, investments, or strategies!"
+)
+
+
+class IntentMatcher:
+    """Aho-Corasick automaton over words, compiled from an intent table.
+
+    A message is scanned once, word by word, so matching cost depends on the
+    message length and not on the number of intents or phrases. Responses
+    are cached by lowercased text, so repeated messages skip tokenizing.
+    """
+
+    def __init__(self, intents: list, default: str, cache_size: int = INTENT_CACHE_SIZE):
+        self.names = [name for name, _, _ in intents]
+        self.responses = [response for _, _, response in intents]
+        self.default = default
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [None]
+        for priority, (_, phrases, _) in enumerate(intents):
+            for phrase in phrases:
+                self._add(WORD.findall(phrase.lower()), priority)
+        self._link()
+        self.respond = lru_cache(maxsize=cache_size)(self._respond)
+
+    def _add(self, words: list, priority: int) -> None:
+        node = 0
+        for word in words:
+            nxt = self._goto[node].get(word)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][word] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(None)
+            node = nxt
+        if self._out[node] is None or priority < self._out[node]:
+            self._out[node] = priority
+
+    def _link(self) -> None:
+        # Breadth-first, so each failure target is finished before it is used;
+        # a node's output is the best priority among itself and its suffixes.
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for word, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(word, 0)
+                inherited = self._out[self._fail[child]]
+                if inherited is not None and (self._out[child] is None or inherited < self._out[child]):
+                    self._out[child] = inherited
+                queue.append(child)
+
+    def classify(self, words) -> int:
+        """Return the index of the best matching intent, or None."""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        best = None
+        for word in words:
+            while node and word not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(word, 0)
+            priority = out[node]
+            if priority is not None and (best is None or priority < best):
+                best = priority
+                if best == 0:
+                    break
+        return best
+
+    def _respond(self, text: str) -> str:
+        best = self.classify(WORD.findall(text))
+        return self.default if best is None else self.responses[best]
+
+    def match(self, text: str) -> str:
+        return self.respond(text.strip().lower())
+
+
+# Shared matcher used by the finance chat handler.
+chat_intents = IntentMatcher(CHAT_INTENTS, CHAT_DEFAULT_RESPONSE)
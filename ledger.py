@@ -0,0 +1,36 @@
+import time
+from dataclasses import dataclass
+
+# Ledger entry kinds.
+KIND_ONBOARD = "ONBOARD"
+KIND_DEPOSIT = "DEPOSIT"
+KIND_INTEREST = "INTEREST"
+
+# Ledger entry states.
+STATE_PENDING = "pending"
+STATE_CONFIRMED = "confirmed"
+
+HISTORY_PAGE_SIZE = 20
+
+
+@dataclass(slots=True)
+class LedgerEntry:
+    """One transaction in a user's ledger; ``seq`` is 1-based and per chat."""
+    seq: int
+    kind: str
+    amount: float
+    timestamp: float
+    state: str
+    note: str = ""
+
+
+def format_entry(entry: LedgerEntry) -> str:
+    ts = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(entry.timestamp))
+    if entry.kind == KIND_ONBOARD:
+        status = "pending confirmation" if entry.state == STATE_PENDING else entry.state
+        return f"{ts}: ONBOARD - Registered with username {entry.note}; Deposit of {entry.amount:.4f} SOL is {status}."
+    if entry.kind == KIND_DEPOSIT:
+        return f"{ts}: DEPOSIT {entry.amount:.4f} SOL ({entry.state})"
+    if entry.kind == KIND_INTEREST:
+        return f"{ts}: DAILY INTEREST +{entry.amount:.4f} SOL added."
+    return f"{ts}: {entry.kind} {entry.amount:.4f} SOL ({entry.state})"
@@ -1,26 +1,36 @@
 import os
+import math
 import time
 import asyncio
-import nest_asyncio
-import requests
 import logging
-import httpx
-import matplotlib.pyplot as plt
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import threading
 
-from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
+from telegram import Bot, Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import (
     Application,
     CommandHandler,
     ConversationHandler,
     MessageHandler,
+    TypeHandler,
     ContextTypes,
     filters,
 )
-from telegram.error import TimedOut
-from dotenv import load_dotenv
+from telegram.error import TimedOut, NetworkError
+from telegram.helpers import escape_markdown
+
+from market_data import market_data, format_market_update, format_quote
+from storage import AccountStore, USER_FINANCES_DB, USER_FINANCES_FLUSH_INTERVAL
+from charts import performance_charts
+from outbox import SupportOutbox, SMTPSender
+from ledger import format_entry, KIND_ONBOARD, KIND_DEPOSIT, STATE_PENDING, HISTORY_PAGE_SIZE
+from sender import OutboundScheduler, NotificationSender, TELEGRAM_GLOBAL_RATE
+from deadlines import DeadlineIndex, DEADLINE_REMINDER, DEADLINE_SWEEP_INTERVAL
+from deposits import DepositVerifier, CHAIN_SOLANA, CHAIN_ETHEREUM, REF_PREMIUM_FEE, DEPOSIT_POLL_INTERVAL
+from metrics import metrics, METRICS_PORT
+from intents import chat_intents
+from persistence import SQLitePersistence
+from workers import WorkerPool, LeaderLock, WORKERS, LEADER_RETRY_INTERVAL
+from export import export_async, parse_command_args, EXPORT_DIR
 
 # Configure logging for production (INFO level to reduce debug output).
 logging.basicConfig(
@@ -29,35 +39,86 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Patch asyncio to allow nested event loops.
-nest_asyncio.apply()
-
-# Load environment variables.
-load_dotenv()
+# Load environment variables from .env only when the platform has not set
+# them (local runs); deployed instances skip importing python-dotenv.
+if not os.getenv("TELEGRAM_BOT"):
+    from dotenv import load_dotenv
+    load_dotenv()
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT")
 if not TELEGRAM_BOT_TOKEN:
     raise ValueError("TELEGRAM_BOT token not found in environment!")
 
+# Optional Bot API server override (e.g. a local fake for load tests).
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL")
+# Updates handled concurrently (1 = strictly one at a time, PTB's default).
+TELEGRAM_CONCURRENT_UPDATES = int(os.getenv("TELEGRAM_CONCURRENT_UPDATES", "1"))
+# Secret Telegram echoes in X-Telegram-Bot-Api-Secret-Token (setWebhook secret_token).
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET")
+# Users allowed to run admin commands such as /export (comma-separated user ids).
+ADMIN_USER_IDS = {int(user_id) for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id.strip()}
+
 # Email configuration for support queries.
 SUPPORT_EMAIL = "ccommodoreofboard@gmail.com"
 SUPPORT_EMAIL_USER = os.getenv("SUPPORT_EMAIL_USER")
 SUPPORT_EMAIL_PASSWORD = os.getenv("SUPPORT_EMAIL_PASSWORD")
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() != "false"
 
 # Constants for wallet addresses.
 PREMIUM_SOL_WALLET = "Au3amLeXRnAsPx6UxMscEi2Q5JZmdkBghycSz1f5ivh"
 DEPOSIT_SOL_WALLET = "6RDXuY6aaREBsb9nWJrqh7eqjwHDLcUz2AUkUhfCsMRR"
 ETH_WALLET = "0x4348409d1D959680b315DA798FEf5C3b6C64cdBB"
+# Wallets polled for incoming payments, by chain.
+DEPOSIT_WALLETS = {DEPOSIT_SOL_WALLET: CHAIN_SOLANA, PREMIUM_SOL_WALLET: CHAIN_SOLANA, ETH_WALLET: CHAIN_ETHEREUM}
+
+# Premium access fee, payable on either chain.
+PREMIUM_FEE_SOL = 2.0
+PREMIUM_FEE_ETH = 0.013
+
+# Daily interest credited on each account's total deposit.
+DAILY_INTEREST_RATE = 0.0285
+# Seconds between interest accruals.
+DAILY_INTEREST_INTERVAL = 86400
+
+# Number of ledger entries shown by /status; older ones are paged through /history.
+STATUS_RECENT_ENTRIES = 5
+
+# Limits for the market data commands.
+PRICE_MAX_TOKENS = 10
+TOP_DEFAULT, TOP_MAX = 5, 20
+MARKET_DATA_UNAVAILABLE_TEXT = "⚠️ Market data is not available right now. Please try again later."
 
 # Define conversation states.
 (ONBOARD, ONBOARD_USERNAME, PAYMENT_CONFIRMATION, INVEST_CHOICE, T_AND_C, DEPOSIT_AMOUNT) = range(6)
 
-# Global dictionary to store user finances and onboarding info.
-user_finances = {}
+# Persistent store of user finances and onboarding info (in-memory cache, SQLite on disk).
+user_finances = AccountStore(USER_FINANCES_DB)
+
+# Onboarding conversation states and user_data, saved incrementally so a
+# restart does not lose anyone's place in the flow.
+conversation_persistence = SQLitePersistence(USER_FINANCES_DB)
+
+# Persisted deposit reminder deadlines, swept by one job.
+deadlines = DeadlineIndex(USER_FINANCES_DB)
+
+# Incoming transfers to the wallets, matched against every pending payment.
+deposit_verifier = DepositVerifier(USER_FINANCES_DB, DEPOSIT_WALLETS)
+
+# Every outgoing Bot API call passes through one scheduler; replies to users
+# go ahead of background notifications, which are merged per chat.
+outbound = OutboundScheduler()
+notifications = NotificationSender(outbound)
+
+# Durable queue of support emails, delivered by a background worker.
+support_outbox = SupportOutbox(
+    USER_FINANCES_DB,
+    SMTPSender(SMTP_SERVER, SMTP_PORT, SUPPORT_EMAIL_USER, SUPPORT_EMAIL_PASSWORD, starttls=SMTP_STARTTLS),
+)
 
 # --- Global Error Handler ---
 async def global_error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+    metrics.record_error(context.error)
     try:
         raise context.error
     except TimedOut as e:
@@ -65,18 +126,38 @@ async def global_error_handler(update: object, context: ContextTypes.DEFAULT_TYP
     except Exception as e:
         logger.error(f"Unhandled error: {e}")
 
+def is_onboarded(chat_id) -> bool:
+    return chat_id in user_finances and user_finances[chat_id].get("onboarded", False)
+
 # Helper function to check if a user is fully onboarded.
 async def check_onboarding(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
     chat_id = update.effective_chat.id
-    if chat_id not in user_finances or not user_finances[chat_id].get("registration_fee_paid", False):
+    if not is_onboarded(chat_id):
         await update.message.reply_text("❗ You must complete onboarding and pay the registration fee to use this command.")
         return False
+    if not user_finances[chat_id].get("registration_fee_paid", False):
+        await update.message.reply_text(
+            "⏳ Your registration fee has not arrived on-chain yet. Send /start to see the payment details again."
+        )
+        return False
     return True
 
 # --- Onboarding Conversation Handlers ---
+REGISTRATION_PAYMENT_TEXT = (
+    "To complete your premium onboarding, please pay the **Premium Access Fee** using one of the following options:\n\n"
+    "- **{:g} SOL** to our Premium SOL wallet: `{}`\n\n"
+    "- **{:g} ETH** to our Premium ETH wallet: `{}`\n\n"
+    "Once you have made the payment, please type **I paid** to confirm. Payment confirmation may take up to 5 minutes."
+    .format(PREMIUM_FEE_SOL, PREMIUM_SOL_WALLET, PREMIUM_FEE_ETH, ETH_WALLET)
+)
+
 async def onboard_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     chat_id = update.effective_chat.id
-    if chat_id in user_finances and user_finances[chat_id].get("registration_fee_paid", False):
+    if is_onboarded(chat_id):
+        if not user_finances[chat_id].get("registration_fee_paid", False):
+            # The fee has not been seen on-chain: show the details again and watch anew on "I paid".
+            await update.message.reply_text(REGISTRATION_PAYMENT_TEXT, parse_mode="Markdown")
+            return PAYMENT_CONFIRMATION
         await update.message.reply_text("You are already onboarded.")
         return ConversationHandler.END
     text = (
@@ -95,25 +176,11 @@ async def onboard_response(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         await update.message.reply_text("Great! Please enter your **username** for registration:", parse_mode="Markdown")
         return ONBOARD_USERNAME
     else:
-        try:
-            r = requests.get("https://api.dexscreener.com/token-boosts/top/v1", timeout=10)
-            data = r.json()
-            if isinstance(data, dict):
-                tokens = data.get("data", [])
-            elif isinstance(data, list):
-                tokens = data
-            else:
-                tokens = []
-            tokens = tokens[:3]
-            tokens_info = "\n".join([f"- {token.get('name', 'Unknown')}: ${float(token.get('price', 0)):.2f}" for token in tokens])
-            update_msg = (
-                "📈 **DEXscanner Market Data:**\n"
-                f"{tokens_info}\n\n"
-                "Thank you for using **Sense Bot Free Version**!"
-            )
-        except Exception as e:
-            update_msg = f"Error fetching market data: {e}"
-        await update.message.reply_text(update_msg, parse_mode="Markdown")
+        quotes = (await market_data.ready_index()).top(3)
+        if not quotes:
+            await update.message.reply_text(MARKET_DATA_UNAVAILABLE_TEXT)
+            return ConversationHandler.END
+        await update.message.reply_text(format_market_update(quotes), parse_mode="Markdown")
         return ConversationHandler.END
 
 async def onboard_username(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -127,24 +194,24 @@ async def onboard_username(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     context.user_data["username"] = username
     verification_text = f"✅ Your username **{username}** has been verified successfully!"
     await update.message.reply_text(verification_text, parse_mode="Markdown")
-    
-    # Instantiate registration payment request:
-    registration_payment_text = (
-        "To complete your premium onboarding, please pay the **Premium Access Fee** using one of the following options:\n\n"
-        "- **2 SOL** to our Premium SOL wallet: `{}`\n\n"
-        "- **0.013 ETH** to our Premium ETH wallet: `{}`\n\n"
-        "Once you have made the payment, please type **I paid** to confirm. Payment confirmation may take up to 5 minutes."
-        .format(PREMIUM_SOL_WALLET, ETH_WALLET)
-    )
-    await update.message.reply_text(registration_payment_text, parse_mode="Markdown")
+    await update.message.reply_text(REGISTRATION_PAYMENT_TEXT, parse_mode="Markdown")
     return PAYMENT_CONFIRMATION
 
 async def payment_confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     if update.message.text.strip().lower() == "i paid":
-        # Mark registration fee as paid in user_data temporarily
-        context.user_data["registration_fee_paid"] = True
+        chat_id = update.effective_chat.id
+        if chat_id in user_finances and user_finances[chat_id].get("registration_fee_paid", False):
+            await update.message.reply_text("✅ Your Premium Access Fee payment has already been verified on-chain.")
+            return ConversationHandler.END
+        # Watch both premium wallets; the fee is marked paid when either payment arrives.
+        await deposit_verifier.expect_fee(chat_id, [(PREMIUM_SOL_WALLET, PREMIUM_FEE_SOL), (ETH_WALLET, PREMIUM_FEE_ETH)])
+        if is_onboarded(chat_id):
+            await update.message.reply_text(
+                "⏳ Thanks! Your registration fee is confirmed automatically once the payment arrives on-chain."
+            )
+            return ConversationHandler.END
         await update.message.reply_text(
-            "✅ Payment received for registration. Please wait 5 minutes for full confirmation.\n\n"
+            "⏳ Thanks! Your registration fee is confirmed automatically once the payment arrives on-chain.\n\n"
             "Now, would you like to handle your *INVESTMENT*? *(yes/no)*",
             parse_mode="Markdown"
         )
@@ -186,86 +253,151 @@ async def t_and_c(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return DEPOSIT_AMOUNT
 
 # --- Deposit Amount Handler ---
-async def deposit_amount(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+def parse_amount(text: str):
+    """Return ``text`` as a positive, finite amount, or None."""
     try:
-        amount = float(update.message.text.strip())
+        amount = float(text)
     except ValueError:
-        await update.message.reply_text("⚠️ Deposit amount must be a valid number. Please try again:", parse_mode="Markdown")
+        return None
+    # float() also accepts "nan" and "inf", which no transfer can match.
+    return amount if math.isfinite(amount) and amount > 0 else None
+
+async def deposit_amount(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    amount = parse_amount(update.message.text.strip())
+    if amount is None:
+        await update.message.reply_text("⚠️ Deposit amount must be a positive number. Please try again:", parse_mode="Markdown")
         return DEPOSIT_AMOUNT
     chat_id = update.effective_chat.id
     current_time = time.time()
-    if chat_id not in user_finances:
-        user_finances[chat_id] = {}
-    user_finances[chat_id].update({
-        "onboarded": True,
-        "username": context.user_data.get("username", ""),
-        "registration_fee_paid": True,
-        "invest_choice": context.user_data.get("invest_choice", False),
-        "t_and_c_accepted": context.user_data.get("t_and_c_accepted", False),
-        "total_deposit": user_finances[chat_id].get("total_deposit", 0.0) + amount,
-        "investment": user_finances[chat_id].get("investment", 0.0) + amount,
-        "pending_deposit": amount,
-        "pending_deposit_time": current_time,
-        "profit": user_finances[chat_id].get("profit", 0.0),
-        "history": user_finances[chat_id].get("history", [])
-    })
-    record = f"{time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(current_time))}: ONBOARD - Registered with username {context.user_data.get('username', '')}; Deposit of {amount:.4f} SOL is pending confirmation."
-    user_finances[chat_id]["history"].append(record)
+    user_data = user_finances.get(chat_id) or user_finances.create(chat_id)
+    user_finances.update(
+        chat_id,
+        onboarded=True,
+        username=context.user_data.get("username", ""),
+        invest_choice=context.user_data.get("invest_choice", False),
+        t_and_c_accepted=context.user_data.get("t_and_c_accepted", False),
+        # Credited to the balance by credit_deposit once the transfer arrives.
+        pending_deposit=user_data["pending_deposit"] + amount,
+        pending_deposit_time=current_time,
+    )
+    entry = user_finances.record(chat_id, KIND_ONBOARD, amount, STATE_PENDING, note=context.user_data.get("username", ""), timestamp=current_time)
+    deposit_verifier.expect(chat_id, entry.seq, DEPOSIT_SOL_WALLET, amount, current_time)
     await update.message.reply_text(
         "✅ Your deposit of **{:.4f} SOL** has been recorded as pending.\n"
         "Please send your funds to the deposit wallet: **{}**.\n\n"
-        "After sending the funds, please type **confirm payment** to finalize your deposit.\n"
-        "If you do not confirm manually, your deposit will be automatically confirmed after 30 minutes."
+        "Your deposit is confirmed automatically once the transfer arrives on-chain.\n"
+        "You can type **confirm payment** to check on it."
         .format(amount, DEPOSIT_SOL_WALLET),
         parse_mode="Markdown"
     )
-    # Schedule deposit confirmation job to run in 30 minutes (1800 seconds)
-    context.job_queue.run_once(confirm_deposit, 1800, data=chat_id)
-    # Schedule an automated message to prompt the user after 10 minutes (600 seconds)
-    context.job_queue.run_once(reminder_check_transaction, 600, data=chat_id)
+    schedule_deposit_deadlines(chat_id, current_time)
     return ConversationHandler.END
 
 # --- New Deposit Payment Confirmation Handler ---
 async def deposit_payment_confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     chat_id = update.effective_chat.id
-    if chat_id in user_finances and user_finances[chat_id].get("pending_deposit", 0.0) > 0:
-        pending = user_finances[chat_id].get("pending_deposit")
-        user_data = user_finances[chat_id]
-        user_data["investment"] += pending
-        user_data["total_deposit"] += pending
-        user_data["pending_deposit"] = 0.0
-        user_data["pending_deposit_time"] = None
-        if user_data["history"]:
-            last_record = user_data["history"][-1]
-            if "(pending)" in last_record.lower():
-                user_data["history"][-1] = last_record.replace("pending", "confirmed")
-        await update.message.reply_text("✅ Your deposit has been confirmed and added to your investment balance.", parse_mode="Markdown")
-    else:
+    if not has_pending_deposit(chat_id):
         await update.message.reply_text("⚠️ No pending deposit found to confirm.", parse_mode="Markdown")
+        return
+    # Poll early if the next poll is due anyway; otherwise the last poll is
+    # recent enough to answer from, and RPC load stays one poll per interval
+    # however often users ask.
+    messages = {}
+    if deposit_verifier.due():
+        try:
+            messages = credit_deposit_matches(await deposit_verifier.poll())
+        except Exception as e:
+            logger.error(f"Error verifying deposits: {e}")
+    texts = messages.pop(chat_id, [])
+    if messages:
+        context.application.create_task(notify_deposit_matches(context.bot, messages))
+    if has_pending_deposit(chat_id):
+        texts.append(
+            f"⏳ Your transfer to **{DEPOSIT_SOL_WALLET}** has not arrived on-chain yet. "
+            "Your deposit is confirmed automatically as soon as it does."
+        )
+    elif not texts:
+        # Credited meanwhile by a poll this handler did not start.
+        texts.append("✅ Your deposit has arrived and was added to your investment balance.")
+    await update.message.reply_text("\n\n".join(texts), parse_mode="Markdown")
+
+# --- Deposit Deadlines ---
+def schedule_deposit_deadlines(chat_id, deposit_time: float) -> None:
+    # Remind after 10 minutes (600 seconds) if the transfer has not been seen by then.
+    deadlines.schedule(chat_id, DEADLINE_REMINDER, deposit_time + 600)
+
+def has_pending_deposit(chat_id) -> bool:
+    user_data = user_finances.get(chat_id)
+    return user_data is not None and user_data.get("pending_deposit", 0.0) > 0
+
+async def sweep_deadlines(context: ContextTypes.DEFAULT_TYPE) -> None:
+    await run_deadline_sweep(context.bot)
+
+async def run_deadline_sweep(bot) -> None:
+    """Send every due reminder for a deposit still not seen on-chain in one pass."""
+    due = deadlines.pop_due(time.time())
+    if not due:
+        return
+    # Confirm deadlines left over from before deposits were verified on-chain are dropped.
+    await notifications.send_many(
+        bot,
+        ((chat_id, "⏰ Reminder: Please check your transaction status for deposit confirmation.")
+         for chat_id in due.get(DEADLINE_REMINDER, []) if has_pending_deposit(chat_id)),
+        parse_mode="Markdown",
+    )
+
+# --- On-Chain Deposit Verification ---
+async def verify_deposits(context: ContextTypes.DEFAULT_TYPE) -> None:
+    await run_deposit_verification(context.bot)
+
+async def run_deposit_verification(bot) -> None:
+    """Poll the wallets once and credit every pending payment that arrived."""
+    await notify_deposit_matches(bot, credit_deposit_matches(await deposit_verifier.poll()))
+
+def credit_deposit_matches(matches: list) -> dict:
+    """Credit matched payments in bulk; return the messages to send, by chat."""
+    messages = {}
+    for match in matches:
+        expectation, transfer = match.expectation, match.transfer
+        chat_id = expectation.chat_id
+        if expectation.ref == REF_PREMIUM_FEE:
+            # Stop watching the other premium wallet.
+            deposit_verifier.cancel(chat_id, REF_PREMIUM_FEE)
+            if chat_id not in user_finances:
+                user_finances.create(chat_id)
+            user_finances.update(chat_id, registration_fee_paid=True)
+            messages.setdefault(chat_id, []).append("✅ Your Premium Access Fee payment has been verified on-chain.")
+        elif credit_deposit(chat_id, expectation.created_at):
+            messages.setdefault(chat_id, []).append(
+                f"✅ Your deposit of **{transfer.amount:.4f} SOL** has arrived and was added to your investment balance."
+            )
+    return messages
+
+def credit_deposit(chat_id, recorded_at: float) -> bool:
+    """Move one pending deposit, found by the time it was recorded, into the investment balance."""
+    # Looked up by time, not sequence number: an accrual may renumber entries recorded while it ran.
+    entry = next((e for e in user_finances.pending_entries(chat_id) if e.timestamp == recorded_at), None)
+    if entry is None:
+        return False
+    user_finances.confirm_entry(chat_id, entry.seq)
+    user_data = user_finances[chat_id]
+    pending = max(0.0, user_data["pending_deposit"] - entry.amount)
+    user_finances.update(
+        chat_id,
+        investment=user_data["investment"] + entry.amount,
+        total_deposit=user_data["total_deposit"] + entry.amount,
+        pending_deposit=pending,
+        pending_deposit_time=user_data["pending_deposit_time"] if pending > 0 else None,
+    )
+    if pending <= 0:
+        deadlines.cancel(chat_id, DEADLINE_REMINDER)
+    return True
 
-# --- Confirm Deposit Job (modified for 30 minutes delay) ---
-async def confirm_deposit(context: ContextTypes.DEFAULT_TYPE) -> None:
-    chat_id = context.job.data
-    if chat_id in user_finances:
-        pending = user_finances[chat_id].get("pending_deposit", 0.0)
-        if pending > 0:
-            user_data = user_finances[chat_id]
-            user_data["investment"] += pending
-            user_data["total_deposit"] += pending
-            user_data["pending_deposit"] = 0.0
-            user_data["pending_deposit_time"] = None
-            if user_data["history"]:
-                last_record = user_data["history"][-1]
-                if "(pending)" in last_record.lower():
-                    user_data["history"][-1] = last_record.replace("pending", "confirmed")
-            await context.bot.send_message(chat_id=chat_id, text="✅ Your deposit has been added to your investment balance.", parse_mode="Markdown")
-
-# --- Reminder Job Function ---
-async def reminder_check_transaction(context: ContextTypes.DEFAULT_TYPE) -> None:
-    chat_id = context.job.data
-    await context.bot.send_message(
-        chat_id=chat_id,
-        text="⏰ Reminder: Please check your transaction status for deposit confirmation."
+async def notify_deposit_matches(bot, messages: dict) -> None:
+    await notifications.send_many(
+        bot,
+        ((chat_id, "\n\n".join(texts)) for chat_id, texts in messages.items()),
+        parse_mode="Markdown",
     )
 
 # --- Deposit Command Handler (for deposits via /deposit command) ---
@@ -276,27 +408,28 @@ async def deposit_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if len(args) != 1:
         await update.message.reply_text("💡 Usage: /deposit <amount>", parse_mode="Markdown")
         return
-    try:
-        amount = float(args[0])
-    except ValueError:
-        await update.message.reply_text("⚠️ Deposit amount must be a valid number.", parse_mode="Markdown")
+    amount = parse_amount(args[0])
+    if amount is None:
+        await update.message.reply_text("⚠️ Deposit amount must be a positive number.", parse_mode="Markdown")
         return
     chat_id = update.effective_chat.id
     current_time = time.time()
     user_data = user_finances[chat_id]
-    user_data["pending_deposit"] = user_data.get("pending_deposit", 0.0) + amount
-    user_data["pending_deposit_time"] = current_time
-    record = f"{time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(current_time))}: DEPOSIT {amount:.4f} SOL (pending)"
-    user_data["history"].append(record)
+    user_finances.update(
+        chat_id,
+        pending_deposit=user_data.get("pending_deposit", 0.0) + amount,
+        pending_deposit_time=current_time,
+    )
+    entry = user_finances.record(chat_id, KIND_DEPOSIT, amount, STATE_PENDING, timestamp=current_time)
+    deposit_verifier.expect(chat_id, entry.seq, DEPOSIT_SOL_WALLET, amount, current_time)
     await update.message.reply_text(
-        f"💰 *Deposit successful.* {record}\n"
+        f"💰 *Deposit successful.* {format_entry(entry)}\n"
         f"Please send your deposit to the wallet: **{DEPOSIT_SOL_WALLET}**.\n\n"
-        "After sending the funds, please type **confirm payment** to finalize your deposit.\n"
-        "If you do not confirm manually, your deposit will be automatically confirmed after 30 minutes.",
+        "Your deposit is confirmed automatically once the transfer arrives on-chain.\n"
+        "You can type **confirm payment** to check on it.",
         parse_mode="Markdown"
     )
-    context.job_queue.run_once(confirm_deposit, 1800, data=chat_id)
-    context.job_queue.run_once(reminder_check_transaction, 600, data=chat_id)
+    schedule_deposit_deadlines(chat_id, current_time)
 
 # --- Cancel Onboarding Handler ---
 async def cancel_onboarding(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -315,20 +448,12 @@ async def support_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     sender_info = update.effective_user.username or str(update.effective_user.id)
     subject = f"Support Query from Telegram Bot User: {sender_info}"
     body = f"User: {sender_info}\nQuery: {query}"
-    message = MIMEMultipart()
-    message['From'] = SUPPORT_EMAIL_USER
-    message['To'] = SUPPORT_EMAIL
-    message['Subject'] = subject
-    message.attach(MIMEText(body, 'plain'))
     try:
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()
-        server.login(SUPPORT_EMAIL_USER, SUPPORT_EMAIL_PASSWORD)
-        server.sendmail(SUPPORT_EMAIL_USER, SUPPORT_EMAIL, message.as_string())
-        server.quit()
+        # Queued durably; the outbox worker delivers and retries in the background.
+        await support_outbox.enqueue(SUPPORT_EMAIL_USER or SUPPORT_EMAIL, SUPPORT_EMAIL, subject, body)
         await update.message.reply_text("✅ Your support query has been sent. We will get back to you shortly.")
     except Exception as e:
-        logger.error(f"Error sending support email: {e}")
+        logger.error(f"Error queueing support email: {e}")
         await update.message.reply_text("⚠️ There was an error sending your support query. Please try again later.")
 
 async def solwallet_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -343,6 +468,37 @@ async def ethwallet_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = f"💰 **ETH Wallet Address:**\n`{ETH_WALLET}`"
     await update.message.reply_text(text, parse_mode="Markdown")
 
+# --- Market Data Commands (served from the in-memory token index) ---
+async def price_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    queries = " ".join(context.args).replace(",", " ").split()
+    if not queries or len(queries) > PRICE_MAX_TOKENS:
+        await update.message.reply_text(f"💡 Usage: /price <token> [token ...] (up to {PRICE_MAX_TOKENS})", parse_mode="Markdown")
+        return
+    await market_data.ready_index()
+    if not market_data.available:
+        await update.message.reply_text(MARKET_DATA_UNAVAILABLE_TEXT)
+        return
+    resolved = await market_data.resolve(queries)
+    lines = [format_quote(quote) if quote else f"⚠️ Unknown token: {escape_markdown(query, version=1)}" for query, quote in resolved]
+    await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
+
+async def top_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    args = context.args
+    try:
+        n = int(args[0]) if args else TOP_DEFAULT
+    except ValueError:
+        n = 0
+    if len(args) > 1 or not 1 <= n <= TOP_MAX:
+        await update.message.reply_text(f"💡 Usage: /top [n] (1-{TOP_MAX})", parse_mode="Markdown")
+        return
+    index = await market_data.ready_index()
+    quotes = index.top(n)
+    if not quotes:
+        await update.message.reply_text(MARKET_DATA_UNAVAILABLE_TEXT)
+        return
+    text = "🚀 *Top boosted tokens:*\n" + "\n".join(f"{i}. {format_quote(quote)}" for i, quote in enumerate(quotes, 1))
+    await update.message.reply_text(text, parse_mode="Markdown")
+
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await check_onboarding(update, context):
         return
@@ -352,7 +508,11 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if pending_time and (time.time() - pending_time) < 1800:
         history_text = "No transactions recorded yet."
     else:
-        history_text = "\n".join(data["history"]) if data["history"] else "No transactions recorded yet."
+        # Totals are running aggregates; only the newest entries are read here.
+        recent = user_finances.recent_entries(chat_id, STATUS_RECENT_ENTRIES)
+        history_text = "\n".join(format_entry(entry) for entry in recent) if recent else "No transactions recorded yet."
+        if data["ledger_count"] > len(recent):
+            history_text += f"\n\nShowing the latest {len(recent)} of {data['ledger_count']} transactions. Use /history to see more."
     summary_text = (
         f"📊 *Investment Summary:*\n"
         f"**Total Deposited:** {data['investment']:.4f} SOL\n"
@@ -360,17 +520,30 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"📝 *Transaction History:*\n{history_text}"
     )
     await update.message.reply_text(summary_text, parse_mode="Markdown")
-    labels = ['Investment', 'Profit']
-    values = [data['investment'], data['profit']]
-    plt.figure(figsize=(4, 3))
-    plt.bar(labels, values, color=['blue', 'green'])
-    plt.title('Performance Overview')
-    plt.tight_layout()
-    plt.savefig("performance.png")
-    plt.close()
-    with open("performance.png", "rb") as photo_file:
-        await update.message.reply_photo(photo=photo_file)
-    os.remove("performance.png")
+    # Rendered off-loop and cached; repeat charts reuse Telegram's file_id.
+    photo, chart_key = await performance_charts.get(data['investment'], data['profit'])
+    message = await update.message.reply_photo(photo=photo)
+    if message.photo:
+        performance_charts.remember_file_id(chart_key, message.photo[-1].file_id)
+
+async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await check_onboarding(update, context):
+        return
+    args = context.args
+    try:
+        page = int(args[0]) if args else 1
+    except ValueError:
+        page = 0
+    if len(args) > 1 or page < 1:
+        await update.message.reply_text("💡 Usage: /history [page]", parse_mode="Markdown")
+        return
+    chat_id = update.effective_chat.id
+    entries, pages = user_finances.ledger_page(chat_id, page, HISTORY_PAGE_SIZE)
+    if not entries:
+        text = "No transactions recorded yet." if page == 1 else f"⚠️ There are only {pages} page(s) of history."
+    else:
+        text = f"📝 *Transaction History* (page {page}/{pages}):\n" + "\n".join(format_entry(entry) for entry in entries)
+    await update.message.reply_text(text, parse_mode="Markdown")
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     help_text = (
@@ -378,6 +551,9 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "/start - Onboard for premium access\n"
         "/deposit <amount> - Deposit additional funds\n"
         "/status - View your investment report and performance graphics\n"
+        "/history [page] - Browse your transaction history\n"
+        "/price <token> - Current price of one or more tokens\n"
+        "/top [n] - Top boosted tokens\n"
         "/support <query> - Send a support query\n"
         "/solwallet - Display the SOL wallet address\n"
         "/ethwallet - Display the ETH wallet address\n"
@@ -386,43 +562,134 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     await update.message.reply_text(help_text, parse_mode="Markdown")
 
+# --- Admin Commands ---
+# Telegram bots may upload files of up to 50 MB; larger exports stay on disk.
+EXPORT_UPLOAD_LIMIT = 50 * 1024 * 1024
+_export_running = False
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    global _export_running
+    # Checked by user: in a group chat every member shares the chat id.
+    if update.effective_user is None or update.effective_user.id not in ADMIN_USER_IDS:
+        await update.message.reply_text("❗ This command is only available to administrators.")
+        return
+    try:
+        options = parse_command_args(context.args)
+    except ValueError:
+        await update.message.reply_text(
+            "💡 Usage: /export [csv|jsonl|parquet] [since=YYYY-MM-DD] [until=YYYY-MM-DD] [chat=<chat id>]"
+        )
+        return
+    if _export_running:
+        await update.message.reply_text("⏳ An export is already running.")
+        return
+    # Runs as a task so this chat's other updates are not held up behind it;
+    # run_export clears the flag however the export ends.
+    _export_running = True
+    context.application.create_task(run_export(context.bot, update.effective_chat.id, options))
+    await update.message.reply_text("⏳ Export started. The files will be sent here when it finishes.")
+
+async def run_export(bot, chat_id, options: dict) -> None:
+    global _export_running
+    try:
+        # The export reads the database file, so write out what is still only in memory.
+        await user_finances.flush_async()
+        result = await export_async(USER_FINANCES_DB, EXPORT_DIR, **options)
+        for table, (path, rows) in result.items():
+            if os.path.getsize(path) <= EXPORT_UPLOAD_LIMIT:
+                with open(path, "rb") as f:
+                    await bot.send_document(chat_id, f, filename=os.path.basename(path), caption=f"{table}: {rows} rows")
+            else:
+                await bot.send_message(chat_id, f"{table}: {rows} rows, too large to send; saved as {path}")
+    except Exception as e:
+        logger.error(f"Export failed: {e}")
+        await bot.send_message(chat_id, f"⚠️ Export failed: {e}")
+    finally:
+        _export_running = False
+
 # --- Finance Chat Handler ---
 async def chat_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    text = update.message.text.strip().lower()
-    if "hello" in text or "hi" in text:
-        response = "Hello! How can I assist you with your finances today?"
-    elif "market" in text:
-        response = "The market is always fluctuating. Keep an eye on your investments and consider diversification."
-    elif "investment" in text:
-        response = "Investing wisely involves both research and risk management. How can I help you with your investment queries?"
-    else:
-        response = "I'm here to help with your finance-related questions. Feel free to ask me anything about markets, investments, or strategies!"
+    response = chat_intents.match(update.message.text)
     await update.message.reply_text(response, parse_mode="Markdown")
 
 # --- Daily Interest Accrual Job ---
 async def daily_interest_accrual(context: ContextTypes.DEFAULT_TYPE) -> None:
-    for chat_id, user_data in user_finances.items():
-        if user_data.get("registration_fee_paid", False) and user_data.get("total_deposit", 0) > 0:
-            interest = user_data["total_deposit"] * 0.0285
-            user_data["investment"] += interest
-            user_data["profit"] += interest
-            timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(time.time()))
-            user_data["history"].append(f"{timestamp}: DAILY INTEREST +{interest:.4f} SOL added.")
-            try:
-                await context.bot.send_message(chat_id=chat_id, text=f"✅ Daily interest of {interest:.4f} SOL has been added to your account.")
-            except Exception as e:
-                logger.error(f"Error sending daily interest notification to {chat_id}: {e}")
+    await run_interest_accrual(context.bot)
+
+async def run_interest_accrual(bot, interval: float = None) -> None:
+    # One batched UPDATE over all accounts, committed atomically.
+    credited = await user_finances.accrue_interest(DAILY_INTEREST_RATE, interval)
+    logger.info(f"Daily interest credited to {len(credited)} accounts")
+    await notifications.send_many(
+        bot,
+        ((chat_id, f"✅ Daily interest of {interest:.4f} SOL has been added to your account.") for chat_id, interest in credited),
+        parse_mode="Markdown",
+    )
 
-# --- Main Function to Run the Telegram Bot ---
-async def run_telegram_bot():
-    custom_timeout = httpx.Timeout(connect=30.0, read=30.0, write=30.0, pool=30.0)
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
-    
-    try:
-        application.bot._request._client.timeout = custom_timeout
-        logger.info("Patched HTTPX client timeout successfully.")
-    except Exception as e:
-        logger.error(f"Could not patch HTTPX client timeout: {e}")
+# --- Write-Behind Flush Job ---
+async def flush_user_finances(context: ContextTypes.DEFAULT_TYPE) -> None:
+    await user_finances.flush_async()
+    await deadlines.flush_async()
+    await conversation_persistence.flush_async()
+
+# --- Application Lifecycle Hooks ---
+def fee_paid(chat_id) -> bool:
+    account = user_finances.get(chat_id)
+    return account is not None and account.registration_fee_paid
+
+def open_resources(start_outbox: bool = True) -> None:
+    user_finances.open()
+    deadlines.open()
+    deposit_verifier.open()
+    pending = ((chat_id, entry, DEPOSIT_SOL_WALLET) for chat_id, entry in user_finances.all_pending_entries())
+    # Transfers claimed just before a restart are credited without a message.
+    credited = credit_deposit_matches(deposit_verifier.load(pending, fee_paid))
+    if credited:
+        logger.info(f"Credited {len(credited)} deposits claimed before the last shutdown")
+    support_outbox.open()
+    if start_outbox:
+        support_outbox.start()
+
+async def on_startup(application: Application) -> None:
+    open_resources()
+    market_data.start_polling()
+    await metrics.start()
+
+async def on_shutdown(application: Application) -> None:
+    logger.info(f"Token index stats: {market_data.stats()}")
+    logger.info(f"Chart cache stats: {performance_charts.stats()}")
+    logger.info(f"Support outbox stats: {support_outbox.stats()}")
+    logger.info(f"Outbound stats: {outbound.stats()}, notifications sent {notifications.sent}, "
+                f"merged {notifications.coalesced}, failed {notifications.failed}")
+    logger.info(f"Deposit verification stats: {deposit_verifier.stats()}")
+    await metrics.stop()
+    metrics.dump()
+    await support_outbox.stop()
+    await market_data.aclose()
+    await deposit_verifier.aclose()
+    performance_charts.shutdown()
+    user_finances.close()
+    deadlines.close()
+    conversation_persistence.close()
+
+# --- Application Factory ---
+def build_application(base_url: str = None, singleton_jobs: bool = True) -> Application:
+    builder = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .connect_timeout(30.0)
+        .read_timeout(30.0)
+        .write_timeout(30.0)
+        .pool_timeout(30.0)
+        .concurrent_updates(TELEGRAM_CONCURRENT_UPDATES)
+        .persistence(conversation_persistence)
+        .rate_limiter(outbound)
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+    )
+    if base_url or TELEGRAM_API_BASE_URL:
+        builder = builder.base_url(base_url or TELEGRAM_API_BASE_URL)
+    application = builder.build()
     
     application.add_error_handler(global_error_handler)
     
@@ -436,44 +703,227 @@ async def run_telegram_bot():
             T_AND_C: [MessageHandler(filters.TEXT & ~filters.COMMAND, t_and_c)],
             DEPOSIT_AMOUNT: [MessageHandler(filters.TEXT & ~filters.COMMAND, deposit_amount)]
         },
-        fallbacks=[CommandHandler("cancel", cancel_onboarding)]
+        fallbacks=[CommandHandler("cancel", cancel_onboarding)],
+        name="onboard_conv",
+        persistent=True,
     )
     application.add_handler(onboard_conv)
     
     application.add_handler(CommandHandler("deposit", deposit_command))
     application.add_handler(CommandHandler("status", status_command))
+    application.add_handler(CommandHandler("history", history_command))
+    application.add_handler(CommandHandler("price", price_command))
+    application.add_handler(CommandHandler("top", top_command))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("support", support_command))
     application.add_handler(CommandHandler("solwallet", solwallet_command))
     application.add_handler(CommandHandler("ethwallet", ethwallet_command))
+    application.add_handler(CommandHandler("export", export_command))
     
     # Command to trigger the chat handler
     application.add_handler(CommandHandler("chat", chat_handler))
+    # Handler for manual deposit confirmation (ahead of the fallback, which would otherwise take the message)
+    application.add_handler(MessageHandler(filters.TEXT & filters.Regex(r"(?i)^\s*confirm payment\s*$"), deposit_payment_confirmation))
     # Fallback: handle regular text messages as finance chat if they don't match any command.
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, chat_handler))
     
-    # Handler for manual deposit confirmation
-    application.add_handler(MessageHandler(filters.TEXT & filters.Regex("^confirm payment$"), deposit_payment_confirmation))
-    
-    # Schedule the daily interest accrual job to run every 24 hours (86400 seconds)
-    application.job_queue.run_repeating(daily_interest_accrual, interval=86400, first=86400)
-    
+    # Schedule the daily interest accrual job to run every 24 hours (86400 seconds).
+    # Worker processes leave this to whichever of them is the leader.
+    if singleton_jobs:
+        application.job_queue.run_repeating(daily_interest_accrual, interval=DAILY_INTEREST_INTERVAL, first=DAILY_INTEREST_INTERVAL)
+    # Send due deposit reminders in bulk.
+    application.job_queue.run_repeating(sweep_deadlines, interval=DEADLINE_SWEEP_INTERVAL, first=DEADLINE_SWEEP_INTERVAL)
+    # Confirm deposits whose transfers have arrived, with one poll of the wallets for all of them.
+    application.job_queue.run_repeating(verify_deposits, interval=DEPOSIT_POLL_INTERVAL, first=DEPOSIT_POLL_INTERVAL)
+    # Persist dirty accounts in batched transactions off the request path.
+    application.job_queue.run_repeating(flush_user_finances, interval=USER_FINANCES_FLUSH_INTERVAL, first=USER_FINANCES_FLUSH_INTERVAL)
+
+    # Time every handler registered above and count updates ahead of all groups.
+    metrics.instrument(application)
+    return application
+
+# --- Main Function to Run the Telegram Bot ---
+async def run_telegram_bot():
+    # Patch asyncio to allow nested event loops (run_polling inside asyncio.run).
+    import nest_asyncio
+    nest_asyncio.apply()
+    application = build_application()
     await application.run_polling()
 
+# --- Multi-Process Workers ---
+# With WORKERS > 1 the polling process only fetches updates and hands each one
+# to the worker process owning its chat. Workers share the database but each
+# loads only its own chats. The worker holding the leader lock drains the
+# support outbox and triggers the daily accrual, which every worker then runs
+# for its own chats.
+_leader = LeaderLock(USER_FINANCES_DB + ".leader")
+_peers = []
+
+def configure_shard(index: int, count: int) -> None:
+    global user_finances, deadlines, deposit_verifier, outbound, notifications
+    shard = (index, count)
+    user_finances = AccountStore(USER_FINANCES_DB, shard=shard)
+    deadlines = DeadlineIndex(USER_FINANCES_DB, shard=shard)
+    deposit_verifier = DepositVerifier(USER_FINANCES_DB, DEPOSIT_WALLETS, shard=shard)
+    # Telegram's overall rate limit is shared by all workers.
+    outbound = OutboundScheduler(global_rate=TELEGRAM_GLOBAL_RATE / count)
+    notifications = NotificationSender(outbound)
+
+async def claim_leadership(context: ContextTypes.DEFAULT_TYPE) -> None:
+    if _leader.held or not _leader.try_acquire():
+        return
+    logger.info("This worker is now the leader")
+    support_outbox.start()
+    context.job_queue.run_repeating(broadcast_interest_accrual, interval=DAILY_INTEREST_INTERVAL, first=DAILY_INTEREST_INTERVAL)
+
+async def broadcast_interest_accrual(context: ContextTypes.DEFAULT_TYPE) -> None:
+    for inbox in _peers:
+        inbox.put(("job", "daily_interest_accrual"))
+
+# Jobs a worker runs when told to by the leader.
+WORKER_JOBS = {"daily_interest_accrual": daily_interest_accrual}
+
+def run_worker(index: int, count: int, inbox, peers, acks=None) -> None:
+    """Entry point of a worker process (see workers.WorkerPool)."""
+    asyncio.run(serve_worker(index, count, inbox, peers, acks))
+
+async def serve_worker(index: int, count: int, inbox, peers, acks=None) -> None:
+    global _peers
+    _peers = peers
+    configure_shard(index, count)
+    application = build_application(singleton_jobs=False)
+    if acks is not None:
+        async def ack(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+            acks.put(update.update_id)
+        application.add_handler(TypeHandler(Update, ack), group=1000)
+    await application.initialize()
+    open_resources(start_outbox=False)
+    market_data.start_polling()
+    metrics.dump_path = f"{metrics.dump_path}.{index}"
+    await metrics.start(METRICS_PORT + index if METRICS_PORT else 0)
+    await application.start()
+    application.job_queue.run_repeating(claim_leadership, interval=LEADER_RETRY_INTERVAL, first=0)
+
+    # A thread blocks on the process queue and hands messages to the loop.
+    loop = asyncio.get_running_loop()
+    messages = asyncio.Queue()
+    def pump() -> None:
+        while True:
+            message = inbox.get()
+            loop.call_soon_threadsafe(messages.put_nowait, message)
+            if message[0] == "stop":
+                return
+    threading.Thread(target=pump, name=f"worker-{index}-inbox", daemon=True).start()
+    try:
+        while True:
+            kind, payload = await messages.get()
+            if kind == "update":
+                await application.update_queue.put(Update.de_json(payload, application.bot))
+            elif kind == "job":
+                application.job_queue.run_once(WORKER_JOBS[payload], 0)
+            elif kind == "stop":
+                break
+    finally:
+        await application.stop()
+        await application.shutdown()
+        await on_shutdown(application)
+        _leader.release()
+
+async def run_worker_pool() -> None:
+    pool = WorkerPool(run_worker, WORKERS)
+    pool.start()
+    bot = Bot(TELEGRAM_BOT_TOKEN, base_url=TELEGRAM_API_BASE_URL or "https://api.telegram.org/bot")
+    offset = None
+    try:
+        async with bot:
+            while True:
+                try:
+                    updates = await bot.get_updates(offset=offset, timeout=30, allowed_updates=Update.ALL_TYPES)
+                except (TimedOut, NetworkError) as e:
+                    logger.warning(f"Error fetching updates: {e}")
+                    await asyncio.sleep(1)
+                    continue
+                for update in updates:
+                    owner = update.effective_chat or update.effective_user
+                    pool.dispatch(update.to_dict(), owner.id if owner else 0)
+                    offset = update.update_id + 1
+    finally:
+        await asyncio.to_thread(pool.stop)
+
+# --- Webhook Mode ---
+# The Application and its event loop live at module level so that warm
+# Cloud Functions invocations reuse them instead of rebuilding per request.
+_webhook_loop = None
+_webhook_application = None
+# Held for each request: concurrent requests to one instance must not re-enter the loop.
+_webhook_lock = threading.Lock()
+
+async def get_webhook_application() -> Application:
+    global _webhook_application
+    if _webhook_application is None:
+        application = build_application()
+        await application.initialize()
+        # No loop-lag sampler or metrics port here: the loop only runs while
+        # a request is being handled.
+        open_resources()
+        _webhook_application = application
+    return _webhook_application
+
+async def handle_webhook_update(data: dict) -> None:
+    application = await get_webhook_application()
+    await application.process_update(Update.de_json(data, application.bot))
+    # The update has been handled. Errors from here on are logged, not raised:
+    # a 500 would make Telegram deliver the update again and run its handlers twice.
+    bot = application.bot
+    # There is no job queue between invocations: sweep due deadlines here (an
+    # idle sweep is a heap peek) and persist before the instance may be frozen.
+    await logged("deadline sweep", run_deadline_sweep(bot))
+    if deposit_verifier.due():
+        await logged("deposit verification", run_deposit_verification(bot))
+    # Accruals missed while no requests came in are caught up one day at a time.
+    while user_finances.accrual_due(DAILY_INTEREST_INTERVAL):
+        if not await logged("interest accrual", run_interest_accrual(bot, DAILY_INTEREST_INTERVAL)):
+            break
+    # No poller either: refresh the token index in the background when stale.
+    market_data.refresh_if_stale()
+    await logged("persistence update", application.update_persistence())
+    await user_finances.flush_async()
+    await deadlines.flush_async()
+    await conversation_persistence.flush_async()
+
+async def logged(what: str, coroutine) -> bool:
+    """Await ``coroutine``; log and return False if it raises."""
+    try:
+        await coroutine
+        return True
+    except Exception as e:
+        logger.error(f"Error in {what} after a webhook update: {e}")
+        return False
+
 # --- Cloud Functions Entry Point ---
 def run_telegram_bot_entry(request):
     """
     This is the Cloud Functions HTTP entry point.
-    When an HTTP request is received, it triggers the bot.
+    Telegram POSTs each Update here (see setWebhook); it is handled by the
+    warm module-level Application and the response is returned once the
+    handlers have finished.
     """
+    global _webhook_loop
+    if TELEGRAM_WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != TELEGRAM_WEBHOOK_SECRET:
+        return "Forbidden", 403
+    data = request.get_json(force=True, silent=True)
+    if not isinstance(data, dict):
+        return "Bad Request", 400
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(run_telegram_bot())
-        return "Bot started", 200
+        with _webhook_lock:
+            if _webhook_loop is None:
+                _webhook_loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(_webhook_loop)
+            _webhook_loop.run_until_complete(handle_webhook_update(data))
+        return "OK", 200
     except Exception as e:
-        logger.error(f"Error starting bot: {e}")
+        logger.error(f"Error handling webhook update: {e}")
         return f"Error: {e}", 500
 
 if __name__ == "__main__":
-    asyncio.run(run_telegram_bot())
\ No newline at end of file
+    asyncio.run(run_worker_pool() if WORKERS > 1 else run_telegram_bot())
\ No newline at end of file
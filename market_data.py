@@ -0,0 +1,305 @@
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+
+import httpx
+from telegram.helpers import escape_markdown
+
+logger = logging.getLogger(__name__)
+
+DEXSCREENER_BASE_URL = os.getenv("DEXSCREENER_BASE_URL", "https://api.dexscreener.com")
+TOP_BOOSTS_PATH = "/token-boosts/top/v1"
+TOKENS_PATH = "/tokens/v1/{chain_id}/{addresses}"
+# DexScreener accepts up to 30 comma-separated addresses per tokens request.
+TOKENS_BATCH_SIZE = 30
+
+# Seconds between background refreshes of the token index behind /price and /top.
+MARKET_DATA_POLL_INTERVAL = float(os.getenv("MARKET_DATA_POLL_INTERVAL", "30"))
+# Seconds after a failed refresh during which requests stop waiting on the upstream for a first index.
+MARKET_DATA_RETRY_INTERVAL = float(os.getenv("MARKET_DATA_RETRY_INTERVAL", "60"))
+# Tokens always indexed besides the boosted ones, as chain:address (default: wrapped SOL).
+MARKET_DATA_WATCHLIST = os.getenv("MARKET_DATA_WATCHLIST", "solana:So11111111111111111111111111111111111111112")
+
+
+@dataclass(slots=True)
+class TokenQuote:
+    chain_id: str
+    address: str
+    symbol: str
+    name: str
+    price_usd: float
+    price_change_24h: float
+    liquidity_usd: float
+    volume_24h: float
+    url: str = ""
+
+
+def quote_from_pairs(pairs: list) -> TokenQuote:
+    """Quote a token from its most liquid pair."""
+    pair = max(pairs, key=lambda p: (p.get("liquidity") or {}).get("usd") or 0)
+    base = pair.get("baseToken") or {}
+    return TokenQuote(
+        chain_id=pair.get("chainId", ""),
+        address=base.get("address", ""),
+        symbol=base.get("symbol") or "",
+        name=base.get("name") or "",
+        price_usd=float(pair.get("priceUsd") or 0),
+        price_change_24h=float((pair.get("priceChange") or {}).get("h24") or 0),
+        liquidity_usd=float((pair.get("liquidity") or {}).get("usd") or 0),
+        volume_24h=float((pair.get("volume") or {}).get("h24") or 0),
+        url=pair.get("url", ""),
+    )
+
+
+class TokenIndex:
+    """Immutable snapshot of quotes, looked up by address, symbol or name.
+
+    Lookups try the address first, then the symbol, then the name, all case
+    insensitive; a symbol or name shared by several tokens resolves to the
+    most liquid one. The poller builds a new index and swaps it in whole.
+    """
+
+    def __init__(self, ranked: list = (), extra: list = (), updated_at: float = None):
+        self.ranked = list(ranked)
+        self.updated_at = updated_at
+        self._by_address = {}
+        self._by_symbol = {}
+        self._by_name = {}
+        # Ascending liquidity, so the most liquid token claims shared keys.
+        for quote in sorted([*self.ranked, *extra], key=lambda q: q.liquidity_usd):
+            self._by_address[quote.address.lower()] = quote
+            if quote.symbol:
+                self._by_symbol[quote.symbol.lower()] = quote
+            if quote.name:
+                self._by_name[quote.name.lower()] = quote
+
+    def __len__(self) -> int:
+        return len(self._by_address)
+
+    def get(self, query: str):
+        key = query.strip().lstrip("$").lower()
+        return self._by_address.get(key) or self._by_symbol.get(key) or self._by_name.get(key)
+
+    def resolve(self, queries: list) -> list:
+        """Return (query, quote or None) for every query, against one snapshot."""
+        return [(query, self.get(query)) for query in queries]
+
+    def top(self, n: int) -> list:
+        return self.ranked[:n]
+
+
+def parse_watchlist(value: str) -> list:
+    return [tuple(item.strip().split(":", 1)) for item in value.split(",") if ":" in item]
+
+
+class MarketDataClient:
+    """Shared async DexScreener client backed by one pooled HTTP connection."""
+
+    def __init__(self, base_url: str = DEXSCREENER_BASE_URL, timeout: float = 10.0,
+                 retry_interval: float = MARKET_DATA_RETRY_INTERVAL):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.index = TokenIndex()
+        self.watchlist = parse_watchlist(MARKET_DATA_WATCHLIST)
+        self.hits = 0
+        self.misses = 0
+        self.index_refreshes = 0
+        self.not_modified = 0
+        self.refresh_failures = 0
+        self.failed_at = None
+        self._validators = {}
+        self._refreshing = None
+        self._poller = None
+        self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Created lazily so the client binds to the loop that actually uses it.
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            )
+        return self._client
+
+    # --- Token index ---
+    async def _get_json(self, path: str) -> tuple:
+        """Conditional GET; return (data, changed), reusing the last body on 304."""
+        cached = self._validators.get(path)
+        headers = {}
+        if cached is not None:
+            etag, last_modified, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        r = await self._get_client().get(path, headers=headers)
+        if r.status_code == 304 and cached is not None:
+            self.not_modified += 1
+            return cached[2], False
+        r.raise_for_status()
+        data = r.json()
+        self._validators[path] = (r.headers.get("ETag"), r.headers.get("Last-Modified"), data)
+        return data, True
+
+    async def _build_index(self) -> None:
+        boosts, changed = await self._get_json(TOP_BOOSTS_PATH)
+        if isinstance(boosts, dict):
+            boosts = boosts.get("data", [])
+        ranked = list(dict.fromkeys(
+            (b["chainId"], b["tokenAddress"]) for b in boosts if b.get("chainId") and b.get("tokenAddress")
+        ))
+        tokens = list(dict.fromkeys(ranked + self.watchlist))
+        by_chain = {}
+        for chain_id, address in tokens:
+            by_chain.setdefault(chain_id, []).append(address)
+        paths = [
+            TOKENS_PATH.format(chain_id=chain_id, addresses=",".join(addresses[i:i + TOKENS_BATCH_SIZE]))
+            for chain_id, addresses in by_chain.items()
+            for i in range(0, len(addresses), TOKENS_BATCH_SIZE)
+        ]
+        results = await asyncio.gather(*(self._get_json(path) for path in paths))
+        # Forget validators for batches the current token set no longer asks for.
+        for path in [p for p in self._validators if p != TOP_BOOSTS_PATH and p not in paths]:
+            del self._validators[path]
+        if not changed and not any(batch_changed for _, batch_changed in results) and self.index.updated_at:
+            self.index.updated_at = time.monotonic()
+            return
+        pairs = {}
+        for batch, _ in results:
+            for pair in batch if isinstance(batch, list) else batch.get("pairs") or []:
+                address = (pair.get("baseToken") or {}).get("address")
+                if address:
+                    pairs.setdefault((pair.get("chainId"), address), []).append(pair)
+        quotes = {key: quote_from_pairs(found) for key, found in pairs.items()}
+        self.index = TokenIndex(
+            [quotes[key] for key in ranked if key in quotes],
+            [quotes[key] for key in self.watchlist if key in quotes],
+            updated_at=time.monotonic(),
+        )
+        self.index_refreshes += 1
+
+    async def _refresh(self) -> None:
+        try:
+            await self._build_index()
+        except Exception:
+            self.refresh_failures += 1
+            self.failed_at = time.monotonic()
+            raise
+        self.failed_at = None
+
+    async def refresh_index(self) -> None:
+        # Concurrent callers share one refresh.
+        if self._refreshing is None:
+            self._refreshing = asyncio.get_running_loop().create_task(self._refresh())
+            self._refreshing.add_done_callback(lambda t: setattr(self, "_refreshing", None))
+        await asyncio.shield(self._refreshing)
+
+    @property
+    def available(self) -> bool:
+        """Whether any refresh has succeeded; until then the index is empty."""
+        return self.index.updated_at is not None
+
+    def _backing_off(self) -> bool:
+        return self.failed_at is not None and time.monotonic() - self.failed_at < self.retry_interval
+
+    async def ready_index(self) -> TokenIndex:
+        """Return the current index, waiting for the first refresh only at cold start.
+
+        Within ``retry_interval`` of a failed refresh the empty index is
+        returned at once rather than every request waiting on the upstream
+        again; callers check ``available``.
+        """
+        if not self.available and not self._backing_off():
+            try:
+                await self.refresh_index()
+            except Exception as e:
+                logger.warning(f"Token index refresh failed: {e}")
+        return self.index
+
+    async def resolve(self, queries: list) -> list:
+        """Return (query, quote or None) for every query against the current index, counting hits."""
+        resolved = (await self.ready_index()).resolve(queries)
+        misses = sum(quote is None for _, quote in resolved)
+        self.hits += len(resolved) - misses
+        self.misses += misses
+        return resolved
+
+    def refresh_if_stale(self, interval: float = MARKET_DATA_POLL_INTERVAL) -> None:
+        """Start a background refresh if the index is older than ``interval`` (webhook mode)."""
+        updated_at = self.index.updated_at
+        if self._refreshing is None and not self._backing_off() and (
+                updated_at is None or time.monotonic() - updated_at >= interval):
+            task = asyncio.get_running_loop().create_task(self.refresh_index())
+            task.add_done_callback(self._log_refresh_error)
+
+    def _log_refresh_error(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Token index refresh failed: {task.exception()}")
+
+    async def _poll(self, interval: float) -> None:
+        while True:
+            try:
+                await self.refresh_index()
+            except Exception as e:
+                logger.warning(f"Token index refresh failed: {e}")
+            await asyncio.sleep(interval)
+
+    def start_polling(self, interval: float = MARKET_DATA_POLL_INTERVAL) -> None:
+        if self._poller is None:
+            self._poller = asyncio.get_running_loop().create_task(self._poll(interval))
+
+    async def stop_polling(self) -> None:
+        if self._poller is not None:
+            self._poller.cancel()
+            try:
+                await self._poller
+            except asyncio.CancelledError:
+                pass
+            self._poller = None
+
+    def stats(self) -> dict:
+        updated_at = self.index.updated_at
+        return {
+            "tokens": len(self.index),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rebuilds": self.index_refreshes,
+            "not_modified": self.not_modified,
+            "refresh_failures": self.refresh_failures,
+            "age": round(time.monotonic() - updated_at, 1) if updated_at is not None else None,
+        }
+
+    async def aclose(self) -> None:
+        await self.stop_polling()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def format_price(price: float) -> str:
+    return f"${price:,.2f}" if price >= 1 else f"${price:.6g}"
+
+
+def format_quote(quote: TokenQuote) -> str:
+    # Token names come from upstream and may contain Markdown characters.
+    symbol, name = escape_markdown(quote.symbol, version=1), escape_markdown(quote.name, version=1)
+    return f"*{symbol}* ({name}): {format_price(quote.price_usd)} ({quote.price_change_24h:+.1f}% 24h)"
+
+
+def format_market_update(quotes: list) -> str:
+    tokens_info = "\n".join(
+        f"- {escape_markdown(quote.name or 'Unknown', version=1)}: {format_price(quote.price_usd)}" for quote in quotes
+    )
+    return (
+        "📈 **DEXscanner Market Data:**\n"
+        f"{tokens_info}\n\n"
+        "Thank you for using **Sense Bot Free Version**!"
+    )
+
+
+# Shared instance used by the bot handlers.
+market_data = MarketDataClient()
@@ -0,0 +1,235 @@
+import os
+import time
+import signal
+import asyncio
+import logging
+from bisect import bisect_left
+from datetime import datetime, timezone
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+# Serve Prometheus text on this local port (unset = no endpoint).
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# Written on SIGUSR1 and at shutdown.
+METRICS_DUMP_PATH = os.getenv("METRICS_DUMP_PATH", "bot_metrics.prom")
+METRICS_LAG_INTERVAL = float(os.getenv("METRICS_LAG_INTERVAL", "0.5"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LAG_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram; observing is one bisect and two additions."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str = "") -> list:
+        sep = "," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum:.6f}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+def update_type(update) -> str:
+    for kind in update.ALL_TYPES:
+        if getattr(update, kind, None) is not None:
+            return kind
+    return "unknown"
+
+
+class BotMetrics:
+    """Per-handler latency, update and error counts, loop lag and job backlog.
+
+    ``instrument`` wraps the callback of every registered handler (including
+    the states of conversation handlers) and adds a group -1 hook that counts
+    updates by type before any other group runs. Everything is rendered as
+    Prometheus text, served on ``METRICS_PORT`` and dumped on SIGUSR1.
+    """
+
+    def __init__(self):
+        self.handler_latency = {}
+        self.updates = {}
+        self.errors = {}
+        self.loop_lag = Histogram(LAG_BUCKETS)
+        self.last_loop_lag = 0.0
+        self.dump_path = METRICS_DUMP_PATH
+        self._application = None
+        self._lag_task = None
+        self._server = None
+
+    # --- Recording ---
+    def instrument(self, application) -> None:
+        from telegram import Update
+        from telegram.ext import ConversationHandler, TypeHandler
+        self._application = application
+
+        def wrap(handler):
+            if isinstance(handler, ConversationHandler):
+                for child in handler.entry_points + handler.fallbacks:
+                    wrap(child)
+                for state_handlers in handler.states.values():
+                    for child in state_handlers:
+                        wrap(child)
+            elif not getattr(handler.callback, "_timed", False):
+                handler.callback = self.timed(handler.callback)
+
+        for handlers in application.handlers.values():
+            for handler in handlers:
+                wrap(handler)
+        application.add_handler(TypeHandler(Update, self._count_update), group=-1)
+
+    def timed(self, callback):
+        histogram = self.handler_latency.setdefault(callback.__name__, Histogram(LATENCY_BUCKETS))
+
+        @wraps(callback)
+        async def wrapper(update, context):
+            start = time.perf_counter()
+            try:
+                return await callback(update, context)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+
+        wrapper._timed = True
+        return wrapper
+
+    async def _count_update(self, update, context) -> None:
+        kind = update_type(update)
+        self.updates[kind] = self.updates.get(kind, 0) + 1
+
+    def record_error(self, error: BaseException) -> None:
+        name = type(error).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    async def _sample_loop_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + METRICS_LAG_INTERVAL
+            await asyncio.sleep(METRICS_LAG_INTERVAL)
+            self.last_loop_lag = max(0.0, loop.time() - expected)
+            self.loop_lag.observe(self.last_loop_lag)
+
+    # --- Export ---
+    def job_backlog(self) -> tuple:
+        """Return (overdue jobs, seconds the oldest one is late)."""
+        application = self._application
+        if application is None or application.job_queue is None:
+            return 0, 0.0
+        now = datetime.now(timezone.utc)
+        delays = []
+        for job in application.job_queue.jobs():
+            # Jobs have no next run time until the scheduler has started.
+            next_t = getattr(job.job, "next_run_time", None)
+            if next_t is not None and next_t <= now:
+                delays.append((now - next_t).total_seconds())
+        return len(delays), max(delays, default=0.0)
+
+    def render(self) -> str:
+        lines = [
+            "# HELP bot_handler_seconds Time spent in each handler callback.",
+            "# TYPE bot_handler_seconds histogram",
+        ]
+        for name, histogram in sorted(self.handler_latency.items()):
+            if histogram.count:
+                lines.extend(histogram.render("bot_handler_seconds", f'handler="{name}"'))
+        lines += ["# HELP bot_updates_total Updates received, by type.", "# TYPE bot_updates_total counter"]
+        lines += [f'bot_updates_total{{type="{kind}"}} {count}' for kind, count in sorted(self.updates.items())]
+        lines += ["# HELP bot_errors_total Errors reaching the error handler, by exception class.",
+                  "# TYPE bot_errors_total counter"]
+        lines += [f'bot_errors_total{{error="{name}"}} {count}' for name, count in sorted(self.errors.items())]
+        lines += ["# HELP bot_event_loop_lag_seconds Delay of a periodic timer on the event loop.",
+                  "# TYPE bot_event_loop_lag_seconds histogram"]
+        lines += self.loop_lag.render("bot_event_loop_lag_seconds")
+        backlog, delay = self.job_backlog()
+        update_queue = self._application.update_queue.qsize() if self._application is not None else 0
+        lines += [
+            "# HELP bot_job_backlog Scheduled jobs that are due but have not started.",
+            "# TYPE bot_job_backlog gauge",
+            f"bot_job_backlog {backlog}",
+            "# HELP bot_job_delay_seconds How late the most overdue job is.",
+            "# TYPE bot_job_delay_seconds gauge",
+            f"bot_job_delay_seconds {delay:.6f}",
+            "# HELP bot_update_queue_depth Updates waiting to be dispatched.",
+            "# TYPE bot_update_queue_depth gauge",
+            f"bot_update_queue_depth {update_queue}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str = None) -> None:
+        path = path or self.dump_path
+        try:
+            with open(path, "w") as f:
+                f.write(self.render())
+            logger.info(f"Metrics written to {path}")
+        except OSError as e:
+            logger.error(f"Error writing metrics to {path}: {e}")
+
+    async def _serve(self, reader, writer) -> None:
+        try:
+            # Any request gets the metrics; read up to the end of the headers.
+            while (await reader.readline()).strip():
+                pass
+            body = self.render().encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    # --- Lifecycle ---
+    async def start(self, port: int = METRICS_PORT) -> None:
+        loop = asyncio.get_running_loop()
+        if self._lag_task is None:
+            self._lag_task = loop.create_task(self._sample_loop_lag())
+        if port and self._server is None:
+            self._server = await asyncio.start_server(self._serve, METRICS_HOST, port)
+            logger.info(f"Serving metrics on http://{METRICS_HOST}:{port}/metrics")
+        try:
+            loop.add_signal_handler(signal.SIGUSR1, self.dump)
+        except (NotImplementedError, AttributeError, RuntimeError):
+            pass  # no SIGUSR1 (Windows) or not on the main thread
+
+    async def stop(self) -> None:
+        try:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGUSR1)
+        except (NotImplementedError, AttributeError, RuntimeError):
+            pass
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            try:
+                await self._lag_task
+            except asyncio.CancelledError:
+                pass
+            self._lag_task = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+# Shared instance used by the bot.
+metrics = BotMetrics()
@@ -0,0 +1,252 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+
+from storage import connect, transaction
+
+logger = logging.getLogger(__name__)
+
+# Up to this many queued messages are sent over one connection per round.
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_RETRY_BASE = 5.0
+OUTBOX_RETRY_MAX = 900.0
+
+OUTBOX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS support_outbox (
+    id INTEGER PRIMARY KEY,
+    sender TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS support_outbox_due ON support_outbox (next_attempt_at) WHERE state = 'queued';
+"""
+
+
+class SMTPSender:
+    """Keeps one authenticated SMTP connection open and reuses it across sends.
+
+    Blocking; meant to be driven from a worker thread. smtplib and email are
+    imported on first send so that importing the bot does not load them.
+    """
+
+    def __init__(self, host: str, port: int, user: str = None, password: str = None,
+                 starttls: bool = True, timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._server = None
+
+    def _connect(self):
+        import smtplib
+        if self._server is None:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                server.starttls()
+            if self.user and self.password:
+                server.login(self.user, self.password)
+            self._server = server
+        return self._server
+
+    def _send(self, sender: str, recipient: str, subject: str, body: str) -> None:
+        import smtplib
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
+        message = MIMEMultipart()
+        message['From'] = sender
+        message['To'] = recipient
+        message['Subject'] = subject
+        message.attach(MIMEText(body, 'plain'))
+        try:
+            self._connect().sendmail(sender, recipient, message.as_string())
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped an idle connection; reconnect once.
+            self._server = None
+            self._connect().sendmail(sender, recipient, message.as_string())
+
+    def send_batch(self, messages: list) -> list:
+        """Send (id, sender, recipient, subject, body) tuples; return (id, error or None)."""
+        import smtplib
+        results = []
+        for message_id, sender, recipient, subject, body in messages:
+            try:
+                self._send(sender, recipient, subject, body)
+                results.append((message_id, None))
+            except (smtplib.SMTPException, OSError) as e:
+                results.append((message_id, f"{type(e).__name__}: {e}"))
+                if not isinstance(e, smtplib.SMTPRecipientsRefused):
+                    self.close()
+        return results
+
+    def close(self) -> None:
+        if self._server is not None:
+            import smtplib
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+
+class SupportOutbox:
+    """Durable SQLite queue of support emails drained by a background worker.
+
+    ``enqueue`` only inserts a row, so handlers can reply immediately. The
+    worker sends due messages in batches over a reused connection and retries
+    failures with exponential backoff until ``OUTBOX_MAX_ATTEMPTS``. Every
+    query runs on a worker thread: the database is shared with the other
+    stores, and a flush or an accrual holding it must not stall the loop.
+    """
+
+    def __init__(self, path: str, sender: SMTPSender, batch_size: int = OUTBOX_BATCH_SIZE,
+                 max_attempts: int = OUTBOX_MAX_ATTEMPTS):
+        self.path = path
+        self.sender = sender
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._conn = None
+        self._lock = threading.Lock()
+        self._task = None
+        self._wakeup = None
+        self.depth = 0
+        self.sent = 0
+        self.failures = 0
+        self.dead = 0
+        self.last_send_seconds = 0.0
+        self.last_delivery_latency = 0.0
+
+    def open(self) -> None:
+        if self._conn is not None:
+            return
+        conn = connect(self.path, OUTBOX_SCHEMA)
+        self.depth = conn.execute("SELECT COUNT(*) FROM support_outbox WHERE state = 'queued'").fetchone()[0]
+        self._conn = conn
+
+    async def enqueue(self, sender: str, recipient: str, subject: str, body: str) -> int:
+        message_id = await asyncio.to_thread(self._insert, sender, recipient, subject, body, time.time())
+        self.depth += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return message_id
+
+    def _insert(self, sender: str, recipient: str, subject: str, body: str, now: float) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO support_outbox (sender, recipient, subject, body, created_at, next_attempt_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (sender, recipient, subject, body, now, now),
+            )
+        return cursor.lastrowid
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.sender.close)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def run(self) -> None:
+        while True:
+            try:
+                delay = await self.drain_once()
+            except Exception as e:
+                logger.error(f"Support outbox worker error: {e}")
+                delay = OUTBOX_RETRY_BASE
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def drain_once(self) -> float:
+        """Send one batch of due messages; return seconds until the next is due."""
+        now = time.time()
+        rows, next_due = await asyncio.to_thread(self._due, now)
+        if not rows:
+            return min(60.0, next_due - now) if next_due is not None else 60.0
+        start = time.perf_counter()
+        results = await asyncio.to_thread(self.sender.send_batch, [row[:5] for row in rows])
+        self.last_send_seconds = time.perf_counter() - start
+        await self._record_results(rows, dict(results))
+        # Check again right away; an empty round reports the next due time.
+        return 0.0
+
+    def _due(self, now: float) -> tuple:
+        """Return (one batch of due rows, the next due time if none are due)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, sender, recipient, subject, body, created_at, attempts FROM support_outbox "
+                "WHERE state = 'queued' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (now, self.batch_size),
+            ).fetchall()
+            if rows:
+                return rows, None
+            return [], self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM support_outbox WHERE state = 'queued'"
+            ).fetchone()[0]
+
+    async def _record_results(self, rows: list, errors: dict) -> None:
+        now = time.time()
+        sent, retries, dead = [], [], []
+        for message_id, _, _, _, _, created_at, attempts in rows:
+            error = errors.get(message_id)
+            if error is None:
+                sent.append((message_id,))
+                self.last_delivery_latency = now - created_at
+                continue
+            attempts += 1
+            logger.warning(f"Support email {message_id} failed (attempt {attempts}): {error}")
+            if attempts >= self.max_attempts:
+                dead.append((attempts, error, message_id))
+            else:
+                backoff = min(OUTBOX_RETRY_MAX, OUTBOX_RETRY_BASE * 2 ** (attempts - 1))
+                retries.append((attempts, now + backoff * random.uniform(0.8, 1.2), error, message_id))
+        await asyncio.to_thread(self._write_results, sent, retries, dead)
+        self.depth -= len(sent) + len(dead)
+        self.sent += len(sent)
+        self.failures += len(retries) + len(dead)
+        self.dead += len(dead)
+
+    def _write_results(self, sent: list, retries: list, dead: list) -> None:
+        with transaction(self._conn, self._lock) as conn:
+            conn.executemany("DELETE FROM support_outbox WHERE id = ?", sent)
+            conn.executemany(
+                "UPDATE support_outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?", retries
+            )
+            conn.executemany(
+                "UPDATE support_outbox SET attempts = ?, state = 'dead', last_error = ? WHERE id = ?", dead
+            )
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "sent": self.sent,
+            "failures": self.failures,
+            "dead": self.dead,
+            "last_send_seconds": self.last_send_seconds,
+            "last_delivery_latency": self.last_delivery_latency,
+        }
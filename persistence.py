@@ -0,0 +1,162 @@
+import json
+import asyncio
+import logging
+import threading
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from storage import USER_FINANCES_DB, USER_FINANCES_FLUSH_INTERVAL, connect, transaction, write_behind
+
+logger = logging.getLogger(__name__)
+
+PERSISTENCE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    name TEXT NOT NULL,
+    conversation_key TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (name, conversation_key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS user_data (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+
+class SQLitePersistence(BasePersistence):
+    """Conversation states and ``user_data`` kept in SQLite, written incrementally.
+
+    The Application hands over only the users and conversation keys touched
+    since its last run; they are buffered here and written in one transaction
+    per ``flush_async``, so a flush costs the number of changed chats rather
+    than the number of active ones. Ended conversations are deleted. Only
+    in-progress conversations are read at startup; a user's data is read on
+    the first update from that user. Values are stored as JSON.
+    """
+
+    def __init__(self, path: str = USER_FINANCES_DB, update_interval: float = USER_FINANCES_FLUSH_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._loaded_users = set()
+        self._dirty_users = {}
+        self._dirty_conversations = {}
+
+    def _connect(self):
+        # Opened on first use: the Application reads conversations in
+        # initialize(), before the post_init hook opens the other stores.
+        if self._conn is None:
+            self._conn = connect(self.path, PERSISTENCE_SCHEMA)
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        dirty = self._take_dirty()
+        if dirty is not None:
+            self._write(dirty)
+        self._conn.close()
+        self._conn = None
+
+    # --- Loading ---
+    async def get_conversations(self, name: str) -> dict:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT conversation_key, state FROM conversations WHERE name = ?", (name,)
+            ).fetchall()
+        logger.info(f"Loaded {len(rows)} in-progress {name} conversations")
+        return {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+
+    async def get_user_data(self) -> dict:
+        # Nothing up front; see refresh_user_data.
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        if user_id in self._loaded_users:
+            return
+        self._loaded_users.add(user_id)
+        with self._lock:
+            row = self._connect().execute("SELECT data FROM user_data WHERE user_id = ?", (user_id,)).fetchone()
+        if row is not None:
+            # Keys set before the first refresh (none in practice) take precedence.
+            user_data.update({**json.loads(row[0]), **user_data})
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    # --- Buffering ---
+    async def update_conversation(self, name: str, key: tuple, new_state) -> None:
+        self._dirty_conversations[(name, json.dumps(key))] = new_state
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._loaded_users.add(user_id)
+        self._dirty_users[user_id] = data
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._loaded_users.add(user_id)
+        self._dirty_users[user_id] = None
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    # --- Writing ---
+    def _take_dirty(self):
+        users, self._dirty_users = self._dirty_users, {}
+        conversations, self._dirty_conversations = self._dirty_conversations, {}
+        return (users, conversations) if users or conversations else None
+
+    def _write(self, dirty: tuple) -> None:
+        users, conversations = dirty
+        user_upserts = [(user_id, json.dumps(data)) for user_id, data in users.items() if data is not None]
+        user_deletes = [(user_id,) for user_id, data in users.items() if data is None]
+        conversation_upserts = [(name, key, json.dumps(state)) for (name, key), state in conversations.items()
+                                if state is not None]
+        conversation_deletes = [(name, key) for (name, key), state in conversations.items() if state is None]
+        with transaction(self._connect(), self._lock) as conn:
+            conn.executemany("INSERT OR REPLACE INTO user_data (user_id, data) VALUES (?, ?)", user_upserts)
+            conn.executemany("DELETE FROM user_data WHERE user_id = ?", user_deletes)
+            conn.executemany(
+                "INSERT OR REPLACE INTO conversations (name, conversation_key, state) VALUES (?, ?, ?)",
+                conversation_upserts,
+            )
+            conn.executemany("DELETE FROM conversations WHERE name = ? AND conversation_key = ?",
+                             conversation_deletes)
+
+    def _restore(self, dirty: tuple) -> None:
+        users, conversations = dirty
+        self._dirty_users = {**users, **self._dirty_users}
+        self._dirty_conversations = {**conversations, **self._dirty_conversations}
+
+    async def flush_async(self) -> None:
+        async with self._flush_lock:
+            await write_behind(self._take_dirty, self._write, self._restore, "conversation state")
+
+    async def flush(self) -> None:
+        # Called by Application.stop() after a final update_persistence().
+        await self.flush_async()
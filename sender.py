@@ -0,0 +1,250 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+
+from telegram.error import RetryAfter, Forbidden, BadRequest
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows roughly 30 messages/second overall and 1 message/second per chat.
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_PER_CHAT_RATE = float(os.getenv("TELEGRAM_PER_CHAT_RATE", "1"))
+# Messages a chat may get back to back before the per-chat rate applies.
+TELEGRAM_PER_CHAT_BURST = float(os.getenv("TELEGRAM_PER_CHAT_BURST", "3"))
+# Attempts after a 429 before a request is given up.
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "3"))
+NOTIFY_CONCURRENCY = int(os.getenv("NOTIFY_CONCURRENCY", "30"))
+MAX_MESSAGE_LENGTH = 4096
+
+# Lower goes first.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+
+def retry_seconds(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+
+
+class TokenBucket:
+    """Token bucket refilled at ``rate`` tokens/second up to ``capacity``."""
+
+    __slots__ = ("rate", "capacity", "_tokens", "_updated")
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """Take a token and return 0, or return the seconds until one is available."""
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def acquire(self) -> None:
+        while (wait := self.try_acquire()) > 0:
+            await asyncio.sleep(wait)
+
+    def refund(self) -> None:
+        self._tokens = min(self.capacity, self._tokens + 1)
+
+    def drain(self) -> None:
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+
+    def full(self) -> bool:
+        return self._tokens + (time.monotonic() - self._updated) * self.rate >= self.capacity
+
+
+class OutboundScheduler(BaseRateLimiter):
+    """Single send queue for every Bot API call the application makes.
+
+    Installed with ``Application.builder().rate_limiter(...)``. Requests
+    addressed to a chat first wait on that chat's bucket, then take a slot
+    from the global bucket in priority order: replies to users are
+    interactive, notifications pass ``rate_limit_args={"priority":
+    PRIORITY_BACKGROUND}``. A 429 pauses all sending for its Retry-After,
+    lowers the global rate (it climbs back with each success) and the
+    request is retried. Callers that already went through ``admit``
+    pass ``{"admitted": True}``.
+    """
+
+    def __init__(self, global_rate: float = TELEGRAM_GLOBAL_RATE, per_chat_rate: float = TELEGRAM_PER_CHAT_RATE,
+                 per_chat_burst: float = TELEGRAM_PER_CHAT_BURST, max_retries: int = TELEGRAM_MAX_RETRIES):
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_retries = max_retries
+        self.global_rate = global_rate
+        self._global = TokenBucket(global_rate)
+        self._chats = {}
+        self._prune_at = 1024
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._dispatcher = None
+        self._paused_until = 0.0
+        self.requests = 0
+        self.queued = 0
+        self.retried = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self._prune_at:
+                # A full bucket holds nothing a fresh one would not.
+                self._chats = {key: b for key, b in self._chats.items() if not b.full()}
+                self._prune_at = max(1024, 2 * len(self._chats))
+            bucket = self._chats[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+        return bucket
+
+    async def admit(self, chat_id, priority: int = PRIORITY_INTERACTIVE) -> None:
+        """Wait until a message to ``chat_id`` may be sent."""
+        await self._chat_bucket(chat_id).acquire()
+        if not self._waiters and time.monotonic() >= self._paused_until and self._global.try_acquire() == 0:
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self.queued += 1
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self) -> None:
+        while self._waiters:
+            wait = self._paused_until - time.monotonic()
+            if wait <= 0:
+                wait = self._global.try_acquire()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if future.cancelled():
+                self._global.refund()
+            else:
+                future.set_result(None)
+
+    def pause(self, seconds: float) -> None:
+        now = time.monotonic()
+        if now >= self._paused_until:
+            # One cut per flood episode, however many sends in flight hit it.
+            self._global.rate = max(self._global.rate * 0.75, self.global_rate / 10)
+        self._paused_until = max(self._paused_until, now + seconds)
+        # Resume from an empty bucket rather than with a burst.
+        self._global.drain()
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        options = rate_limit_args or {}
+        chat_id = data.get("chat_id")
+        admitted = options.get("admitted", False)
+        self.requests += 1
+        for attempt in range(self.max_retries + 1):
+            if chat_id is not None and not admitted:
+                await self.admit(chat_id, options.get("priority", PRIORITY_INTERACTIVE))
+            elif (wait := self._paused_until - time.monotonic()) > 0:
+                await asyncio.sleep(wait)
+            admitted = False
+            try:
+                result = await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                self.retried += 1
+                self.pause(retry_seconds(e))
+                logger.warning(f"Flood control hit on {endpoint}; pausing sends for {retry_seconds(e)}s")
+                continue
+            if self._global.rate < self.global_rate:
+                self._global.rate = min(self.global_rate, self._global.rate + self.global_rate / 1000)
+            return result
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "queued": self.queued, "retried": self.retried,
+                "rate": round(self._global.rate, 2),
+                "waiting": len(self._waiters), "chats": len(self._chats)}
+
+
+def split_message(texts: list, limit: int = MAX_MESSAGE_LENGTH) -> list:
+    """Join texts with blank lines into as few messages as fit within ``limit``."""
+    chunks = []
+    for text in texts:
+        if chunks and len(chunks[-1]) + 2 + len(text) <= limit:
+            chunks[-1] += "\n\n" + text
+        else:
+            chunks.append(text)
+    return chunks
+
+
+class NotificationSender:
+    """Background notifications at low priority, merged per chat while they wait.
+
+    A notification for a chat that already has one waiting for ``scheduler``
+    is appended to it, so the chat gets one message instead of several.
+    """
+
+    def __init__(self, scheduler: OutboundScheduler = None, concurrency: int = NOTIFY_CONCURRENCY):
+        self.scheduler = scheduler if scheduler is not None else OutboundScheduler()
+        self.concurrency = concurrency
+        self._pending = {}
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+
+    async def send(self, bot, chat_id, text: str, **kwargs) -> bool:
+        key = (chat_id, tuple(kwargs.items()))
+        texts = self._pending.get(key)
+        if texts is not None:
+            texts.append(text)
+            self.coalesced += 1
+            return True
+        texts = self._pending[key] = [text]
+        try:
+            await self.scheduler.admit(chat_id, PRIORITY_BACKGROUND)
+        finally:
+            del self._pending[key]
+        # Only the scheduler installed on the bot knows the message was admitted.
+        if getattr(bot, "rate_limiter", None) is self.scheduler:
+            kwargs["rate_limit_args"] = {"admitted": True}
+        for i, chunk in enumerate(split_message(texts)):
+            if i:
+                await self.scheduler.admit(chat_id, PRIORITY_BACKGROUND)
+            try:
+                await bot.send_message(chat_id=chat_id, text=chunk, **kwargs)
+                self.sent += 1
+            except (Forbidden, BadRequest) as e:
+                # The user blocked the bot or the chat is gone; retrying will not help.
+                logger.info(f"Not notifying {chat_id}: {e}")
+                self.failed += 1
+                return False
+            except Exception as e:
+                logger.error(f"Error sending notification to {chat_id}: {e}")
+                self.failed += 1
+                return False
+        return True
+
+    async def send_many(self, bot, messages, **kwargs) -> None:
+        """Send an iterable of (chat_id, text) pairs, at most ``concurrency`` in flight."""
+        iterator = iter(messages)
+
+        async def worker():
+            for chat_id, text in iterator:
+                await self.send(bot, chat_id, text, **kwargs)
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
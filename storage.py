@@ -0,0 +1,465 @@
+import os
+import time
+import asyncio
+import operator
+import logging
+import sqlite3
+import threading
+import contextlib
+
+from workers import shard_sql
+from ledger import LedgerEntry, KIND_INTEREST, STATE_PENDING, STATE_CONFIRMED, HISTORY_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+USER_FINANCES_DB = os.getenv("USER_FINANCES_DB", "user_finances.db")
+# Seconds between write-behind flushes of dirty accounts.
+USER_FINANCES_FLUSH_INTERVAL = float(os.getenv("USER_FINANCES_FLUSH_INTERVAL", "1.0"))
+
+ACCOUNT_FIELDS = (
+    "onboarded",
+    "username",
+    "registration_fee_paid",
+    "invest_choice",
+    "t_and_c_accepted",
+    "total_deposit",
+    "investment",
+    "pending_deposit",
+    "pending_deposit_time",
+    "profit",
+    "ledger_count",
+)
+
+DEFAULT_ACCOUNT = {
+    "onboarded": False,
+    "username": "",
+    "registration_fee_paid": False,
+    "invest_choice": False,
+    "t_and_c_accepted": False,
+    "total_deposit": 0.0,
+    "investment": 0.0,
+    "pending_deposit": 0.0,
+    "pending_deposit_time": None,
+    "profit": 0.0,
+    "ledger_count": 0,
+}
+
+
+
+class Account:
+    """One chat's account fields in ``__slots__``, indexable like the dict it replaces.
+
+    A dict of these fields takes about 470 bytes per account before its
+    values are counted; a slotted record takes 128.
+    """
+    __slots__ = ACCOUNT_FIELDS
+
+    def __init__(self, onboarded=False, username="", registration_fee_paid=False, invest_choice=False,
+                 t_and_c_accepted=False, total_deposit=0.0, investment=0.0, pending_deposit=0.0,
+                 pending_deposit_time=None, profit=0.0, ledger_count=0):
+        self.onboarded = onboarded
+        self.username = username
+        self.registration_fee_paid = registration_fee_paid
+        self.invest_choice = invest_choice
+        self.t_and_c_accepted = t_and_c_accepted
+        self.total_deposit = total_deposit
+        self.investment = investment
+        self.pending_deposit = pending_deposit
+        self.pending_deposit_time = pending_deposit_time
+        self.profit = profit
+        self.ledger_count = ledger_count
+
+    def __getitem__(self, field: str):
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field) from None
+
+    def __setitem__(self, field: str, value) -> None:
+        if field not in ACCOUNT_FIELDS:
+            raise KeyError(field)
+        setattr(self, field, value)
+
+    def get(self, field: str, default=None):
+        return getattr(self, field, default) if field in ACCOUNT_FIELDS else default
+
+    def update(self, fields: dict) -> None:
+        for field, value in fields.items():
+            self[field] = value
+
+    def __repr__(self) -> str:
+        return f"Account({', '.join(f'{field}={getattr(self, field)!r}' for field in ACCOUNT_FIELDS)})"
+
+
+# Field values of an account in column order.
+account_row = operator.attrgetter(*ACCOUNT_FIELDS)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    chat_id INTEGER PRIMARY KEY,
+    onboarded INTEGER NOT NULL DEFAULT 0,
+    username TEXT NOT NULL DEFAULT '',
+    registration_fee_paid INTEGER NOT NULL DEFAULT 0,
+    invest_choice INTEGER NOT NULL DEFAULT 0,
+    t_and_c_accepted INTEGER NOT NULL DEFAULT 0,
+    total_deposit REAL NOT NULL DEFAULT 0,
+    investment REAL NOT NULL DEFAULT 0,
+    pending_deposit REAL NOT NULL DEFAULT 0,
+    pending_deposit_time REAL,
+    profit REAL NOT NULL DEFAULT 0,
+    ledger_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS ledger (
+    chat_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    amount REAL NOT NULL,
+    ts REAL NOT NULL,
+    state TEXT NOT NULL,
+    note TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (chat_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ledger_pending ON ledger (chat_id, seq) WHERE state = 'pending';
+CREATE TABLE IF NOT EXISTS accruals (
+    shard TEXT PRIMARY KEY,
+    last_at REAL NOT NULL
+);
+"""
+
+_COLUMNS = ", ".join(ACCOUNT_FIELDS)
+_UPSERT_ACCOUNT = (
+    f"INSERT INTO accounts (chat_id, {_COLUMNS}) VALUES ({', '.join('?' * (len(ACCOUNT_FIELDS) + 1))}) "
+    f"ON CONFLICT(chat_id) DO UPDATE SET {', '.join(f'{f} = excluded.{f}' for f in ACCOUNT_FIELDS)}"
+)
+_UPSERT_LEDGER = "INSERT OR REPLACE INTO ledger (chat_id, seq, kind, amount, ts, state, note) VALUES (?, ?, ?, ?, ?, ?, ?)"
+_ACCRUAL_WHERE = "registration_fee_paid AND total_deposit > 0"
+_INSERT_INTEREST = (
+    "INSERT INTO ledger (chat_id, seq, kind, amount, ts, state, note) "
+    f"SELECT chat_id, ledger_count + 1, '{KIND_INTEREST}', total_deposit * ?, ?, '{STATE_CONFIRMED}', '' "
+    f"FROM accounts WHERE {_ACCRUAL_WHERE}{{shard}}"
+)
+_APPLY_INTEREST = (
+    "UPDATE accounts SET investment = investment + total_deposit * ?, profit = profit + total_deposit * ?, "
+    f"ledger_count = ledger_count + 1 WHERE {_ACCRUAL_WHERE}{{shard}} RETURNING chat_id, total_deposit * ?, ledger_count"
+)
+# Accrual results are applied to the cache in chunks, yielding to handlers in between.
+ACCRUAL_APPLY_CHUNK = 10_000
+_SELECT_LEDGER = "SELECT seq, kind, amount, ts, state, note FROM ledger WHERE chat_id = ? AND seq BETWEEN ? AND ? ORDER BY seq DESC"
+
+
+def connect(path: str, schema: str) -> sqlite3.Connection:
+    """Open ``path`` for the event loop and writer threads and create ``schema``.
+
+    Autocommit mode, so every write transaction is explicit; WAL, so readers
+    never wait for the writer.
+    """
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.executescript(schema)
+    return conn
+
+
+@contextlib.contextmanager
+def transaction(conn: sqlite3.Connection, lock: threading.Lock, begin: str = "BEGIN"):
+    """Hold ``lock`` and run the block in one transaction, rolled back if it raises."""
+    with lock:
+        conn.execute(begin)
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+async def write_behind(take, write, restore, what: str) -> None:
+    """Write one batch of buffered changes without blocking the event loop.
+
+    ``take()`` snapshots the buffer on the loop, so handlers never race the
+    writer thread, and returns None when there is nothing to write. The batch
+    is written by ``write(batch)`` on a worker thread; if that fails it is
+    handed to ``restore(batch)``, where newer changes to the same keys take
+    precedence.
+    """
+    batch = take()
+    if batch is None:
+        return
+    try:
+        await asyncio.to_thread(write, batch)
+    except Exception as e:
+        logger.error(f"Error flushing {what}: {e}")
+        restore(batch)
+
+
+class AccountStore:
+    """SQLite-backed account store with an in-memory cache and write-behind batching.
+
+    Reads are served from memory. Mutations go through ``create``, ``update``
+    and ``record``, which only mark state dirty; ``flush_async`` writes
+    everything dirty in one transaction on a worker thread.
+
+    Each account keeps a ledger of typed entries addressed by a per-chat
+    sequence number. Pending entries are indexed in memory so confirmations
+    never scan the ledger, and pages are read by sequence range.
+
+    With ``shard`` = (index, count) the store only loads and accrues the
+    chats that hash to ``index``, so worker processes can share one file.
+    """
+
+    def __init__(self, path: str = USER_FINANCES_DB, shard: tuple = None):
+        self.path = path
+        self.shard = shard
+        self._conn = None
+        self._lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._accounts = {}
+        self._pending = {}
+        self._dirty = set()
+        self._ledger_dirty = {}
+        self._ledger_writing = {}
+        self.last_accrual = 0.0
+        self.rows_written = 0
+        self.flushes = 0
+
+    # --- Lifecycle ---
+    def open(self) -> None:
+        if self._conn is not None:
+            return
+        conn = connect(self.path, SCHEMA)
+        shard = shard_sql(self.shard)
+        rows = conn.execute(f"SELECT chat_id, {_COLUMNS} FROM accounts WHERE 1{shard}").fetchall()
+        self._accounts = {row[0]: Account(*row[1:]) for row in rows}
+        self._pending = {}
+        for chat_id, seq in conn.execute(f"SELECT chat_id, seq FROM ledger WHERE state = 'pending'{shard}"):
+            self._pending.setdefault(chat_id, []).append(seq)
+        # The accrual clock starts when the store is first created.
+        conn.execute("INSERT OR IGNORE INTO accruals (shard, last_at) VALUES (?, ?)", (self._accrual_key, time.time()))
+        self.last_accrual = conn.execute("SELECT last_at FROM accruals WHERE shard = ?", (self._accrual_key,)).fetchone()[0]
+        self._conn = conn
+        logger.info(f"Loaded {len(self._accounts)} accounts from {self.path}")
+
+    @property
+    def _accrual_key(self) -> str:
+        return "" if self.shard is None else str(self.shard[0])
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        self.flush()
+        self._conn.close()
+        self._conn = None
+
+    # --- Reads (memory, plus indexed ledger lookups) ---
+    def __contains__(self, chat_id) -> bool:
+        return chat_id in self._accounts
+
+    def __getitem__(self, chat_id) -> Account:
+        return self._accounts[chat_id]
+
+    def __len__(self) -> int:
+        return len(self._accounts)
+
+    def get(self, chat_id, default=None):
+        return self._accounts.get(chat_id, default)
+
+    def items(self):
+        return self._accounts.items()
+
+    def pending_entries(self, chat_id) -> list:
+        return [self._ledger_entry(chat_id, seq) for seq in self._pending.get(chat_id, [])]
+
+    def all_pending_entries(self):
+        """Yield (chat_id, entry) for every pending ledger entry."""
+        for chat_id, seqs in self._pending.items():
+            for seq in seqs:
+                yield chat_id, self._ledger_entry(chat_id, seq)
+
+    def ledger_page(self, chat_id, page: int = 1, page_size: int = HISTORY_PAGE_SIZE):
+        """Return (entries newest first, total pages) for a 1-based page number."""
+        count = self._accounts[chat_id].ledger_count if chat_id in self._accounts else 0
+        pages = max(1, -(-count // page_size))
+        hi = count - (page - 1) * page_size
+        if hi < 1:
+            return [], pages
+        lo = max(1, hi - page_size + 1)
+        with self._lock:
+            rows = self._conn.execute(_SELECT_LEDGER, (chat_id, lo, hi)).fetchall()
+            entries = {row[0]: LedgerEntry(*row) for row in rows}
+            # Entries not flushed yet (queued or in flight) win over the table.
+            for seq in range(lo, hi + 1):
+                entry = self._ledger_dirty.get((chat_id, seq)) or self._ledger_writing.get((chat_id, seq))
+                if entry is not None:
+                    entries[seq] = entry
+        return [entries[seq] for seq in range(hi, lo - 1, -1) if seq in entries], pages
+
+    def recent_entries(self, chat_id, limit: int) -> list:
+        return self.ledger_page(chat_id, 1, limit)[0]
+
+    def _ledger_entry(self, chat_id, seq) -> LedgerEntry:
+        entry = self._ledger_dirty.get((chat_id, seq)) or self._ledger_writing.get((chat_id, seq))
+        if entry is None:
+            with self._lock:
+                row = self._conn.execute(_SELECT_LEDGER, (chat_id, seq, seq)).fetchone()
+            entry = LedgerEntry(*row)
+        return entry
+
+    # --- Writes (memory now, disk on the next flush) ---
+    def create(self, chat_id) -> Account:
+        account = Account()
+        self._accounts[chat_id] = account
+        self._dirty.add(chat_id)
+        return account
+
+    def update(self, chat_id, **fields) -> Account:
+        account = self._accounts.get(chat_id)
+        if account is None:
+            account = self.create(chat_id)
+        account.update(fields)
+        self._dirty.add(chat_id)
+        return account
+
+    def record(self, chat_id, kind: str, amount: float, state: str = STATE_CONFIRMED,
+               note: str = "", timestamp: float = None) -> LedgerEntry:
+        account = self._accounts.get(chat_id) or self.create(chat_id)
+        seq = account.ledger_count + 1
+        account.ledger_count = seq
+        self._dirty.add(chat_id)
+        entry = LedgerEntry(seq, kind, amount, time.time() if timestamp is None else timestamp, state, note)
+        self._ledger_dirty[(chat_id, seq)] = entry
+        if state == STATE_PENDING:
+            self._pending.setdefault(chat_id, []).append(seq)
+        return entry
+
+    def confirm_entry(self, chat_id, seq: int):
+        """Mark one pending ledger entry as confirmed and return it, or None if it is not pending."""
+        seqs = self._pending.get(chat_id)
+        if not seqs or seq not in seqs:
+            return None
+        seqs.remove(seq)
+        if not seqs:
+            del self._pending[chat_id]
+        entry = self._ledger_entry(chat_id, seq)
+        entry = LedgerEntry(entry.seq, entry.kind, entry.amount, entry.timestamp, STATE_CONFIRMED, entry.note)
+        self._ledger_dirty[(chat_id, seq)] = entry
+        return entry
+
+    # --- Write-behind flushing ---
+    def _take_batch(self):
+        """Return (dirty chat ids, account rows, ledger entries), or None if nothing changed."""
+        dirty, self._dirty = self._dirty, set()
+        ledger, self._ledger_dirty = self._ledger_dirty, {}
+        rows = [
+            (chat_id, *account_row(account))
+            for chat_id in dirty
+            if (account := self._accounts.get(chat_id)) is not None
+        ]
+        if not rows and not ledger:
+            return None
+        self._ledger_writing = ledger
+        return dirty, rows, ledger
+
+    def _upsert_batch(self, conn, rows, ledger) -> None:
+        conn.executemany(_UPSERT_ACCOUNT, rows)
+        conn.executemany(_UPSERT_LEDGER, [
+            (chat_id, e.seq, e.kind, e.amount, e.timestamp, e.state, e.note)
+            for (chat_id, _), e in ledger.items()
+        ])
+
+    def _write_batch(self, batch) -> None:
+        _, rows, ledger = batch
+        try:
+            with transaction(self._conn, self._lock) as conn:
+                self._upsert_batch(conn, rows, ledger)
+        finally:
+            self._ledger_writing = {}
+        self.rows_written += len(rows) + len(ledger)
+        self.flushes += 1
+
+    def _restore_batch(self, batch) -> None:
+        dirty, _, ledger = batch
+        self._dirty |= dirty
+        self._ledger_dirty = {**ledger, **self._ledger_dirty}
+
+    def flush(self) -> None:
+        batch = self._take_batch()
+        if batch is None:
+            return
+        try:
+            self._write_batch(batch)
+        except Exception:
+            self._restore_batch(batch)
+            raise
+
+    async def flush_async(self) -> None:
+        async with self._flush_lock:
+            await write_behind(self._take_batch, self._write_batch, self._restore_batch, "user finances")
+
+    # --- Interest accrual ---
+    def accrual_due(self, interval: float) -> bool:
+        return time.time() - self.last_accrual >= interval
+
+    async def accrue_interest(self, rate: float, interval: float = None) -> list:
+        """Credit ``total_deposit * rate`` to every eligible account; return (chat_id, interest).
+
+        Pending writes and the accrual itself are committed in one transaction
+        by a single INSERT ... SELECT and UPDATE over the whole table, so the
+        accrual is all-or-nothing on disk and never walks accounts in Python
+        on the writer side.
+
+        The time of the accrual is committed with it. With ``interval``, the
+        accrual only runs if the last one recorded is at least that old (another
+        instance may have run it meanwhile), and is recorded ``interval`` after
+        it, so missed accruals can be caught up one by one.
+        """
+        async with self._flush_lock:
+            batch = self._take_batch() or (set(), [], {})
+            try:
+                credited = await asyncio.to_thread(self._write_accrual, batch, rate, time.time(), interval)
+            except Exception:
+                self._restore_batch(batch)
+                raise
+            for i, (chat_id, interest, seq) in enumerate(credited):
+                self._apply_interest(chat_id, interest, seq)
+                if i % ACCRUAL_APPLY_CHUNK == ACCRUAL_APPLY_CHUNK - 1:
+                    await asyncio.sleep(0)
+        return [(chat_id, interest) for chat_id, interest, _ in credited]
+
+    def _write_accrual(self, batch, rate: float, now: float, interval: float = None) -> list:
+        _, rows, ledger = batch
+        try:
+            # Immediate, so two instances cannot both read the accrual as due.
+            with transaction(self._conn, self._lock, "BEGIN IMMEDIATE") as conn:
+                self._upsert_batch(conn, rows, ledger)
+                last = conn.execute("SELECT last_at FROM accruals WHERE shard = ?", (self._accrual_key,)).fetchone()[0]
+                credited = []
+                if interval is None or now - last >= interval:
+                    shard = shard_sql(self.shard)
+                    conn.execute(_INSERT_INTEREST.format(shard=shard), (rate, now))
+                    credited = conn.execute(_APPLY_INTEREST.format(shard=shard), (rate, rate, rate)).fetchall()
+                    last = now if interval is None else last + interval
+                    conn.execute("UPDATE accruals SET last_at = ? WHERE shard = ?", (last, self._accrual_key))
+        finally:
+            self._ledger_writing = {}
+        self.last_accrual = last
+        self.rows_written += len(rows) + len(ledger) + 2 * len(credited)
+        self.flushes += 1
+        return credited
+
+    def _apply_interest(self, chat_id, interest: float, seq: int) -> None:
+        account = self._accounts.get(chat_id)
+        if account is None:
+            return
+        account.investment += interest
+        account.profit += interest
+        # Entries recorded while the accrual was running took the sequence
+        # number given to the interest entry; they are still unflushed, so
+        # shift them up by one.
+        for moved in range(account.ledger_count, seq - 1, -1):
+            entry = self._ledger_dirty.pop((chat_id, moved))
+            entry.seq = moved + 1
+            self._ledger_dirty[(chat_id, moved + 1)] = entry
+        if account.ledger_count >= seq and chat_id in self._pending:
+            self._pending[chat_id] = [p + 1 if p >= seq else p for p in self._pending.get(chat_id, [])]
+        account.ledger_count += 1
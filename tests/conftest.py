@@ -0,0 +1,6 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The bot's modules, and the local fakes of upstream services in benchmarks/.
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
@@ -0,0 +1,204 @@
+import time
+import asyncio
+
+import pytest
+
+from fakes import FakeChainRPC
+from deposits import DepositVerifier, PendingIndex, Expectation, Transfer, CHAIN_SOLANA, CHAIN_ETHEREUM
+
+SOL_WALLET = "6RDXuY6aaREBsb9nWJrqh7eqjwHDLcUz2AUkUhfCsMRR"
+ETH_WALLET = "0x4348409d1D959680b315DA798FEf5C3b6C64cdBB"
+
+
+@pytest.fixture
+def chain():
+    with FakeChainRPC() as rpc:
+        yield rpc
+
+
+@pytest.fixture
+def verifier(chain, tmp_path):
+    v = DepositVerifier(str(tmp_path / "deposits.db"), {SOL_WALLET: CHAIN_SOLANA, ETH_WALLET: CHAIN_ETHEREUM},
+                        solana_rpc_url=chain.url, eth_rpc_url=chain.url)
+    v.open()
+    yield v
+    asyncio.run(v.aclose())
+
+
+def poll(verifier) -> list:
+    async def run():
+        matches = await verifier.poll()
+        # The HTTP client is bound to this loop.
+        await verifier._client.aclose()
+        verifier._client = None
+        return matches
+
+    return asyncio.run(run())
+
+
+def expect_fee(verifier, chat_id, *payments, created_at=None) -> None:
+    asyncio.run(verifier.expect_fee(chat_id, list(payments), created_at))
+
+
+def reopen(verifier, chain) -> DepositVerifier:
+    restarted = DepositVerifier(verifier.path, verifier.wallets, solana_rpc_url=chain.url, eth_rpc_url=chain.url)
+    restarted.open()
+    return restarted
+
+
+def test_transfer_is_matched_once(chain, verifier):
+    poll(verifier)
+    verifier.expect(1, 1, SOL_WALLET, 1.5)
+    chain.send_sol(SOL_WALLET, 1.5)
+    assert [(m.expectation.chat_id, m.transfer.amount) for m in poll(verifier)] == [(1, 1.5)]
+    assert poll(verifier) == []
+
+
+def test_only_the_caller_that_starts_a_poll_gets_its_matches(chain, verifier):
+    poll(verifier)
+    verifier.expect(1, 1, SOL_WALLET, 1.5)
+    chain.send_sol(SOL_WALLET, 1.5)
+
+    async def run():
+        results = await asyncio.gather(verifier.poll(), verifier.poll())
+        await verifier._client.aclose()
+        verifier._client = None
+        return results
+
+    first, second = asyncio.run(run())
+    assert [m.expectation.chat_id for m in first] == [1] and second == []
+    # The next call starts a poll of its own.
+    assert poll(verifier) == [] and verifier.polls == 3
+
+
+def test_unreadable_solana_transaction_is_read_on_the_next_poll(chain, verifier):
+    poll(verifier)
+    verifier.expect(1, 1, SOL_WALLET, 1.5)
+    verifier.expect(2, 1, SOL_WALLET, 2.5)
+    late = chain.send_sol(SOL_WALLET, 1.5)
+    chain.send_sol(SOL_WALLET, 2.5)
+    chain.unavailable.add(late)
+    assert [m.expectation.chat_id for m in poll(verifier)] == [2]
+    chain.unavailable.clear()
+    assert [m.expectation.chat_id for m in poll(verifier)] == [1]
+
+
+def test_solana_listing_pages_back_to_the_cursor(chain, verifier, monkeypatch):
+    monkeypatch.setattr("deposits.DEPOSIT_SIGNATURE_LIMIT", 2)
+    chain.send_sol(SOL_WALLET, 0.5)
+    poll(verifier)
+    for chat_id in range(5):
+        verifier.expect(chat_id, 1, SOL_WALLET, 1.0 + chat_id)
+        chain.send_sol(SOL_WALLET, 1.0 + chat_id)
+    assert sorted(m.expectation.chat_id for m in poll(verifier)) == [0, 1, 2, 3, 4]
+
+
+def test_unreadable_ethereum_block_is_read_on_the_next_poll(chain, verifier):
+    poll(verifier)
+    verifier.expect(1, 0, ETH_WALLET, 0.013)
+    verifier.expect(2, 0, ETH_WALLET, 0.02)
+    chain.send_eth(ETH_WALLET, 0.013)
+    chain.send_eth(ETH_WALLET, 0.02)
+    chain.unavailable.add(1)
+    assert poll(verifier) == []
+    chain.unavailable.clear()
+    assert sorted(m.expectation.chat_id for m in poll(verifier)) == [1, 2]
+
+
+def test_fee_paid_before_it_is_declared_is_matched(chain, verifier):
+    poll(verifier)
+    chain.send_sol(SOL_WALLET, 2.0)
+    assert poll(verifier) == []
+    expect_fee(verifier, 1, (SOL_WALLET, 2.0))
+    assert [m.expectation.chat_id for m in poll(verifier)] == [1]
+
+
+def test_fee_declared_long_after_it_was_paid_is_matched(chain, verifier):
+    poll(verifier)
+    chain.send_sol(SOL_WALLET, 2.0, timestamp=time.time() - 3 * 3600)
+    assert poll(verifier) == []
+    restarted = reopen(verifier, chain)
+    expect_fee(restarted, 1, (SOL_WALLET, 2.0), (ETH_WALLET, 0.013))
+    assert [m.expectation.chat_id for m in poll(restarted)] == [1]
+    asyncio.run(restarted.aclose())
+
+
+def test_expired_fee_can_be_declared_again(chain, verifier):
+    poll(verifier)
+    expect_fee(verifier, 1, (SOL_WALLET, 2.0), created_at=time.time() - 2 * verifier.index.window)
+    assert poll(verifier) == [] and len(verifier.index) == 0
+    restarted = reopen(verifier, chain)
+    restarted.load([])
+    assert len(restarted.index) == 0
+    chain.send_sol(SOL_WALLET, 2.0)
+    expect_fee(restarted, 1, (SOL_WALLET, 2.0))
+    assert [m.expectation.chat_id for m in poll(restarted)] == [1]
+    asyncio.run(restarted.aclose())
+
+
+def test_fee_expectations_survive_a_restart(chain, verifier):
+    poll(verifier)
+    expect_fee(verifier, 1, (SOL_WALLET, 2.0))
+    expect_fee(verifier, 2, (SOL_WALLET, 3.0))
+    restarted = reopen(verifier, chain)
+    assert restarted.load([], fee_paid=lambda chat_id: chat_id == 2) == []
+    chain.send_sol(SOL_WALLET, 2.0)
+    chain.send_sol(SOL_WALLET, 3.0)
+    assert [m.expectation.chat_id for m in poll(restarted)] == [1]
+    asyncio.run(restarted.aclose())
+
+
+def test_claimed_fee_is_handed_back_until_it_is_recorded(chain, verifier):
+    poll(verifier)
+    expect_fee(verifier, 1, (SOL_WALLET, 2.0), (ETH_WALLET, 0.013))
+    chain.send_sol(SOL_WALLET, 2.0)
+    assert len(poll(verifier)) == 1
+    (recovered,) = verifier.load([])
+    assert recovered.transfer.wallet == SOL_WALLET
+    assert verifier.load([], fee_paid=lambda chat_id: True) == []
+
+
+def test_second_worker_cannot_claim_a_claimed_transfer(chain, verifier):
+    poll(verifier)
+    verifier.expect(1, 1, SOL_WALLET, 1.5)
+    chain.send_sol(SOL_WALLET, 1.5)
+    (match,) = poll(verifier)
+    other = DepositVerifier(verifier.path, verifier.wallets, shard=(1, 2), solana_rpc_url=chain.url,
+                            eth_rpc_url=chain.url)
+    other.open()
+    other.expect(1, 1, SOL_WALLET, 1.5, match.expectation.created_at)
+    assert poll(other) == []
+    asyncio.run(other.aclose())
+
+
+def test_rpc_cost_of_a_poll_does_not_grow_with_pending_payments(chain, verifier):
+    poll(verifier)
+    requests = chain.requests
+    assert poll(verifier) == []
+    # Idle: one listing request per chain.
+    assert chain.requests - requests == 2
+
+    def cost(chat_ids) -> tuple:
+        for chat_id in chat_ids:
+            verifier.expect(chat_id, 1, SOL_WALLET, 1 + chat_id / 1000)
+        chain.send_sol(SOL_WALLET, 1 + chat_ids[0] / 1000)
+        chain.send_sol(SOL_WALLET, 1 + chat_ids[-1] / 1000)
+        chain.send_eth(ETH_WALLET, 0.5)
+        requests = chain.requests
+        matched = len(poll(verifier))
+        return matched, chain.requests - requests
+
+    assert cost(range(1, 3)) == cost(range(3, 1003))
+
+
+def test_match_prefers_the_latest_expectation_before_the_transfer():
+    index = PendingIndex(window=3600, slack=60)
+    now = time.time()
+    older, newer, after = (Expectation(chat_id, 1, SOL_WALLET, 1.0, now + offset)
+                           for chat_id, offset in ((1, -600), (2, -300), (3, 30)))
+    for expectation in (older, newer, after):
+        index.add(expectation)
+    assert index.match(Transfer(SOL_WALLET, "a", 1.0, now)) is newer
+    assert index.match(Transfer(SOL_WALLET, "b", 1.0, now)) is older
+    assert index.match(Transfer(SOL_WALLET, "c", 1.0, now)) is after
+    assert index.match(Transfer(SOL_WALLET, "d", 1.0, now)) is None
@@ -0,0 +1,137 @@
+import os
+import gzip
+import json
+import asyncio
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from storage import SCHEMA, ACCOUNT_FIELDS
+from export import export, write_table, parse_command_args, parse_date, CSVSink, LEDGER_COLUMNS, COLUMN_TYPES
+
+DAY = 86400
+START = 1_767_225_600  # 2026-01-01 UTC
+USERS, DAYS = 3, 5
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Accounts 1-3 with one ledger entry a day from 2026-01-02 to 2026-01-06."""
+    path = str(tmp_path / "finances.db")
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.executescript(SCHEMA)
+    conn.executemany(
+        f"INSERT INTO accounts (chat_id, {', '.join(ACCOUNT_FIELDS)}) VALUES ({', '.join('?' * (len(ACCOUNT_FIELDS) + 1))})",
+        ((chat_id, 1, f"trader{chat_id}", 1, 1, 1, 10.0, 12.5, 0.0, None, 2.5, DAYS) for chat_id in range(1, USERS + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO ledger (chat_id, seq, kind, amount, ts, state, note) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((chat_id, seq, "INTEREST", 0.285, START + seq * DAY, "confirmed", "")
+         for chat_id in range(1, USERS + 1) for seq in range(1, DAYS + 1)),
+    )
+    conn.close()
+    return path
+
+
+def read_jsonl(path: str) -> list:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_unfiltered_export_holds_every_row(db, tmp_path):
+    result = export(db, str(tmp_path / "out"), "jsonl")
+    assert result["accounts"][1] == USERS and result["ledger"][1] == USERS * DAYS
+    ledger = read_jsonl(result["ledger"][0])
+    assert [(row["chat_id"], row["seq"]) for row in ledger[:2]] == [(1, 1), (1, 2)]
+    assert [row["username"] for row in read_jsonl(result["accounts"][0])] == ["trader1", "trader2", "trader3"]
+
+
+def test_export_is_filtered_by_chat_and_date_range(db, tmp_path):
+    result = export(db, str(tmp_path / "chat"), "jsonl", chat_id=2)
+    assert [row["chat_id"] for row in read_jsonl(result["accounts"][0])] == [2]
+    assert {row["chat_id"] for row in read_jsonl(result["ledger"][0])} == {2}
+    assert result["ledger"][1] == DAYS
+
+    # since is inclusive, until exclusive: entries 2 and 3 of each chat.
+    result = export(db, str(tmp_path / "range"), "jsonl", since=START + 2 * DAY, until=START + 4 * DAY)
+    assert sorted({row["seq"] for row in read_jsonl(result["ledger"][0])}) == [2, 3]
+    assert result["ledger"][1] == USERS * 2
+    # Accounts are not filtered by date.
+    assert result["accounts"][1] == USERS
+
+    result = export(db, str(tmp_path / "both"), "jsonl", since=START + 4 * DAY, chat_id=3)
+    assert [(row["chat_id"], row["seq"]) for row in read_jsonl(result["ledger"][0])] == [(3, 4), (3, 5)]
+
+
+def test_command_until_is_inclusive():
+    options = parse_command_args(["jsonl", "since=2026-01-03", "until=2026-01-04", "chat=2"])
+    assert options == {"fmt": "jsonl", "since": START + 2 * DAY, "until": START + 4 * DAY, "chat_id": 2}
+    assert parse_date("2026-01-01") == START
+    with pytest.raises(ValueError):
+        parse_command_args(["xml"])
+    with pytest.raises(ValueError):
+        parse_command_args(["since=yesterday"])
+
+
+def test_failed_export_leaves_no_partial_file(tmp_path):
+    path = str(tmp_path / "ledger.csv.gz")
+
+    def chunks():
+        yield [(1, 1, "INTEREST", 0.285, START, "confirmed", "")]
+        raise sqlite3.OperationalError("database is locked")
+
+    with pytest.raises(sqlite3.OperationalError):
+        write_table(chunks(), CSVSink, path, LEDGER_COLUMNS, COLUMN_TYPES["ledger"])
+    assert os.listdir(tmp_path) == []
+
+    assert write_table(iter([[(1, 1, "INTEREST", 0.285, START, "confirmed", "")]]), CSVSink, path,
+                       LEDGER_COLUMNS, COLUMN_TYPES["ledger"]) == 1
+    assert os.listdir(tmp_path) == ["ledger.csv.gz"]
+
+
+@pytest.fixture
+def bot_main(monkeypatch):
+    monkeypatch.setenv("TELEGRAM_BOT", "123456:test")
+    import main
+    monkeypatch.setattr(main, "ADMIN_USER_IDS", {42})
+    monkeypatch.setattr(main, "_export_running", False)
+    return main
+
+
+def run_export_command(main, user_id, chat_id, args=()) -> tuple:
+    """Call /export; return (replies, coroutines it started)."""
+    replies, started = [], []
+
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+
+    def create_task(coroutine):
+        started.append(coroutine)
+        coroutine.close()
+
+    update = SimpleNamespace(
+        effective_user=None if user_id is None else SimpleNamespace(id=user_id),
+        effective_chat=SimpleNamespace(id=chat_id),
+        message=SimpleNamespace(reply_text=reply_text),
+    )
+    context = SimpleNamespace(args=list(args), bot=None, application=SimpleNamespace(create_task=create_task))
+    asyncio.run(main.export_command(update, context))
+    return replies, started
+
+
+def test_export_command_is_allowed_by_user_id_not_chat_id(bot_main):
+    # A group chat with the admin in it: other members are still refused.
+    replies, started = run_export_command(bot_main, 7, -100)
+    assert replies == ["❗ This command is only available to administrators."] and started == []
+    # A chat whose id happens to be an admin's user id.
+    replies, started = run_export_command(bot_main, 7, 42)
+    assert started == []
+    replies, started = run_export_command(bot_main, None, 42)
+    assert started == []
+
+    replies, started = run_export_command(bot_main, 42, -100, ["jsonl"])
+    assert len(started) == 1 and replies[0].startswith("⏳ Export started")
+    # One export at a time.
+    replies, started = run_export_command(bot_main, 42, -100)
+    assert replies == ["⏳ An export is already running."] and started == []
@@ -0,0 +1,48 @@
+import pytest
+
+from intents import IntentMatcher, CHAT_INTENTS, CHAT_DEFAULT_RESPONSE, chat_intents
+
+RESPONSES = {name: response for name, _, response in CHAT_INTENTS}
+
+
+@pytest.mark.parametrize("text, name", [
+    ("Hello!", "greeting"),
+    ("hi, what's up", "greeting"),
+    ("How is the market today?", "market"),
+    ("Where are the markets heading?", "market"),
+    ("Any investment tips?", "investment"),
+    ("My investments are down", "investment"),
+])
+def test_builtin_responses(text, name):
+    assert chat_intents.match(text) == RESPONSES[name]
+
+
+def test_default_response():
+    assert chat_intents.match("thanks") == CHAT_DEFAULT_RESPONSE
+
+
+def test_earlier_intent_wins():
+    assert chat_intents.match("hello, how is the market?") == RESPONSES["greeting"]
+    assert chat_intents.match("market or investment?") == RESPONSES["market"]
+
+
+@pytest.mark.parametrize("text", ["this", "shipping", "this is shipping", "which wallet", "hiking"])
+def test_phrases_match_whole_words_only(text):
+    assert chat_intents.match(text) == CHAT_DEFAULT_RESPONSE
+
+
+def test_multi_word_phrases_and_overlaps():
+    matcher = IntentMatcher([
+        ("fees", ("gas fees",), "fees"),
+        ("gas", ("gas",), "gas"),
+    ], "default", cache_size=0)
+    assert matcher.match("what are gas fees now") == "fees"
+    assert matcher.match("gas is cheap") == "gas"
+    assert matcher.match("fees") == "default"
+
+
+def test_cache_is_keyed_by_normalized_text():
+    matcher = IntentMatcher(CHAT_INTENTS, CHAT_DEFAULT_RESPONSE)
+    matcher.match("Hello")
+    matcher.match("  hello ")
+    assert matcher.respond.cache_info().hits == 1
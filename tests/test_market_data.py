@@ -0,0 +1,150 @@
+import time
+import asyncio
+
+import pytest
+
+from fakes import FakeDexScreener, sample_tokens
+from market_data import MarketDataClient, TokenIndex, TokenQuote, TOKENS_BATCH_SIZE, format_quote
+
+TOKENS = 60
+BATCHES = -(-TOKENS // TOKENS_BATCH_SIZE)
+
+
+@pytest.fixture
+def upstream():
+    with FakeDexScreener(tokens=sample_tokens(TOKENS)) as server:
+        yield server
+
+
+def refreshed(upstream, refreshes: int = 1) -> MarketDataClient:
+    """A client whose index has been refreshed ``refreshes`` times."""
+    client = MarketDataClient(base_url=upstream.url)
+    client.watchlist = []
+
+    async def run():
+        for _ in range(refreshes):
+            await client.refresh_index()
+        await client.aclose()
+
+    asyncio.run(run())
+    return client
+
+
+def test_refresh_indexes_every_token_in_batched_requests(upstream):
+    client = refreshed(upstream)
+    assert len(client.index) == TOKENS
+    assert upstream.requests == 1 + BATCHES
+    assert client.index_refreshes == 1
+
+
+def test_unchanged_feed_is_answered_with_304s_and_keeps_the_index(upstream):
+    client = MarketDataClient(base_url=upstream.url)
+    client.watchlist = []
+
+    async def run():
+        await client.refresh_index()
+        index = client.index
+        await client.refresh_index()
+        await client.aclose()
+        return index
+
+    index = asyncio.run(run())
+    assert upstream.not_modified == 1 + BATCHES
+    assert client.not_modified == 1 + BATCHES
+    assert client.index is index
+    assert client.index_refreshes == 1
+
+
+def test_changed_price_is_picked_up(upstream):
+    client = MarketDataClient(base_url=upstream.url)
+    client.watchlist = []
+
+    async def run():
+        await client.refresh_index()
+        upstream.tokens[0] = {**upstream.tokens[0], "price": 42.0}
+        await client.refresh_index()
+        await client.aclose()
+
+    asyncio.run(run())
+    assert client.index.get("TK0").price_usd == 42.0
+
+
+def test_top_keeps_the_boost_ranking(upstream):
+    client = refreshed(upstream)
+    assert [q.address for q in client.index.top(3)] == [t["tokenAddress"] for t in upstream.tokens[:3]]
+
+
+def test_symbol_name_and_address_resolve_to_the_same_token(upstream):
+    client = refreshed(upstream)
+    last = upstream.tokens[-1]
+    by_symbol = client.index.get(last["symbol"].lower())
+    assert by_symbol is not None
+    assert client.index.get(last["name"]) is by_symbol
+    assert client.index.get(last["tokenAddress"]) is by_symbol
+    assert client.index.get(f"${last['symbol']}") is by_symbol
+
+
+def test_resolve_counts_hits_and_misses(upstream):
+    client = MarketDataClient(base_url=upstream.url)
+    client.watchlist = []
+
+    async def run():
+        resolved = await client.resolve(["TK1", "nope"])
+        await client.aclose()
+        return resolved
+
+    resolved = asyncio.run(run())
+    assert [(query, quote and quote.symbol) for query, quote in resolved] == [("TK1", "TK1"), ("nope", None)]
+    assert (client.hits, client.misses) == (1, 1)
+
+
+def test_failed_cold_start_is_not_retried_by_every_request(upstream):
+    # An unknown path: every request gets a 404.
+    client = MarketDataClient(base_url=f"{upstream.url}/down", retry_interval=60)
+    client.watchlist = []
+
+    async def run():
+        index = await client.ready_index()
+        assert not client.available and len(index) == 0
+        # Within the retry interval requests get the empty index without a new fetch.
+        await client.ready_index()
+        await client.resolve(["TK1"])
+        client.refresh_if_stale()
+        assert client._refreshing is None
+        assert upstream.requests == 1
+        client.failed_at -= 60
+        await client.ready_index()
+        assert upstream.requests == 2
+        await client.aclose()
+
+    asyncio.run(run())
+    assert client.stats()["refresh_failures"] == 2
+
+
+def test_successful_refresh_ends_the_backoff(upstream):
+    client = MarketDataClient(base_url=upstream.url)
+    client.watchlist = []
+    client.failed_at = time.monotonic()
+
+    async def run():
+        await client.refresh_index()
+        await client.aclose()
+
+    asyncio.run(run())
+    assert client.available and client.failed_at is None
+
+
+def quote(symbol: str, name: str, liquidity: float) -> TokenQuote:
+    return TokenQuote("solana", f"addr-{symbol}-{liquidity}", symbol, name, 1.0, 0.0, liquidity, 0.0)
+
+
+def test_shared_symbol_resolves_to_the_most_liquid_token():
+    deep, shallow = quote("DUP", "Deep", 1_000_000), quote("DUP", "Shallow", 10)
+    index = TokenIndex([shallow, deep])
+    assert index.get("dup") is deep
+    assert index.top(1) == [shallow]
+
+
+def test_format_quote_escapes_markdown():
+    text = format_quote(quote("DOG_WIF", "[meme]*coin", 1))
+    assert text.startswith("*DOG\\_WIF* (\\[meme]\\*coin)")
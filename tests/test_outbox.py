@@ -0,0 +1,133 @@
+import time
+import socket
+import asyncio
+
+import pytest
+
+from outbox import SupportOutbox, SMTPSender, OUTBOX_RETRY_BASE
+
+controller = pytest.importorskip("aiosmtpd.controller")
+
+
+class Sink:
+    """Accepts mail once ``rejections`` DATA commands have been refused."""
+
+    def __init__(self, rejections: int = 0):
+        self.rejections = rejections
+        self.received = []
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.rejections:
+            self.rejections -= 1
+            return "451 Try again later"
+        self.received.append(envelope.rcpt_tos)
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def sink():
+    handler = Sink()
+    smtp = controller.Controller(handler, hostname="127.0.0.1", port=free_port())
+    smtp.start()
+    yield handler, smtp
+    smtp.stop()
+
+
+def make_outbox(sink, path, max_attempts: int = 3) -> SupportOutbox:
+    _, smtp = sink
+    outbox = SupportOutbox(str(path), SMTPSender(smtp.hostname, smtp.port, starttls=False), max_attempts=max_attempts)
+    outbox.open()
+    return outbox
+
+
+def row(outbox, message_id) -> tuple:
+    return outbox._conn.execute(
+        "SELECT attempts, next_attempt_at, state, last_error FROM support_outbox WHERE id = ?", (message_id,)
+    ).fetchone()
+
+
+def make_due(outbox) -> None:
+    outbox._conn.execute("UPDATE support_outbox SET next_attempt_at = 0 WHERE state = 'queued'")
+
+
+def enqueue(outbox) -> int:
+    return asyncio.run(outbox.enqueue("bot@example.com", "support@example.com", "Support Query", "query"))
+
+
+def drain(outbox) -> float:
+    return asyncio.run(outbox.drain_once())
+
+
+def test_queued_message_is_sent_and_removed(sink, tmp_path):
+    handler, _ = sink
+    outbox = make_outbox(sink, tmp_path / "outbox.db")
+    message_id = enqueue(outbox)
+    assert outbox.depth == 1
+    assert drain(outbox) == 0.0
+    assert handler.received == [["support@example.com"]]
+    assert row(outbox, message_id) is None
+    assert outbox.stats()["depth"] == 0 and outbox.sent == 1
+    asyncio.run(outbox.stop())
+
+
+def test_failed_send_is_retried_with_exponential_backoff(sink, tmp_path):
+    handler, _ = sink
+    handler.rejections = 2
+    outbox = make_outbox(sink, tmp_path / "outbox.db", max_attempts=5)
+    message_id = enqueue(outbox)
+
+    for attempts in (1, 2):
+        before = time.time()
+        drain(outbox)
+        tries, next_attempt_at, state, last_error = row(outbox, message_id)
+        backoff = OUTBOX_RETRY_BASE * 2 ** (attempts - 1)
+        assert (tries, state) == (attempts, "queued")
+        assert "451" in last_error
+        assert before + 0.8 * backoff <= next_attempt_at <= time.time() + 1.2 * backoff
+        # Not due yet: nothing is sent and the worker sleeps until it is.
+        assert 0 < drain(outbox) <= 1.2 * backoff
+        assert handler.received == []
+        make_due(outbox)
+
+    drain(outbox)
+    assert handler.received == [["support@example.com"]]
+    assert row(outbox, message_id) is None
+    assert (outbox.depth, outbox.sent, outbox.failures, outbox.dead) == (0, 1, 2, 0)
+    asyncio.run(outbox.stop())
+
+
+def test_message_is_dead_lettered_after_max_attempts(sink, tmp_path):
+    handler, _ = sink
+    handler.rejections = 10
+    outbox = make_outbox(sink, tmp_path / "outbox.db", max_attempts=3)
+    message_id = enqueue(outbox)
+
+    for _ in range(3):
+        drain(outbox)
+        make_due(outbox)
+    assert row(outbox, message_id)[::2] == (3, "dead")
+    assert (outbox.depth, outbox.failures, outbox.dead) == (0, 3, 1)
+
+    # Dead messages are kept but never sent again.
+    assert drain(outbox) == 60.0
+    assert handler.rejections == 7
+    asyncio.run(outbox.stop())
+
+
+def test_queued_messages_survive_a_restart(sink, tmp_path):
+    handler, _ = sink
+    outbox = make_outbox(sink, tmp_path / "outbox.db")
+    enqueue(outbox)
+    asyncio.run(outbox.stop())
+
+    restarted = make_outbox(sink, tmp_path / "outbox.db")
+    assert restarted.depth == 1
+    drain(restarted)
+    assert len(handler.received) == 1
+    asyncio.run(restarted.stop())
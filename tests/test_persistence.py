@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from persistence import SQLitePersistence
+
+ONBOARDING = "onboarding"
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "finances.db")
+
+
+def reload(persistence) -> SQLitePersistence:
+    persistence.close()
+    return SQLitePersistence(persistence.path)
+
+
+def rows(persistence, table: str) -> int:
+    return persistence._connect().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_conversation_state_survives_a_flush_and_reload(path):
+    persistence = SQLitePersistence(path)
+
+    async def handle():
+        await persistence.update_conversation(ONBOARDING, (1, 1), 2)
+        await persistence.update_conversation(ONBOARDING, (2, 2), 5)
+        await persistence.update_conversation(ONBOARDING, (3, 3), 1)
+        await persistence.flush_async()
+        # Ended conversations are deleted on the next flush.
+        await persistence.update_conversation(ONBOARDING, (3, 3), None)
+        await persistence.flush_async()
+
+    asyncio.run(handle())
+    restarted = reload(persistence)
+    assert asyncio.run(restarted.get_conversations(ONBOARDING)) == {(1, 1): 2, (2, 2): 5}
+    assert asyncio.run(restarted.get_conversations("other")) == {}
+    restarted.close()
+
+
+def test_changes_are_buffered_until_a_flush_writes_them_in_one_batch(path):
+    persistence = SQLitePersistence(path)
+    writes = []
+    write = persistence._write
+    persistence._write = lambda dirty: (writes.append(dirty), write(dirty))
+
+    async def handle():
+        for state in range(5):
+            await persistence.update_conversation(ONBOARDING, (1, 1), state)
+            await persistence.update_user_data(1, {"step": state})
+        assert rows(persistence, "conversations") == rows(persistence, "user_data") == 0
+        await persistence.flush_async()
+        # Nothing changed since: no write at all.
+        await persistence.flush_async()
+
+    asyncio.run(handle())
+    assert len(writes) == 1
+    assert rows(persistence, "conversations") == rows(persistence, "user_data") == 1
+    assert asyncio.run(persistence.get_conversations(ONBOARDING)) == {(1, 1): 4}
+    persistence.close()
+
+
+def test_failed_flush_is_retried_with_newer_changes_winning(path):
+    persistence = SQLitePersistence(path)
+    write = persistence._write
+
+    def fail(dirty):
+        persistence._write = write
+        raise OSError("disk full")
+
+    persistence._write = fail
+
+    async def handle():
+        await persistence.update_conversation(ONBOARDING, (1, 1), 2)
+        await persistence.update_conversation(ONBOARDING, (2, 2), 2)
+        await persistence.flush_async()
+        await persistence.update_conversation(ONBOARDING, (1, 1), 3)
+        await persistence.flush_async()
+
+    asyncio.run(handle())
+    assert asyncio.run(reload(persistence).get_conversations(ONBOARDING)) == {(1, 1): 3, (2, 2): 2}
+
+
+def test_user_data_is_loaded_on_the_first_update_from_that_user(path):
+    persistence = SQLitePersistence(path)
+
+    async def handle():
+        await persistence.update_user_data(1, {"username": "alice", "amount": 1.5})
+        await persistence.update_user_data(2, {"username": "bob"})
+        await persistence.flush_async()
+
+    asyncio.run(handle())
+    restarted = reload(persistence)
+    loaded = []
+    restarted._connect().set_trace_callback(lambda sql: loaded.append(sql) if "user_data" in sql else None)
+
+    async def refresh():
+        # Nothing is read up front.
+        assert await restarted.get_user_data() == {}
+        user_data = {}
+        await restarted.refresh_user_data(1, user_data)
+        assert user_data == {"username": "alice", "amount": 1.5}
+        # Later updates from the same user keep the in-memory dict.
+        user_data["amount"] = 2.0
+        await restarted.refresh_user_data(1, user_data)
+        assert user_data["amount"] == 2.0
+        empty = {}
+        await restarted.refresh_user_data(3, empty)
+        assert empty == {}
+
+    asyncio.run(refresh())
+    assert len(loaded) == 2
+
+    async def drop():
+        await restarted.drop_user_data(2)
+        await restarted.flush_async()
+
+    asyncio.run(drop())
+    after_drop = reload(restarted)
+    user_data = {}
+    asyncio.run(after_drop.refresh_user_data(2, user_data))
+    assert user_data == {}
+    after_drop.close()
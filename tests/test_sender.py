@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+from telegram.error import RetryAfter
+from telegram.ext import ExtBot
+
+from fakes import FakeBotAPI
+from sender import OutboundScheduler, NotificationSender, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+
+TOKEN = "123456:sender"
+
+
+@pytest.fixture
+def api():
+    with FakeBotAPI() as server:
+        yield server
+
+
+def with_bot(url: str, scheduler: OutboundScheduler, run):
+    """Run ``run(bot)`` with a bot sending through ``scheduler``."""
+    async def main():
+        bot = ExtBot(TOKEN, base_url=f"{url}/bot", rate_limiter=scheduler)
+        await bot.initialize()
+        try:
+            return await run(bot)
+        finally:
+            await bot.shutdown()
+
+    return asyncio.run(main())
+
+
+def texts(api) -> list:
+    return [(int(fields["chat_id"]), fields["text"]) for method, fields in api.sent if method == "sendMessage"]
+
+
+def test_notifications_waiting_for_a_chat_are_merged_into_one_message(api):
+    scheduler = OutboundScheduler(global_rate=1000, per_chat_rate=20, per_chat_burst=1)
+    sender = NotificationSender(scheduler)
+
+    async def run(bot):
+        # Chat 1 just got a message; its next one has to wait.
+        scheduler._chat_bucket(1).drain()
+        await asyncio.gather(
+            sender.send(bot, 1, "deposit confirmed"),
+            sender.send(bot, 1, "interest added"),
+            sender.send(bot, 2, "interest added"),
+            sender.send(bot, 1, "reminder", parse_mode="Markdown"),
+        )
+
+    with_bot(api.url, scheduler, run)
+    assert sorted(texts(api)) == [
+        (1, "deposit confirmed\n\ninterest added"),
+        (1, "reminder"),
+        (2, "interest added"),
+    ]
+    assert (sender.sent, sender.coalesced, sender.failed) == (3, 1, 0)
+
+
+def test_replies_are_admitted_before_queued_notifications():
+    scheduler = OutboundScheduler(global_rate=50)
+    order = []
+
+    async def admit(name, chat_id, priority):
+        await scheduler.admit(chat_id, priority)
+        order.append(name)
+
+    async def run():
+        scheduler._global.drain()
+        notifications = [asyncio.create_task(admit(f"notification {i}", i, PRIORITY_BACKGROUND)) for i in range(5)]
+        await asyncio.sleep(0)
+        reply = asyncio.create_task(admit("reply", 100, PRIORITY_INTERACTIVE))
+        await asyncio.gather(reply, *notifications)
+
+    asyncio.run(run())
+    assert order[0] == "reply"
+    assert order[1:] == [f"notification {i}" for i in range(5)]
+
+
+def test_flood_control_pauses_sending_and_retries():
+    scheduler = OutboundScheduler(global_rate=100)
+    sender = NotificationSender(scheduler)
+
+    with FakeBotAPI(rate_limit=5, retry_after=1) as api:
+        with_bot(api.url, scheduler, lambda bot: sender.send_many(bot, ((i, "interest added") for i in range(10))))
+        assert api.rejected > 0
+
+    assert sorted(chat_id for chat_id, _ in texts(api)) == list(range(10))
+    assert sender.failed == 0
+    assert scheduler.retried > 0
+    # The global rate was lowered after the 429.
+    assert scheduler.stats()["rate"] < 100
+
+
+def test_request_is_given_up_after_max_retries():
+    scheduler = OutboundScheduler(max_retries=0)
+    sender = NotificationSender(scheduler)
+
+    async def run(bot):
+        await bot.send_message(1, "first")
+        with pytest.raises(RetryAfter):
+            await bot.send_message(2, "refused")
+        assert not await sender.send(bot, 3, "refused")
+
+    with FakeBotAPI(rate_limit=1, retry_after=30) as api:
+        with_bot(api.url, scheduler, run)
+    assert texts(api) == [(1, "first")]
+    assert (sender.sent, sender.failed, scheduler.retried) == (0, 1, 0)
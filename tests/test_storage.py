@@ -0,0 +1,152 @@
+import time
+import asyncio
+import sqlite3
+import tracemalloc
+
+import pytest
+
+from storage import AccountStore, ACCOUNT_FIELDS
+from ledger import KIND_DEPOSIT, KIND_INTEREST, STATE_PENDING, STATE_CONFIRMED
+
+RATE = 0.01
+DAY = 86_400
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = AccountStore(str(tmp_path / "finances.db"))
+    s.open()
+    yield s
+    s.close()
+
+
+def reopen(store) -> AccountStore:
+    store.close()
+    restarted = AccountStore(store.path)
+    restarted.open()
+    return restarted
+
+
+def fund(store, chat_id, deposit: float) -> None:
+    store.update(chat_id, registration_fee_paid=True, total_deposit=deposit, investment=deposit)
+    store.record(chat_id, KIND_DEPOSIT, deposit)
+
+
+def ledger(store, chat_id) -> list:
+    return [(e.seq, e.kind, e.amount, e.state) for e in reversed(store.ledger_page(chat_id, 1, 100)[0])]
+
+
+def test_entries_recorded_while_the_accrual_runs_are_renumbered_after_it(store):
+    fund(store, 1, 100.0)
+    store.flush()
+
+    async def run():
+        accrual = asyncio.create_task(store.accrue_interest(RATE))
+        # The accrual has taken its batch and is writing on a worker thread,
+        # where it gives the interest entry seq 2.
+        await asyncio.sleep(0)
+        store.record(1, KIND_DEPOSIT, 5.0, STATE_PENDING)
+        store.record(1, KIND_DEPOSIT, 7.0)
+        return await accrual
+
+    assert asyncio.run(run()) == [(1, 1.0)]
+    expected = [
+        (1, KIND_DEPOSIT, 100.0, STATE_CONFIRMED),
+        (2, KIND_INTEREST, 1.0, STATE_CONFIRMED),
+        (3, KIND_DEPOSIT, 5.0, STATE_PENDING),
+        (4, KIND_DEPOSIT, 7.0, STATE_CONFIRMED),
+    ]
+    assert store[1].ledger_count == 4
+    assert ledger(store, 1) == expected
+    assert [e.seq for e in store.pending_entries(1)] == [3]
+
+    store = reopen(store)
+    assert ledger(store, 1) == expected
+    assert store.confirm_entry(1, 3).amount == 5.0
+
+
+def test_missed_accruals_are_caught_up_one_interval_at_a_time(store):
+    fund(store, 1, 100.0)
+    start = time.time() - 3.5 * DAY
+    store._conn.execute("UPDATE accruals SET last_at = ?", (start,))
+    store.last_accrual = start
+
+    async def catch_up():
+        credited = []
+        while store.accrual_due(DAY):
+            credited.append(await store.accrue_interest(RATE, DAY))
+        return credited
+
+    assert asyncio.run(catch_up()) == [[(1, 1.0)]] * 3
+    assert store.last_accrual == start + 3 * DAY
+    assert store[1].investment == pytest.approx(103.0)
+    assert [kind for _, kind, _, _ in ledger(store, 1)] == [KIND_DEPOSIT] + [KIND_INTEREST] * 3
+    assert reopen(store).last_accrual == start + 3 * DAY
+
+
+def test_accrual_already_run_by_another_instance_is_skipped(store):
+    fund(store, 1, 100.0)
+    store.flush()
+    start = time.time() - 1.5 * DAY
+    store._conn.execute("UPDATE accruals SET last_at = ?", (start,))
+    store.last_accrual = start
+    other = AccountStore(store.path)
+    other.open()
+    try:
+        assert asyncio.run(other.accrue_interest(RATE, DAY)) == [(1, 1.0)]
+        # Still due by this instance's clock, but the committed time says otherwise.
+        assert store.accrual_due(DAY)
+        assert asyncio.run(store.accrue_interest(RATE, DAY)) == []
+        assert store.last_accrual == start + DAY
+        assert not store.accrual_due(DAY)
+    finally:
+        other.close()
+
+
+def traced(load) -> tuple:
+    """Return (object, bytes it still holds) for ``load()``."""
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = load()
+        return result, tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+def test_accounts_stay_small_in_memory_as_history_grows(store):
+    users = 10_000
+    for chat_id in range(users):
+        store.update(5_000_000_000 + chat_id, onboarded=True, username=f"user{chat_id}", registration_fee_paid=True,
+                     t_and_c_accepted=True, total_deposit=1.0 + chat_id % 10, investment=1.0 + chat_id % 10)
+    store.close()
+
+    def load_dicts():
+        conn = sqlite3.connect(store.path)
+        rows = conn.execute(f"SELECT chat_id, {', '.join(ACCOUNT_FIELDS)} FROM accounts").fetchall()
+        conn.close()
+        return {row[0]: dict(zip(ACCOUNT_FIELDS, row[1:])) for row in rows}
+
+    accounts, dicts = traced(load_dicts)
+    del accounts
+    restarted, slotted = traced(lambda: reopen(store))
+    assert slotted < 0.6 * dicts
+
+    async def accrue(days):
+        tracemalloc.start()
+        try:
+            # The first accrual starts the worker thread and fills the
+            # interpreter's free lists; what the later ones add is history.
+            await restarted.accrue_interest(RATE)
+            baseline = tracemalloc.get_traced_memory()[0]
+            for _ in range(days):
+                await restarted.accrue_interest(RATE)
+            return tracemalloc.get_traced_memory()[0] - baseline
+        finally:
+            tracemalloc.stop()
+
+    grown = asyncio.run(accrue(10))
+    # History goes to the ledger table, not into the cached accounts.
+    assert all(account.ledger_count == 11 for _, account in restarted.items())
+    assert grown < 0.05 * slotted
+    restarted.close()
@@ -0,0 +1,124 @@
+import os
+import logging
+import multiprocessing
+
+logger = logging.getLogger(__name__)
+
+# Worker processes handling updates (1 = everything in this process).
+WORKERS = int(os.getenv("WORKERS", "1"))
+# Seconds between attempts by followers to take over as leader.
+LEADER_RETRY_INTERVAL = float(os.getenv("LEADER_RETRY_INTERVAL", "5"))
+
+
+def shard_for(chat_id: int, count: int) -> int:
+    return chat_id % count
+
+
+def shard_sql(shard, column: str = "chat_id") -> str:
+    """SQL condition selecting the rows of ``shard`` = (index, count), or "" for all rows."""
+    if shard is None:
+        return ""
+    index, count = shard
+    # SQLite's % keeps the sign of negative (group) chat ids; Python's does not.
+    return f" AND (({column} % {count}) + {count}) % {count} = {index}"
+
+
+def chat_id_of(data: dict) -> int:
+    """Chat (or, failing that, user) an update in Bot API JSON form belongs to."""
+    for value in data.values():
+        if not isinstance(value, dict):
+            continue
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        user = value.get("from") or value.get("user")
+        if user:
+            return user["id"]
+    return 0
+
+
+class LeaderLock:
+    """Non-blocking exclusive lock on a local file; whoever holds it is the leader.
+
+    The OS drops the lock when the holder exits, however it exits, so a
+    follower's next ``try_acquire`` takes over.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        import fcntl
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class WorkerPool:
+    """Worker processes that each own the chats hashing to their index.
+
+    ``dispatch`` sends an update, as Bot API JSON, to the worker owning its
+    chat, so every chat is handled by one process in arrival order. Each
+    worker runs ``target(index, count, inbox, peers, acks)``; ``peers`` are
+    the inboxes of all workers, for broadcasts. With ``acks`` the workers
+    report each handled update_id back on ``pool.acks``.
+    """
+
+    def __init__(self, target, count: int = WORKERS, acks: bool = False):
+        self.target = target
+        self.count = count
+        # Spawned, not forked: workers must not inherit the parent's
+        # connections, threads or event loop.
+        self._context = multiprocessing.get_context("spawn")
+        self.inboxes = [self._context.Queue() for _ in range(count)]
+        self.acks = self._context.Queue() if acks else None
+        self._processes = []
+        self.dispatched = [0] * count
+
+    def start(self) -> None:
+        for index in range(self.count):
+            process = self._context.Process(
+                target=self.target,
+                args=(index, self.count, self.inboxes[index], self.inboxes, self.acks),
+                name=f"bot-worker-{index}",
+            )
+            process.start()
+            self._processes.append(process)
+        logger.info(f"Started {self.count} worker processes")
+
+    def dispatch(self, data: dict, chat_id: int = None) -> None:
+        index = shard_for(chat_id_of(data) if chat_id is None else chat_id, self.count)
+        self.inboxes[index].put(("update", data))
+        self.dispatched[index] += 1
+
+    def broadcast(self, message: tuple) -> None:
+        for inbox in self.inboxes:
+            inbox.put(message)
+
+    def stop(self, timeout: float = 30.0) -> None:
+        self.broadcast(("stop", None))
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning(f"{process.name} did not stop in {timeout}s; terminating")
+                process.terminate()
+        self._processes = []